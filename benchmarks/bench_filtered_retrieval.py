@@ -0,0 +1,87 @@
+"""
+Benchmark: retrieval latency vs corpus size, with and without the company pre-filter.
+
+Uses a deterministic fake embedder, so it runs without Ollama and only measures
+the vector search itself. Run from the project root:
+
+    python -m benchmarks.bench_filtered_retrieval --sizes 1000 5000 20000
+"""
+import io
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import contextlib
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.database import VectorDatabase, build_filter
+
+WORDS = ["revenue", "growth", "margin", "guidance", "risk", "supply", "chain", "cloud",
+         "energy", "retail", "capital", "debt", "quarter", "annual", "ceo", "outlook"]
+
+
+def make_corpus(n_chunks: int, n_companies: int, seed: int = 0) -> list[Document]:
+    """
+    Synthetic tagged chunks spread evenly over `n_companies`.
+    """
+    rng = random.Random(seed)
+    return [
+        Document(
+            page_content=" ".join(rng.choices(WORDS, k=60)),
+            metadata={"source": f"filing_{i % n_companies}.txt", "company": f"Company {i % n_companies}"},
+        )
+        for i in range(n_chunks)
+    ]
+
+
+def time_queries(vdb: VectorDatabase, queries: list[tuple[str, str]], use_filter: bool) -> list[float]:
+    """
+    Returns per-query latency in milliseconds.
+    """
+    timings = []
+    for company, query in queries:
+        where = build_filter(company=company) if use_filter else None
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            vdb.retrieve(query, k=3, filter=where)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run(sizes: list[int], n_companies: int, n_queries: int, dims: int):
+    rng = random.Random(1)
+    print(f"{'chunks':>8} | {'mode':<10} | {'p50 ms':>8} | {'p95 ms':>8}")
+    print("-" * 44)
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            vdb = VectorDatabase(
+                persist_directory=tmp,
+                embedding_cache_path=None,
+                embedding_function=DeterministicFakeEmbedding(size=dims),
+            )
+            corpus = make_corpus(size, n_companies)
+            # Chroma caps the size of a single upsert, so load in slices
+            with contextlib.redirect_stdout(io.StringIO()):
+                for start in range(0, len(corpus), 1000):
+                    vdb.add_documents(corpus[start:start + 1000])
+
+            queries = [
+                (f"Company {rng.randrange(n_companies)}", " ".join(rng.choices(WORDS, k=3)))
+                for _ in range(n_queries)
+            ]
+            for label, use_filter in (("unfiltered", False), ("filtered", True)):
+                timings = time_queries(vdb, queries, use_filter)
+                p95 = statistics.quantiles(timings, n=20)[-1]
+                print(f"{size:>8} | {label:<10} | {statistics.median(timings):>8.2f} | {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--companies", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--dims", type=int, default=1024, help="Embedding size (mxbai-embed-large is 1024)")
+    args = parser.parse_args()
+    run(args.sizes, args.companies, args.queries, args.dims)
@@ -0,0 +1,240 @@
+"""
+A deterministic local stand-in for the Ollama HTTP API, for benchmarks.
+
+Implements the endpoints the project uses (/api/embed, /api/embeddings, /api/generate,
+/api/version, /api/tags) with configurable latency, so throughput can be measured
+without a model server. Run it on its own with:
+
+    python -m benchmarks.fake_ollama --port 11435
+    OLLAMA_HOST=http://127.0.0.1:11435 streamlit run src/app.py
+
+The embedding and response caches key entries by OLLAMA_HOST (see
+`src.response_cache.served_model`), so the fake vectors and answers never mix with
+the ones from the real server. The index built against the fake still lands in
+DB_DIR (test_chroma_db) though: delete or rebuild it before going back to Ollama.
+"""
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOllamaConfig:
+    """
+    Latency model (all in milliseconds) and output shape of the fake server.
+    """
+
+    def __init__(self, dims: int = 256, embed_request_ms: float = 5.0, embed_item_ms: float = 2.0,
+                 prefill_ms_per_1k_chars: float = 20.0, token_ms: float = 10.0, answer_tokens: int = 4):
+        """
+        Args:
+            dims (int): Embedding size (mxbai-embed-large is 1024).
+            embed_request_ms (float): Fixed cost of one embedding request.
+            embed_item_ms (float): Extra cost per text in an embedding request.
+            prefill_ms_per_1k_chars (float): Prompt processing cost.
+            token_ms (float): Cost per generated token.
+            answer_tokens (int): Tokens generated for a plain-text answer.
+        """
+        self.dims = dims
+        self.embed_request_ms = embed_request_ms
+        self.embed_item_ms = embed_item_ms
+        self.prefill_ms_per_1k_chars = prefill_ms_per_1k_chars
+        self.token_ms = token_ms
+        self.answer_tokens = answer_tokens
+
+
+def fake_embedding(text: str, dims: int) -> list[float]:
+    """
+    A unit vector seeded by the text's hash (same text -> same vector).
+    """
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dims)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def fake_answer(prompt: str, output_format, answer_tokens: int) -> str:
+    """
+    A deterministic answer shaped like what the agent expects for this prompt.
+    """
+    if isinstance(output_format, dict):
+        keys = output_format.get("required") or list(output_format.get("properties", {}))
+        return json.dumps({key: f"fake {key}" for key in keys})
+    if output_format == "json":
+        return "{}"
+
+    field = re.search(r"extract the value for: (.+)", prompt)
+    if field:
+        # The value on the first line, then the kind of explanation chatty models add
+        return field.group(1).strip() + "\n" + " ".join(["value"] * max(0, answer_tokens - 1))
+
+    # Pipe-delimited multi-field prompt: one value per numbered field line
+    fields = re.findall(r"^\s*\d+\.\s+(.+)$", prompt.split("--- INSTRUCTIONS ---")[0], flags=re.MULTILINE)
+    return " | ".join(f"fake {f.strip()}" for f in fields) or "N/A"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FakeOllama/0.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._send_json({"version": "0.0.0-fake"})
+        elif self.path == "/api/tags":
+            self._send_json({"models": []})
+        else:
+            self._send_json({"error": f"unknown endpoint {self.path}"}, 404)
+
+    def do_POST(self):
+        config: FakeOllamaConfig = self.server.config
+        request = self._read_json()
+        self.server.count(self.path)
+
+        if self.path in ("/api/embed", "/api/embeddings"):
+            texts = request.get("input", request.get("prompt", ""))
+            texts = [texts] if isinstance(texts, str) else list(texts)
+            time.sleep((config.embed_request_ms + config.embed_item_ms * len(texts)) / 1000)
+            vectors = [fake_embedding(t, config.dims) for t in texts]
+            if self.path == "/api/embeddings":
+                self._send_json({"embedding": vectors[0]})
+            else:
+                self._send_json({"model": request.get("model", ""), "embeddings": vectors})
+            return
+
+        if self.path == "/api/generate":
+            self._generate(request, config)
+            return
+
+        self._send_json({"error": f"unknown endpoint {self.path}"}, 404)
+
+    def _generate(self, request: dict, config: FakeOllamaConfig):
+        prompt = request.get("prompt", "")
+        answer = fake_answer(prompt, request.get("format"), config.answer_tokens)
+        options = request.get("options") or {}
+
+        # Honour stop sequences and num_predict like the real server
+        tokens = re.findall(r"\S+\s*", answer)
+        if options.get("num_predict") and options["num_predict"] > 0:
+            tokens = tokens[:options["num_predict"]]
+        text = "".join(tokens)
+        for stop in options.get("stop") or []:
+            if stop and stop in text:
+                text = text[:text.index(stop)]
+                tokens = re.findall(r"\S+\s*", text)
+
+        prefill_s = config.prefill_ms_per_1k_chars * len(prompt) / 1000 / 1000
+        time.sleep(prefill_s)
+        stats = {
+            "model": request.get("model", ""),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "prompt_eval_count": max(1, len(prompt) // 4),
+            "eval_count": len(tokens),
+        }
+
+        if not request.get("stream", True):
+            time.sleep(config.token_ms * len(tokens) / 1000)
+            self.server.count_tokens(len(tokens))
+            self._send_json({**stats, "response": text, "done": True, "done_reason": "stop"})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for token in tokens:
+                time.sleep(config.token_ms / 1000)
+                line = {"model": stats["model"], "created_at": stats["created_at"], "response": token, "done": False}
+                self.wfile.write((json.dumps(line) + "\n").encode("utf-8"))
+                self.wfile.flush()
+                self.server.count_tokens(1)
+            final = {**stats, "response": "", "done": True, "done_reason": "stop"}
+            self.wfile.write((json.dumps(final) + "\n").encode("utf-8"))
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client hung up mid-stream: stop generating, like the real server
+            return
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    """
+    Threaded fake Ollama server. Use as a context manager:
+
+        with FakeOllamaServer(FakeOllamaConfig()) as server:
+            os.environ["OLLAMA_HOST"] = server.url
+    """
+
+    daemon_threads = True
+
+    def __init__(self, config: FakeOllamaConfig, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.config = config
+        self.requests: dict[str, int] = {}
+        self.tokens_generated = 0
+        self._counter_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, path: str):
+        with self._counter_lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def count_tokens(self, n: int):
+        with self._counter_lock:
+            self.tokens_generated += n
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "FakeOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--dims", type=int, default=1024)
+    parser.add_argument("--token-ms", type=float, default=10.0)
+    parser.add_argument("--embed-item-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(
+        FakeOllamaConfig(dims=args.dims, token_ms=args.token_ms, embed_item_ms=args.embed_item_ms),
+        port=args.port,
+    )
+    print(f"🧪 Fake Ollama listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,274 @@
+"""
+End-to-end benchmark: ingest, retrieval and extraction throughput against a fake Ollama.
+
+Starts `benchmarks.fake_ollama` on a free port, points the Ollama client at it via
+OLLAMA_HOST, and measures the real project code paths on synthetic filings:
+
+    - load_and_chunk_documents         -> files/sec, chunks/sec
+    - ingest (chunk + embed + upsert)  -> chunks/sec
+    - VectorDatabase.retrieve          -> p50 / p99 latency
+    - analyze_single_field / analyze_company -> rows/min
+    - stream_company                   -> rows/min, time to first value
+
+Results are printed (or written) as JSON, tagged with the git commit, so runs can be
+diffed between commits. Run from the project root:
+
+    python -m benchmarks.run_benchmarks --scales 10 100 1000 --output bench.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import contextlib
+
+from benchmarks.fake_ollama import FakeOllamaConfig, FakeOllamaServer
+
+FIELDS = ["Revenue", "CEO", "Primary Risks", "Future Projections"]
+SECTORS = ["Technologies", "Power", "Markets", "Logistics", "Biosciences", "Retail"]
+FIRST_NAMES = ["Elena", "Marcus", "Priya", "David", "Sofia", "Kenji", "Amara", "Lucas"]
+LAST_NAMES = ["Rostova", "Chen", "Okafor", "Lindqvist", "Haddad", "Moreau", "Tanaka", "Silva"]
+RISKS = ["supply chain disruptions", "elevated interest rates", "regulatory scrutiny",
+         "cybersecurity incidents", "commodity price volatility", "currency fluctuations"]
+FILLER = ("The Company continued to invest in operational efficiency, customer retention and "
+          "product development while managing costs across all business segments. ")
+
+
+def make_filing(index: int, rng: random.Random) -> tuple[str, str]:
+    """
+    One synthetic quarterly report shaped like the sample corpus (~4 KB).
+
+    Returns:
+        tuple[str, str]: (company name, report text)
+    """
+    company = f"Company{index:04d} {rng.choice(SECTORS)}"
+    ceo = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    revenue = f"${rng.randint(1, 90)}.{rng.randint(0, 9)} billion"
+    year = rng.choice([2024, 2025])
+    risks = ", ".join(rng.sample(RISKS, 3))
+    text = (
+        f"{company.upper()} INC.\nQUARTERLY REPORT (FORM 10-Q SUMMARY)\n"
+        f"For the Period Ended September 30, {year}\n\nTICKER: C{index:04d}\n\n"
+        f"--- EXECUTIVE SUMMARY ---\n\n{company} today announced financial results for its third quarter. "
+        f"\"We delivered a strong quarter,\" said {ceo}, Chief Executive Officer of {company}. "
+        + FILLER * 6
+        + f"\n\n--- FINANCIAL HIGHLIGHTS ---\n\nTotal Revenue for the third quarter was {revenue}, "
+        f"an increase of {rng.randint(1, 30)}% year-over-year. " + FILLER * 6
+        + f"\n\n--- RISK FACTORS ---\n\nKey risks include {risks}. " + FILLER * 4
+        + f"\n\n--- OUTLOOK ---\n\nManagement expects revenue growth of {rng.randint(2, 20)}% "
+        f"for fiscal {year + 1}. " + FILLER * 4
+    )
+    return company, text
+
+
+def write_corpus(data_dir: str, n_files: int, seed: int = 0) -> list[str]:
+    """
+    Writes `n_files` synthetic filings into `data_dir`. Returns the company names.
+    """
+    rng = random.Random(seed)
+    companies = []
+    for i in range(n_files):
+        company, text = make_filing(i, rng)
+        with open(os.path.join(data_dir, f"filing_{i:04d}.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+        companies.append(company)
+    return companies
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[rank]
+
+
+def llm_calls() -> int:
+    """
+    LLM calls traced so far (llm_call spans, see src/tracing.py).
+    """
+    from src.tracing import get_tracer
+
+    return next((stage["count"] for stage in get_tracer().summary() if stage["stage"] == "llm_call"), 0)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def bench_scale(n_files: int, args) -> dict:
+    """
+    Runs every stage once for a corpus of `n_files` filings.
+    """
+    # Imported late so the Ollama client picks up OLLAMA_HOST
+    from src.ingestion import load_and_chunk_documents
+    from src.ingest_pipeline import stream_into_database
+    from src.database import VectorDatabase
+    from src.agent import AnalystAgent
+    from src.tracing import get_tracer
+
+    result = {"files": n_files}
+    get_tracer().reset()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, "data")
+        db_dir = os.path.join(tmp, "db")
+        os.makedirs(data_dir)
+        companies = write_corpus(data_dir, n_files, seed=args.seed)
+
+        # 1. Chunking only
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            chunks = load_and_chunk_documents(data_dir, workers=args.workers)
+        seconds = time.perf_counter() - start
+        result["chunking"] = {
+            "chunks": len(chunks),
+            "seconds": round(seconds, 4),
+            "files_per_sec": round(n_files / seconds, 2),
+            "chunks_per_sec": round(len(chunks) / seconds, 2),
+        }
+
+        # 2. Ingest: chunk + embed + upsert (no embedding cache, so every chunk is embedded)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            vdb = VectorDatabase(persist_directory=db_dir, embedding_cache_path=None)
+            chunks = load_and_chunk_documents(data_dir, workers=args.workers)
+            stats = stream_into_database(vdb, chunks, batch_size=args.batch_size)
+        seconds = time.perf_counter() - start
+        result["ingest"] = {
+            "chunks": stats["chunks"],
+            "batches": stats["batches"],
+            "seconds": round(seconds, 4),
+            "chunks_per_sec": round(stats["chunks"] / seconds, 2),
+        }
+
+        # 3. Retrieval latency
+        rng = random.Random(args.seed + 1)
+        timings = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(args.queries):
+                query = f"{rng.choice(companies)} {rng.choice(FIELDS)}"
+                start = time.perf_counter()
+                vdb.retrieve(query, k=3)
+                timings.append((time.perf_counter() - start) * 1000)
+        result["retrieve"] = {
+            "queries": len(timings),
+            "p50_ms": round(statistics.median(timings), 3),
+            "p99_ms": round(percentile(timings, 99), 3),
+        }
+
+        # 4. Extraction throughput (a sample of companies, response cache off).
+        # Extractors stay on, so "llm_calls" counts the calls that actually reached the model.
+        sample = companies[:args.companies]
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent = AnalystAgent(vdb, filter_by_company=False, response_cache_path=None)
+
+            calls_before = llm_calls()
+            start = time.perf_counter()
+            for company in sample:
+                for field in FIELDS:
+                    agent.analyze_single_field(company, field)
+            single_seconds = time.perf_counter() - start
+            single_calls, calls_before = llm_calls() - calls_before, llm_calls()
+
+            start = time.perf_counter()
+            for company in sample:
+                agent.analyze_company(company, FIELDS)
+            company_seconds = time.perf_counter() - start
+            company_calls, calls_before = llm_calls() - calls_before, llm_calls()
+
+            first_value_ms = []
+            start = time.perf_counter()
+            for company in sample:
+                row_start, first_value = time.perf_counter(), None
+                for partial in agent.stream_company(company, FIELDS):
+                    if first_value is None and partial:
+                        first_value = (time.perf_counter() - row_start) * 1000
+                first_value_ms.append(first_value)
+            stream_seconds = time.perf_counter() - start
+            stream_calls = llm_calls() - calls_before
+
+        result["analyze_single_field"] = {
+            "rows": len(sample),
+            "cells": len(sample) * len(FIELDS),
+            "llm_calls": single_calls,
+            "seconds": round(single_seconds, 4),
+            "rows_per_min": round(len(sample) / single_seconds * 60, 2),
+        }
+        result["extractor_hits"] = agent.extractors.stats() if agent.extractors else {}
+        result["analyze_company"] = {
+            "rows": len(sample),
+            "llm_calls": company_calls,
+            "seconds": round(company_seconds, 4),
+            "rows_per_min": round(len(sample) / company_seconds * 60, 2),
+        }
+        result["stream_company"] = {
+            "rows": len(sample),
+            "llm_calls": stream_calls,
+            "seconds": round(stream_seconds, 4),
+            "rows_per_min": round(len(sample) / stream_seconds * 60, 2),
+            "first_value_p50_ms": round(statistics.median(first_value_ms), 3),
+        }
+
+        vdb.close()
+    # Per-stage breakdown (split / embed / upsert / similarity_search / llm_call ...)
+    result["stages"] = get_tracer().summary()
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end benchmark against a fake Ollama server.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100, 1000],
+                        help="Corpus sizes (number of filings) to benchmark.")
+    parser.add_argument("--queries", type=int, default=200, help="Retrieval queries per scale.")
+    parser.add_argument("--companies", type=int, default=5, help="Companies analyzed per scale.")
+    parser.add_argument("--workers", type=int, default=1, help="Chunking workers (0 = one per CPU core).")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per embedding/upsert batch.")
+    parser.add_argument("--dims", type=int, default=1024, help="Fake embedding size.")
+    parser.add_argument("--embed-item-ms", type=float, default=2.0, help="Fake embedding cost per text.")
+    parser.add_argument("--token-ms", type=float, default=10.0, help="Fake generation cost per token.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write JSON here instead of stdout.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = FakeOllamaConfig(dims=args.dims, embed_item_ms=args.embed_item_ms, token_ms=args.token_ms)
+
+    with FakeOllamaServer(config) as server:
+        os.environ["OLLAMA_HOST"] = server.url
+        scales = []
+        for n_files in args.scales:
+            print(f"⏱️  Benchmarking {n_files} files...", file=sys.stderr)
+            scales.append(bench_scale(n_files, args))
+        requests = dict(server.requests)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "fake_ollama_requests": requests,
+        "scales": scales,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"✅ Wrote benchmark results to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Token savings of per-field generation profiles (src/generation_profiles.py).
+
+Runs single-field extraction for every company x field of a corpus twice, without and
+with generation profiles, and reports the completion tokens Ollama generated per field
+(from the llm_call spans, see src/tracing.py). Extractors and the response cache are
+off, so every cell is a real LLM call. Run from the project root:
+
+    python -m benchmarks.token_savings                  # sample corpus, local Ollama
+    python -m benchmarks.token_savings --fake           # fake Ollama (no model needed)
+"""
+import io
+import os
+import sys
+import json
+import argparse
+import tempfile
+import contextlib
+
+from benchmarks.fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from src.ingest_worker import DATA_DIR
+from src.field_table import PRECOMPUTE_FIELDS
+
+
+def llm_totals() -> dict:
+    from src.tracing import get_tracer
+
+    stage = next((s for s in get_tracer().summary() if s["stage"] == "llm_call"), None)
+    if stage is None:
+        return {"calls": 0, "completion_tokens": 0, "seconds": 0.0}
+    return {
+        "calls": stage["count"],
+        "completion_tokens": stage.get("completion_tokens", 0),
+        "seconds": round(stage["total_s"], 3),
+    }
+
+
+def measure(vdb, companies: list[str], fields: list[str], use_profiles: bool) -> dict:
+    """
+    {field: {"calls", "completion_tokens", "seconds"}} for one setting.
+    """
+    from src.agent import AnalystAgent
+    from src.tracing import get_tracer
+
+    agent = AnalystAgent(vdb, response_cache_path=None, use_extractors=False,
+                         use_generation_profiles=use_profiles)
+    results = {}
+    for field in fields:
+        get_tracer().reset()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for company in companies:
+                agent.analyze_single_field(company, field)
+        results[field] = llm_totals()
+    return results
+
+
+def run(args) -> dict:
+    # Imported late so the Ollama client picks up OLLAMA_HOST
+    from src.ingestion import load_and_chunk_documents_MD_tagging
+    from src.ingest_pipeline import stream_into_database
+    from src.database import VectorDatabase
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(io.StringIO()):
+            vdb = VectorDatabase(persist_directory=tmp, embedding_cache_path=None)
+            stream_into_database(vdb, load_and_chunk_documents_MD_tagging(args.data_dir))
+        companies = sorted(company for company in vdb.sources_by_company() if company != "Unknown")
+        print(f"⏱️  {len(companies)} companies x {len(args.fields)} fields from {args.data_dir}", file=sys.stderr)
+
+        baseline = measure(vdb, companies, args.fields, use_profiles=False)
+        profiled = measure(vdb, companies, args.fields, use_profiles=True)
+        vdb.close()
+
+    fields = {}
+    for field in args.fields:
+        before, after = baseline[field]["completion_tokens"], profiled[field]["completion_tokens"]
+        fields[field] = {
+            "without_profiles": baseline[field],
+            "with_profiles": profiled[field],
+            "tokens_saved": before - after,
+            "saved_pct": round((before - after) / before * 100, 1) if before else 0.0,
+        }
+    return {"companies": companies, "fields": fields}
+
+
+def format_report(report: dict) -> str:
+    lines = [f"{'field':<24}{'tokens before':>15}{'tokens after':>14}{'saved':>8}{'s before':>10}{'s after':>9}"]
+    for field, row in report["fields"].items():
+        before, after = row["without_profiles"], row["with_profiles"]
+        lines.append(
+            f"{field:<24}{before['completion_tokens']:>15}{after['completion_tokens']:>14}"
+            f"{row['saved_pct']:>7}%{before['seconds']:>10}{after['seconds']:>9}"
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Completion tokens per field with and without generation profiles.")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Corpus to index and analyze.")
+    parser.add_argument("--fields", nargs="+", default=PRECOMPUTE_FIELDS)
+    parser.add_argument("--fake", action="store_true", help="Use a fake Ollama server instead of the local one.")
+    parser.add_argument("--output", help="Also write the JSON report here.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.fake:
+        with FakeOllamaServer(FakeOllamaConfig(token_ms=2.0)) as server:
+            os.environ["OLLAMA_HOST"] = server.url
+            report = run(args)
+    else:
+        report = run(args)
+
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Wrote token savings to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
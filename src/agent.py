@@ -1,106 +1,676 @@
 from langchain_ollama import OllamaLLM
 from langchain_core.prompts import ChatPromptTemplate
-from src.database import VectorDatabase
+from langchain_core.documents import Document
+from src.database import VectorDatabase, build_filter
+from src.response_cache import ResponseCache, context_fingerprint, served_model
+from src.retrieval import RetrievalSession
+from src.tracing import span, TokenUsageHandler
+from src.context import build_context, estimate_tokens, DEFAULT_CONTEXT_TOKEN_BUDGET
+from src.extractors import ExtractorRegistry
+from src.generation_profiles import GenerationProfiles
+from src.model_routing import ModelRoute, ModelRouter
+from src.checkpoint import RunCheckpoint
+from src.company_registry import get_company_registry, normalize_name
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import time
 import shutil
 import pathlib
 from pathlib import Path
+from typing import Iterator, Optional
+
+# Single-field extraction: no complex instructions, just "Find X"
+SINGLE_FIELD_TEMPLATE = """
+        Based ONLY on the context below, extract the value for: {field}
+        
+        Context:
+        {context}
+        
+        Instructions:
+        - return only the value found for field
+        - do not write any sentances or explanation
+        - If not found, write 'N/A'.
+        """
+
+# Same task as SINGLE_FIELD_TEMPLATE, but context first: prompts for different fields
+# of one company then start with the same tokens (see RetrievalSession)
+SESSION_FIELD_TEMPLATE = """
+        Context:
+        {context}
+        
+        Based ONLY on the context above, extract the value for: {field}
+        
+        Instructions:
+        - return only the value found for field
+        - do not write any sentances or explanation
+        - If not found, write 'N/A'.
+        """
+
+# Monolithic extraction: every field in one pipe-delimited line
+MULTI_FIELD_TEMPLATE = """
+        You are an expert financial analyst. Your goal is to extract specific data points from the provided context.
+        
+        Based on ONLY the context provided below, extract the following information:
+        if a company is given that is not included in the context, write N/A for all fields
+        {field_list_str}
+        
+        --- INSTRUCTIONS ---
+        1. Return the values in a single line, separated by pipes (|).
+        2. Follow the exact order of the list above.
+        3. If a piece of information is NOT found in the context, write 'N/A' for that field Do NOT repeat previous values..
+        4. Do NOT write any introduction, explanation, or extra text. Output ONLY the values. 
+        5. Do NOT format as Markdown.
+    
+
+        
+        Example Output for 3 fields:
+        $45 Billion | Tim Cook | Supply Chain Disruptions
+
+        
+        Context:
+        {context}
+        
+        Analysis:
+        """
+
+# Hybrid extraction: every field in one call, returned as a JSON object
+JSON_FIELDS_TEMPLATE = """
+        You are an expert financial analyst. Extract data points about {company} from the context below.
+        
+        Based ONLY on the context, return a JSON object with exactly these keys:
+        {field_list_str}
+        
+        --- INSTRUCTIONS ---
+        1. Each value is a short string with the value found for that key.
+        2. If a value is NOT found in the context, use "N/A". Do NOT repeat values across keys.
+        3. Output ONLY the JSON object.
+        
+        Context:
+        {context}
+        """
+
+RESPONSE_CACHE_PATH = "llm_cache/responses.sqlite3"
 
 class AnalystAgent:
     """
     Orchestrates the LLM and Vector Database to analyze documents.
     """
     #TODO pass a VDB object in as a reference, an agent should not OWN a database
-    def __init__(self, vdb: VectorDatabase):
+    def __init__(self, vdb: VectorDatabase, filter_by_company: bool = True,
+                 response_cache_path: Optional[str] = RESPONSE_CACHE_PATH,
+                 context_token_budget: Optional[int] = DEFAULT_CONTEXT_TOKEN_BUDGET,
+                 retrieval_mode: str = "vector",
+                 use_extractors: bool = True,
+                 extractors: Optional[ExtractorRegistry] = None,
+                 use_generation_profiles: bool = True,
+                 generation_profiles: Optional[GenerationProfiles] = None,
+                 router: Optional[ModelRouter] = None):
+        """
+        Args:
+            vdb (VectorDatabase): Shared vector store to read from.
+            filter_by_company (bool): Restrict every search to chunks tagged with the target
+                company (requires an index built with `load_and_chunk_documents_MD_tagging`).
+            response_cache_path (str): SQLite file for cached LLM answers. None disables the cache.
+            context_token_budget (int): Max (estimated) tokens of retrieved context per prompt.
+                None sends every retrieved chunk, as before.
+            retrieval_mode (str): "vector", "hybrid" (BM25 + vector, better on exact terms like
+                "Revenue" or "CEO") or "lexical" (BM25 only, no embedding call).
+            use_extractors (bool): Try rule-based extractors on the retrieved chunks before the
+                LLM in single-field extraction (see src/extractors.py).
+            extractors (ExtractorRegistry): Custom rules (defaults to the built-in ones).
+            use_generation_profiles (bool): Cap tokens and stop at the first line in single-field
+                extraction, per kind of field (see src/generation_profiles.py).
+            generation_profiles (GenerationProfiles): Custom field -> profile mapping.
+            router (ModelRouter): Per-field model routing with escalation for single-field
+                extraction (see src/model_routing.py). None = llama3.2 for every field.
+        """
         # 1. Initialize the LLM
         # temperature=0 is critical for strict data extraction
         self.llm = OllamaLLM(model="llama3.2", temperature=0)
         #test_db_dir = "test_chroma_db"
         # 2. Connect to the DB
         self.db = vdb
+        self.filter_by_company = filter_by_company
+        self.context_token_budget = context_token_budget
+        self.retrieval_mode = retrieval_mode
+        self.extractors = (extractors or ExtractorRegistry()) if use_extractors else None
+        self.generation_profiles = (generation_profiles or GenerationProfiles()) if use_generation_profiles else None
+        self._profile_llms: dict[tuple, OllamaLLM] = {}
+        self.router = router
+        # User-typed company name -> company tag in the index (see _resolve_company)
+        self._indexed_companies: Optional[dict[str, str]] = None
+        self._resolved_companies: dict[str, Optional[str]] = {}
 
+        # 3. Response cache (safe because temperature=0)
+        # The index version is part of every key, so answers from other versions are never
+        # served. They are left to LRU eviction rather than purged here: this agent may
+        # be reading an unpublished build (ingest precompute) while the app serves the live one.
+        self.index_version = vdb.index_version()
+        self.response_cache = None
+        if response_cache_path:
+            self.response_cache = ResponseCache(response_cache_path)
 
+    def _company_filter(self, company_name: str) -> Optional[dict]:
+        """
+        The metadata pre-filter for a company's partition (None = search everything).
+        Keeps other companies' chunks out of the context (see Challanges_encountered.md #1).
+        """
+        if not self.filter_by_company:
+            return None
+        company = self._resolve_company(company_name)
+        if company is None:
+            return None
+        return build_filter(company=company)
+
+    def _resolve_company(self, company_name: str) -> Optional[str]:
+        """
+        The company tag in the index for what the user typed ("Apex", "apex technologies inc"
+        -> "Apex Technologies"). None if no chunk carries it: searching the whole corpus
+        then beats returning N/A for every field.
+        """
+        if company_name in self._resolved_companies:
+            return self._resolved_companies[company_name]
+
+        if self._indexed_companies is None:
+            self._indexed_companies = {normalize_name(company): company for company in self.db.sources_by_company()}
+        canonical = get_company_registry().resolve(company_name) or company_name
+        company = self._indexed_companies.get(normalize_name(canonical))
+        if company is None:
+            print(f"⚠️  No chunks tagged with company '{company_name}'; searching all documents instead.")
+        self._resolved_companies[company_name] = company
+        return company
+
+    def _build_context(self, docs: list[Document]) -> tuple[str, list[Document]]:
+        """
+        Deduplicated, budget-trimmed context for a prompt (see src/context.py).
 
+        Returns:
+            tuple[str, list[Document]]: (context text, the chunks it was built from)
+        """
+        with span("context_build", chunks_in=len(docs), budget=self.context_token_budget) as attrs:
+            context_text, used_docs = build_context(docs, self.context_token_budget)
+            attrs["chunks"] = len(used_docs)
+            attrs["chars"] = len(context_text)
+            attrs["tokens"] = estimate_tokens(context_text)
+        return context_text, used_docs
+
+
+
+
+    @staticmethod
+    def _field_query(company_name: str, field: str) -> str:
+        """
+        The targeted search query used for single-field extraction.
+        """
+        return f"{company_name} {field}"
 
-    def analyze_single_field(self, company_name: str, field: str) -> str:
+    def analyze_single_field(self, company_name: str, field: str, docs: Optional[list[Document]] = None) -> str:
         """
         Extracts a single data point with high precision.
+
+        Args:
+            company_name (str): The company to analyze.
+            field (str): The data point to extract.
+            docs (list[Document]): Pre-retrieved chunks (e.g. from `retrieve_many`).
+                If omitted, a targeted search is run for this field.
         """
+        if docs is None:
+            docs = self._retrieve_field_docs(company_name, field)
+        
+        return self._extract_field(field, docs, SINGLE_FIELD_TEMPLATE)
+
+    def _retrieve_field_docs(self, company_name: str, field: str) -> list[Document]:
         # 1. TARGETED RETRIEVAL
         # We search for "Apple Revenue" instead of just "Apple".
         #  we should  get the specific paragraph about revenue.
-        specific_query = f"{company_name} {field}"
+        specific_query = self._field_query(company_name, field)
         print(f"   🔎 Zooming in on: '{specific_query}'...")
         
-        docs = self.db.retrieve(query=specific_query, k=3) # We only need 2 chunks for 1 fact not 6!
-        
+        return self.db.retrieve(
+            query=specific_query, k=3, filter=self._company_filter(company_name),
+            mode=self.retrieval_mode,
+        ) # We only need 2 chunks for 1 fact not 6!
+
+    def _rule_value(self, field: str, docs: list[Document]) -> Optional[str]:
+        """
+        FAST PATH: the value from a confident rule match (no LLM call), or None.
+        """
+        if self.extractors is None:
+            return None
+        with span("extract_rules", field=field, chunks=len(docs)) as attrs:
+            match = self.extractors.run(field, docs)
+            attrs["hit"] = match is not None
+        if match is None:
+            return None
+        print(f"   ⚡ {field}: '{match.value}' (rule '{match.extractor}', no LLM call)")
+        return match.value
+
+    def _field_generation(self, field: str, route: Optional[ModelRoute] = None,
+                          use_profile: bool = True) -> tuple[OllamaLLM, dict]:
+        """
+        The LLM to use for a single-value `field` (on `route`'s model when routing) and the
+        response cache key parts that set it apart from the plain `self.llm`.
+        """
+        llm, key_parts = self.llm, {}
+        if route is not None:
+            llm, key_parts = self.router.llm(route), {"route_model": route.model}
+        if self.generation_profiles is None or not use_profile:
+            return llm, key_parts
+
+        profile = self.generation_profiles.for_field(field)
+        limits = (llm.model, profile.max_tokens, tuple(profile.stop or ()))
+        profiled = self._profile_llms.get(limits)
+        if profiled is None:
+            profiled = self._profile_llms.setdefault(limits, profile.apply(llm))
+        return profiled, {**key_parts, **profile.cache_key()}
+
+    def stream_single_field(self, company_name: str, field: str,
+                            docs: Optional[list[Document]] = None) -> Iterator[str]:
+        """
+        Streaming `analyze_single_field`: yields the value extracted so far as tokens arrive.
+
+        Generation is stopped as soon as the first line of the answer is complete (the
+        prompt asks for the value only, so anything after it is chatter we'd strip anyway).
+        With a router, a rejected answer is followed by the escalation model's stream.
+        The last value yielded is the final one (never empty: "N/A" if nothing was found).
+        """
+        if docs is None:
+            docs = self._retrieve_field_docs(company_name, field)
+        if not docs:
+            yield "N/A"
+            return
+
+        rule_value = self._rule_value(field, docs)
+        if rule_value is not None:
+            yield rule_value
+            return
+
+        context_text, docs = self._build_context(docs)
+        prompt = ChatPromptTemplate.from_template(SINGLE_FIELD_TEMPLATE)
+        route = self.router.route_for(field) if self.router is not None else None
+        while True:
+            start = time.perf_counter()
+            value = ""
+            # Same retry as _generate_field: a model that opens with a newline hits the
+            # profile's stop sequence straight away, so ask again without the profile
+            for use_profile in (True, False):
+                llm, key_parts = self._field_generation(field, route, use_profile=use_profile)
+                for partial in self._stream(
+                    prompt,
+                    {"context": context_text, "field": field},
+                    docs,
+                    llm=llm,
+                    template=SINGLE_FIELD_TEMPLATE,
+                    fields=[field],
+                    context_budget=self.context_token_budget,
+                    **key_parts,
+                ):
+                    value = partial.strip()
+                    yield value
+                if value or self.generation_profiles is None:
+                    break
+            if not value:
+                value = "N/A"
+                yield value
+            if route is None:
+                return
+            route = self.router.settle(field, route, value, (time.perf_counter() - start) * 1000)
+            if route is None:
+                return
+
+    def _generate_field(self, field: str, prompt: ChatPromptTemplate, context_text: str,
+                        docs: list[Document], template_text: str, route: Optional[ModelRoute] = None) -> str:
+        """
+        One single-value LLM call for `field` (on `route`'s model when routing).
+        """
+        variables = {"context": context_text, "field": field}
+        # The field's generation profile stops the model after the value
+        llm, key_parts = self._field_generation(field, route)
+        response = self._generate(
+            prompt, variables, docs, llm=llm,
+            template=template_text, fields=[field], context_budget=self.context_token_budget,
+            **key_parts,
+        )
+        if self.generation_profiles is not None and not response.strip():
+            # The model opened with a newline and hit the stop sequence straight away
+            llm, key_parts = self._field_generation(field, route, use_profile=False)
+            response = self._generate(
+                prompt, variables, docs, llm=llm,
+                template=template_text, fields=[field], context_budget=self.context_token_budget,
+                **key_parts,
+            )
+        return response
+
+    def _extract_field(self, field: str, docs: list[Document], template_text: str) -> str:
+        """
+        Runs the single-value prompt for one field over already-retrieved chunks.
+        """
         if not docs:
             return "N/A"
+
+        # 1b. FAST PATH: a confident rule match skips the LLM entirely
+        rule_value = self._rule_value(field, docs)
+        if rule_value is not None:
+            return rule_value
             
-        context_text = "\n\n".join([d.page_content for d in docs])
+        context_text, docs = self._build_context(docs)
         
         # 2. SIMPLE PROMPT
         # No complex instructions. just "Find X". avoids reaching context limit
-        template_text = """
-        Based ONLY on the context below, extract the value for: {field}
-        
-        Context:
-        {context}
-        
-        Instructions:
-        - return only the value found for field
-        - do not write any sentances or explanation
-        - If not found, write 'N/A'.
-        """
-        
         prompt = ChatPromptTemplate.from_template(template_text)
-        chain = prompt | self.llm
         
-        # 3. EXECUTE
-        response = chain.invoke({
-            "context": context_text, 
-            "field": field
-        })
+        # 3. EXECUTE (or answer from the response cache)
+        # With a router: the field's model first, the bigger one if the answer is rejected
+        if self.router is None:
+            response = self._generate_field(field, prompt, context_text, docs, template_text)
+        else:
+            response = self.router.run(
+                field, lambda route: self._generate_field(field, prompt, context_text, docs, template_text, route)
+            )
         
-        return response.strip()
+        with span("parse", fields=1):
+            return response.strip()
+
+    def analyze_fields(self, company_name: str, fields: list[str], k: int = 3) -> dict:
+        """
+        Single-field extraction for one company over a shared retrieval session.
+
+        One batched search covers every field; each field then gets only its own chunks,
+        placed BEFORE the question so consecutive prompts share a prefix Ollama can
+        serve from its KV cache. Fields run in order on purpose, to keep that cache warm.
+
+        Returns:
+            dict: {field: value} for every field in `fields`.
+        """
+        print(f"🤖 Agent is analyzing (session): {company_name}...")
+        session = RetrievalSession(
+            self.db, company_name, fields,
+            query_builder=self._field_query,
+            k=k,
+            filter=self._company_filter(company_name),
+            mode=self.retrieval_mode,
+        )
+        return {
+            field: self._extract_field(field, session.docs_for(field), SESSION_FIELD_TEMPLATE)
+            for field in fields
+        }
         
-    
-    
+    def analyze_many(self, companies: list[str], fields: list[str], max_concurrency: int = 4,
+                     mode: str = "single_field", checkpoint: Optional[RunCheckpoint] = None) -> list[dict]:
+        """
+        Runs single-field extraction for every company x field cell with bounded concurrency.
+
+        With mode="structured", each company is one `analyze_company_structured` call
+        instead (one JSON call per company, single-field fallback for broken fields).
+        With mode="session", each company is one `analyze_fields` call (shared retrieval
+        per company, fields in order).
+
+        Retrieval for the whole grid is done in one batched pass, then each cell is an
+        independent `analyze_single_field` call: its chunks, context and prompt live only
+        in that call's frame, so nothing can leak between companies
+        (the same "clean room" guarantee as a fresh agent per company).
+
+        Args:
+            companies (list[str]): Companies to analyze.
+            fields (list[str]): Fields to extract for each company.
+            max_concurrency (int): Max cells in flight. Match it to OLLAMA_NUM_PARALLEL.
+            mode (str): "single_field" (one call per cell), "structured" (one call per company),
+                "session" (one retrieval per company, one call per cell) or "field_major"
+                (one query per field for all companies, one call per cell).
+            checkpoint (RunCheckpoint): Skip the cells it already holds and record every
+                finished cell in it as soon as it is done (resumable runs, see src/checkpoint.py).
+
+        Returns:
+            list[dict]: One row per company, in input order: {"Company": ..., field: value}.
+        """
+        if mode == "structured":
+            return self._analyze_many_per_company(self.analyze_company_structured, companies, fields,
+                                                  max_concurrency, checkpoint)
+        if mode == "session":
+            return self._analyze_many_per_company(self.analyze_fields, companies, fields,
+                                                  max_concurrency, checkpoint)
+        if mode == "field_major":
+            return self._analyze_many_field_major(companies, fields, max_concurrency, checkpoint)
+        if mode != "single_field":
+            raise ValueError(f"Unknown analysis mode: {mode!r}")
+
+        grid = self._pending_cells([(company, field) for company in companies for field in fields], checkpoint)
+
+        # 1. Retrieve the whole grid in one pass (one batched embedding call).
+        # Each cell still gets its own result list, so contexts never mix.
+        grid_docs = self.db.retrieve_many(
+            [self._field_query(company, field) for company, field in grid],
+            k=3,
+            filters=[self._company_filter(company) for company, _ in grid],
+            mode=self.retrieval_mode,
+        )
+        return self._analyze_cells(grid, grid_docs, companies, fields, max_concurrency, checkpoint)
+
+    @staticmethod
+    def _pending_cells(grid: list[tuple[str, str]], checkpoint: Optional[RunCheckpoint]) -> list[tuple[str, str]]:
+        if checkpoint is None:
+            return grid
+        pending = [(company, field) for company, field in grid if not checkpoint.is_done(company, field)]
+        if len(pending) < len(grid):
+            print(f"♻️  {len(grid) - len(pending)} of {len(grid)} cells already done, skipping them.")
+        return pending
+
+    def _analyze_many_field_major(self, companies: list[str], fields: list[str],
+                                  max_concurrency: int, checkpoint: Optional[RunCheckpoint] = None) -> list[dict]:
+        """
+        `analyze_many` one FIELD at a time across every company (wide comparison tables).
+
+        With company partitions, each field is ONE query ("Revenue") searched once per
+        company filter, so embedding work grows with the number of fields, not cells:
+        200 companies x 1 field is one embedded query instead of 200. Cells are then
+        sent field by field, so the prompts in flight share the field question as their
+        prefix. Companies without a partition (filtering off, or no chunks tagged with
+        them) need the company in the query, as in "single_field".
+        """
+        grid = self._pending_cells([(company, field) for field in fields for company in companies], checkpoint)
+        filters = [self._company_filter(company) for company, _ in grid]
+        queries = [
+            field if where is not None else self._field_query(company, field)
+            for (company, field), where in zip(grid, filters)
+        ]
+        print(f"📐 Field-major: {len(fields)} field queries x {len(companies)} companies...")
+
+        grid_docs = self.db.retrieve_many(
+            queries,
+            k=3,
+            filters=filters,
+            mode=self.retrieval_mode,
+        )
+        return self._analyze_cells(grid, grid_docs, companies, fields, max_concurrency, checkpoint)
 
+    def _analyze_cells(self, grid: list[tuple[str, str]], grid_docs: list[list[Document]],
+                       companies: list[str], fields: list[str], max_concurrency: int,
+                       checkpoint: Optional[RunCheckpoint] = None) -> list[dict]:
+        """
+        Runs `analyze_single_field` for every (company, field) cell over its retrieved
+        chunks, in `grid` order, and pivots the values into one row per company
+        (cells missing from `grid` are taken from `checkpoint`).
+        """
+        cells = dict(checkpoint.cells) if checkpoint is not None else {}
+
+        # 2. Fan out the LLM calls
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+            futures = {
+                pool.submit(self.analyze_single_field, company, field, docs): (company, field)
+                for (company, field), docs in zip(grid, grid_docs)
+            }
+            
+            for future in as_completed(futures):
+                company, field = futures[future]
+                try:
+                    cells[(company, field)] = future.result()
+                    print(f"   ✅ {company} / {field}: {cells[(company, field)]}")
+                    if checkpoint is not None:
+                        checkpoint.record(company, field, cells[(company, field)])
+                except Exception as e:
+                    print(f"   ❌ Error on {company} / {field}: {e}")
+                    cells[(company, field)] = "ERROR"
+
+        # Rebuild rows in input order (futures complete in any order)
+        rows = []
+        for company in companies:
+            row = {"Company": company}
+            for field in fields:
+                row[field] = cells[(company, field)]
+            rows.append(row)
+        return rows
     
+
+    def _analyze_many_per_company(self, analyze, companies: list[str], fields: list[str],
+                                  max_concurrency: int, checkpoint: Optional[RunCheckpoint] = None) -> list[dict]:
+        """
+        `analyze_many` for the per-company modes: `analyze(company, fields)` is one task
+        (asked only for the fields `checkpoint` doesn't hold yet).
+        """
+        rows = {}
+        pending = {
+            company: checkpoint.pending_fields(company, fields) if checkpoint is not None else list(fields)
+            for company in companies
+        }
+        for company, company_fields in pending.items():
+            if not company_fields:
+                rows[company] = {"Company": company, **{field: checkpoint.cells[(company, field)] for field in fields}}
+
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+            futures = {
+                pool.submit(analyze, company, pending[company]): company
+                for company in companies if pending[company]
+            }
+            for future in as_completed(futures):
+                company = futures[future]
+                try:
+                    values = future.result()
+                    if checkpoint is not None:
+                        for field in pending[company]:
+                            checkpoint.record(company, field, values.get(field, "N/A"))
+                        # Earlier runs' cells + this one's, in field order
+                        values = {field: checkpoint.cells[(company, field)] for field in fields}
+                    rows[company] = {"Company": company, **values}
+                    print(f"✅ Finished analyzing {company}")
+                except Exception as e:
+                    print(f"❌ Error analyzing {company}: {e}")
+                    rows[company] = {"Company": company, **{field: "ERROR" for field in fields}}
+        return [rows[company] for company in companies]
+
     def generate_prompt(self, target_fields: list[str]) -> ChatPromptTemplate:
         """
         Dynamically constructs a prompt based on the specific fields the user wants.
         """
         field_list_str = "\n".join([f"{i+1}. {field}" for i, field in enumerate(target_fields)])
         
-        template_text = """
-        You are an expert financial analyst. Your goal is to extract specific data points from the provided context.
-        
-        Based on ONLY the context provided below, extract the following information:
-        if a company is given that is not included in the context, write N/A for all fields
-        {field_list_str}
-        
-        --- INSTRUCTIONS ---
-        1. Return the values in a single line, separated by pipes (|).
-        2. Follow the exact order of the list above.
-        3. If a piece of information is NOT found in the context, write 'N/A' for that field Do NOT repeat previous values..
-        4. Do NOT write any introduction, explanation, or extra text. Output ONLY the values. 
-        5. Do NOT format as Markdown.
-    
+        prompt = ChatPromptTemplate.from_template(MULTI_FIELD_TEMPLATE)
+        return prompt.partial(field_list_str=field_list_str)
 
-        
-        Example Output for 3 fields:
-        $45 Billion | Tim Cook | Supply Chain Disruptions
+    def _generate(self, prompt: ChatPromptTemplate, variables: dict, docs: list[Document],
+                  llm=None, **key_parts) -> str:
+        """
+        Runs `prompt | llm`, answering from the response cache when possible.
 
-        
-        Context:
-        {context}
-        
-        Analysis:
+        The cache key is the model, the prompt template and fields (`key_parts`), the IDs of
+        the retrieved chunks and the index version, so any change to what the model would
+        see produces a fresh call.
+
+        Args:
+            llm: Optional runnable to use instead of `self.llm` (e.g. with bound options).
+                Anything that changes its output must also be passed in `key_parts`.
         """
-        
-        prompt = ChatPromptTemplate.from_template(template_text)
-        return prompt.partial(field_list_str=field_list_str)
+        llm = llm or self.llm
+        context_chars = len(variables.get("context", ""))
+
+        key = self._cache_key(docs, **key_parts)
+        if key is not None:
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                with span("llm_call", cached=True, context_chars=context_chars):
+                    return cached
+
+        prompt_value = self._build_prompt(prompt, variables, docs)
+
+        # Same as `(prompt | llm).invoke(variables)`, with Ollama's token counts captured
+        usage = TokenUsageHandler()
+        with span("llm_call", cached=False, context_chars=context_chars) as attrs:
+            response = llm.invoke(prompt_value, config={"callbacks": [usage]})
+            attrs["prompt_tokens"] = usage.prompt_tokens
+            attrs["completion_tokens"] = usage.completion_tokens
+
+        if key is not None:
+            self.response_cache.put(key, response, self.index_version)
+        return response
+
+    def _cache_key(self, docs: list[Document], **key_parts) -> Optional[str]:
+        if self.response_cache is None:
+            return None
+        return ResponseCache.make_key(
+            model=served_model(self.llm.model),
+            context=context_fingerprint(docs),
+            index_version=self.index_version,
+            **key_parts,
+        )
+
+    def _build_prompt(self, prompt: ChatPromptTemplate, variables: dict, docs: list[Document]):
+        with span("prompt_build", context_chars=len(variables.get("context", "")), chunks=len(docs)) as attrs:
+            prompt_value = prompt.invoke(variables)
+            attrs["chars"] = len(prompt_value.to_string())
+        return prompt_value
+
+    def _stream(self, prompt: ChatPromptTemplate, variables: dict, docs: list[Document],
+                llm=None, **key_parts) -> Iterator[str]:
+        """
+        Streaming `_generate`: yields the whole answer so far after every token.
+
+        Stops generating once the first non-empty line of the answer is complete (every
+        prompt here asks for a one-line answer). Breaking out of the stream closes the
+        HTTP response, which makes Ollama stop generating too, so this saves real work,
+        not just waiting. The final (possibly shortened) answer goes to the response cache.
+        """
+        llm = llm or self.llm
+        context_chars = len(variables.get("context", ""))
+
+        # Shortened answers differ from full ones, so they are cached separately
+        key = self._cache_key(docs, early_stop="line", **key_parts)
+        if key is not None:
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                with span("llm_call", cached=True, streamed=True, context_chars=context_chars):
+                    yield cached
+                return
+
+        prompt_value = self._build_prompt(prompt, variables, docs)
+
+        text = ""
+        usage = TokenUsageHandler()
+        with span("llm_call", cached=False, streamed=True, context_chars=context_chars) as attrs:
+            stream = llm.stream(prompt_value, config={"callbacks": [usage]})
+            tokens = 0
+            try:
+                for token in stream:
+                    # Ollama's last chunk is empty (it only carries the done stats):
+                    # yielding it would repeat the final value and count a token too many
+                    if not token:
+                        continue
+                    tokens += 1
+                    text += token
+                    answer = text.lstrip()
+                    if "\n" in answer:
+                        # First line complete: stop the model here
+                        text = answer.split("\n", 1)[0]
+                        attrs["stopped_early"] = True
+                        yield text
+                        break
+                    yield text
+            finally:
+                stream.close()
+                attrs["prompt_tokens"] = usage.prompt_tokens
+                # Ollama only reports counts for completed generations
+                attrs["completion_tokens"] = usage.completion_tokens or tokens
+
+        if key is not None:
+            self.response_cache.put(key, text, self.index_version)
 
     def _parse_response(self, raw_response: str, fields: list[str]) -> dict:
         """
@@ -137,21 +707,28 @@ class AnalystAgent:
         # Step A: Retrieve Context
         # We search specifically for the company name to get its relevant chunks
         print(f"🤖 Agent is analyzing: {company_name}...")
-        docs = self.db.retrieve(query=company_name, k=9)
+        docs = self.db.retrieve(query=company_name, k=9, filter=self._company_filter(company_name),
+                               mode=self.retrieval_mode)
         
         if not docs:
             print("❌ No documents found. Returning empty results.")
             return {field: "N/A" for field in target_fields}
             
-        # Combine the text from the retrieved chunks
-        context_text = "\n\n".join([d.page_content for d in docs])
+        # Combine the text from the retrieved chunks (deduplicated, within the token budget)
+        context_text, docs = self._build_context(docs)
         
-        # Step B: Build Chain
+        # Step B: Build Prompt
         prompt_template = self.generate_prompt(target_fields)
-        chain = prompt_template | self.llm
         
-        # Step C: Execute
-        raw_response = chain.invoke({"context": context_text})
+        # Step C: Execute (or answer from the response cache)
+        raw_response = self._generate(
+            prompt_template,
+            {"context": context_text},
+            docs,
+            template=MULTI_FIELD_TEMPLATE,
+            fields=list(target_fields),
+            context_budget=self.context_token_budget,
+        )
 
         # ----------------- DEBUG FIELD -----------------
         print(f"\n🐛 DEBUG RAW OUTPUT for {company_name}:")
@@ -159,7 +736,132 @@ class AnalystAgent:
         print("-" * 20)
         
         # Step D: Parse
-        return self._parse_response(raw_response, target_fields)
+        with span("parse", fields=len(target_fields)):
+            return self._parse_response(raw_response, target_fields)
+
+    def stream_company(self, company_name: str, target_fields: list[str]) -> Iterator[dict]:
+        """
+        Streaming `analyze_company`: yields {field: value} with the fields answered so far
+        (the field being generated holds its partial value) as tokens arrive.
+
+        Generation stops at the end of the "Value | Value" line. The last dict yielded is
+        the final, parsed result with every field present.
+        """
+        print(f"🤖 Agent is streaming: {company_name}...")
+        docs = self.db.retrieve(query=company_name, k=9, filter=self._company_filter(company_name),
+                               mode=self.retrieval_mode)
+
+        if not docs:
+            print("❌ No documents found. Returning empty results.")
+            yield {field: "N/A" for field in target_fields}
+            return
+
+        context_text, docs = self._build_context(docs)
+        prompt_template = self.generate_prompt(target_fields)
+
+        raw_response = ""
+        for raw_response in self._stream(
+            prompt_template,
+            {"context": context_text},
+            docs,
+            template=MULTI_FIELD_TEMPLATE,
+            fields=list(target_fields),
+            context_budget=self.context_token_budget,
+        ):
+            values = [val.strip() for val in raw_response.strip().split("|")][:len(target_fields)]
+            yield dict(zip(target_fields, values))
+
+        with span("parse", fields=len(target_fields)):
+            yield self._parse_response(raw_response, target_fields)
+
+    def _parse_json_response(self, raw_response: str, fields: list[str]) -> tuple[dict, list[str]]:
+        """
+        Internal helper to validate a JSON extraction.
+
+        Returns:
+            tuple[dict, list[str]]: (valid values by field, fields that were missing or malformed)
+        """
+        cleaned_response = raw_response.strip()
+        # Some models still wrap JSON in a Markdown fence
+        if cleaned_response.startswith("```"):
+            cleaned_response = cleaned_response.strip("`").removeprefix("json").strip()
+
+        try:
+            data = json.loads(cleaned_response)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return {}, list(fields)
+
+        values, bad_fields = {}, []
+        for field in fields:
+            value = data.get(field)
+            # Lists are fine (e.g. several risks), nested objects are not
+            if isinstance(value, list) and all(isinstance(v, (str, int, float)) for v in value):
+                value = "; ".join(str(v) for v in value)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = str(value)
+
+            if isinstance(value, str) and value.strip():
+                values[field] = value.strip()
+            else:
+                bad_fields.append(field)
+        return values, bad_fields
+
+    def analyze_company_structured(self, company_name: str, target_fields: list[str]) -> dict:
+        """
+        Hybrid extraction: one JSON-mode call for all fields, then the single-field path
+        ONLY for fields that came back missing or malformed.
+
+        Most companies cost 1 LLM call instead of N, while a failed field still gets the
+        accuracy of a targeted query.
+
+        Returns:
+            dict: {field: value} for every field in `target_fields`.
+        """
+        # Step A: Retrieve Context (same as analyze_company)
+        print(f"🤖 Agent is analyzing (structured): {company_name}...")
+        docs = self.db.retrieve(query=company_name, k=9, filter=self._company_filter(company_name),
+                               mode=self.retrieval_mode)
+        
+        if not docs:
+            print("❌ No documents found. Returning empty results.")
+            return {field: "N/A" for field in target_fields}
+
+        context_text, docs = self._build_context(docs)
+
+        # Step B: Ask for a JSON object, constrained by a schema (Ollama structured outputs)
+        schema = {
+            "type": "object",
+            "properties": {field: {"type": "string"} for field in target_fields},
+            "required": list(target_fields),
+        }
+        prompt = ChatPromptTemplate.from_template(JSON_FIELDS_TEMPLATE)
+        raw_response = self._generate(
+            prompt,
+            {
+                "company": company_name,
+                "field_list_str": "\n".join(f"- {field}" for field in target_fields),
+                "context": context_text,
+            },
+            docs,
+            llm=self.llm.bind(format=schema),
+            template=JSON_FIELDS_TEMPLATE,
+            fields=list(target_fields),
+            company=company_name,
+            output="json",
+            context_budget=self.context_token_budget,
+        )
+
+        # Step C: Validate, then re-query only the broken fields
+        with span("parse", fields=len(target_fields)):
+            values, bad_fields = self._parse_json_response(raw_response, target_fields)
+        if bad_fields:
+            print(f"⚠️ Re-querying {len(bad_fields)}/{len(target_fields)} fields one by one: {bad_fields}")
+            for field in bad_fields:
+                values[field] = self.analyze_single_field(company_name, field)
+
+        return {field: values[field] for field in target_fields}
     
 
 
@@ -167,8 +869,122 @@ class AnalystAgent:
 
 # --- TICKET TEST BLOCK ---
 if __name__ == "__main__":
+    import re
+    import tempfile
+    from src.tracing import get_tracer
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
     print("🧪 STARTING TEST: Full Analyst Pipeline\n")
-    
+
+    # 0. Offline checks: a stub LLM that streams like Ollama (no model needed)
+    class StubLLM:
+        """Replies with `reply`, cut at the first stop sequence, then Ollama's empty final chunk."""
+        model = "stub"
+
+        def __init__(self, reply: str, stop: Optional[list[str]] = None):
+            self.reply, self.stop = reply, stop
+
+        def model_copy(self, update: dict) -> "StubLLM":
+            return StubLLM(self.reply, update.get("stop"))
+
+        def stream(self, prompt_value, config=None):
+            reply = self.reply
+            for stop in self.stop or []:
+                reply = reply.split(stop, 1)[0]
+            yield from [reply[i:i + 3] for i in range(0, len(reply), 3)] + [""]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        offline_vdb = VectorDatabase(persist_directory=tmp, embedding_function=DeterministicFakeEmbedding(size=16),
+                                     embedding_cache_path=None)
+        offline_agent = AnalystAgent(offline_vdb, response_cache_path=None, use_extractors=False)
+        filing = [Document(page_content="Apex Technologies reported revenue of $4.2 billion.",
+                           metadata={"source": "apex.txt", "company": "Apex Technologies"})]
+
+        # A reply that opens with a newline is retried without the stop sequence
+        offline_agent.llm = StubLLM("\n$4.2 billion\nAs stated in the report.")
+        values = list(offline_agent.stream_single_field("Apex Technologies", "Revenue", docs=filing))
+        assert values[-1] == "$4.2 billion", values
+        assert values.count("$4.2 billion") == 1, values  # the empty final chunk adds nothing
+        # ...and an answer that stays empty ends as N/A, not ""
+        offline_agent.llm = StubLLM("\n\n")
+        values = list(offline_agent.stream_single_field("Apex Technologies", "Revenue", docs=filing))
+        assert values[-1] == "N/A", values
+        print("   ✅ Streamed single fields always end with a value")
+
+        # A fake LLM that reads "[Field] value;" facts out of the context it is given
+        class FactLLM:
+            """Answers single-field prompts with the asked field's fact, JSON prompts with all of them."""
+            model = "fact"
+
+            def __init__(self, calls: list, json_mode: bool = False):
+                self.calls, self.json_mode = calls, json_mode
+
+            def model_copy(self, update: dict) -> "FactLLM":
+                return self
+
+            def bind(self, format=None) -> "FactLLM":
+                return FactLLM(self.calls, json_mode=True)
+
+            def invoke(self, prompt_value, config=None) -> str:
+                text = prompt_value.to_string()
+                facts = dict(re.findall(r"\[([^\]]+)\] ([^;]+);", text))
+                self.calls.append(text)
+                if self.json_mode:
+                    fields = re.findall(r"^\s*- (.+)$", text, re.MULTILINE)
+                    return json.dumps({field: facts.get(field, "N/A") for field in fields})
+                field = re.search(r"extract the value for: (.+)", text).group(1).strip()
+                return facts.get(field, "N/A")
+
+        grid_facts = {
+            "Apex Technologies": {"Revenue": "$4.2 billion", "CEO": "Elena Rostova"},
+            "Borealis Energy": {"Revenue": "$910 million", "CEO": "Marcus Hale"},
+        }
+        grid_docs = [
+            Document(page_content=f"{company} annual report. [{field}] {value};",
+                     metadata={"source": f"{company}.txt", "company": company})
+            for company, facts in grid_facts.items() for field, value in facts.items()
+        ]
+        offline_vdb.add_documents(grid_docs, ids=[f"grid-{i}" for i in range(len(grid_docs))])
+        companies, fields = list(grid_facts), ["Revenue", "CEO"]
+        expected_rows = [{"Company": company, **grid_facts[company]} for company in companies]
+
+        def similarity_searches(run) -> tuple[int, int]:
+            # (Chroma queries, embedded queries) made by `run`, read from the tracer
+            get_tracer().reset()
+            run()
+            stages = {row["stage"]: row for row in get_tracer().summary()}
+            return stages.get("similarity_search", {}).get("count", 0), stages.get("embed", {}).get("chunks", 0)
+
+        # retrieve_many: queries sharing a filter go to Chroma together, results stay aligned
+        apex, borealis = (build_filter(company=company) for company in companies)
+        queries = ["Apex Technologies Revenue", "Borealis Energy CEO", "Apex Technologies CEO", "Apex Technologies CEO"]
+        hits = []
+        assert similarity_searches(lambda: hits.extend(
+            offline_vdb.retrieve_many(queries, k=3, filters=[apex, borealis, apex, apex]))) == (2, 3)
+        assert [{doc.metadata["company"] for doc in docs} for docs in hits] == [
+            {"Apex Technologies"}, {"Borealis Energy"}, {"Apex Technologies"}, {"Apex Technologies"}]
+        assert similarity_searches(lambda: offline_vdb.retrieve_many(queries, k=3)) == (1, 3)
+        print("   ✅ retrieve_many sends one Chroma query per distinct filter")
+
+        # analyze_many: every mode returns the same rows, in input order
+        calls = []
+        grid_agent = AnalystAgent(offline_vdb, response_cache_path=None, use_extractors=False)
+        grid_agent.llm = FactLLM(calls)
+        for mode, llm_calls in (("single_field", 4), ("structured", 2), ("session", 4), ("field_major", 4)):
+            calls.clear()
+            rows = []
+            searches, embedded = similarity_searches(lambda: rows.extend(
+                grid_agent.analyze_many(companies, fields, max_concurrency=2, mode=mode)))
+            assert rows == expected_rows, (mode, rows)
+            assert all(list(row) == ["Company", *fields] for row in rows), mode
+            assert len(calls) == llm_calls, (mode, len(calls))
+            if mode == "single_field":
+                assert (searches, embedded) == (2, 4)  # 4 cells, one Chroma query per company partition
+            if mode == "field_major":
+                assert (searches, embedded) == (2, 2)  # one embedded query per field, not per cell
+        print("   ✅ analyze_many modes agree on rows and column order")
+        offline_vdb.close()
+
     # 1. Setup
     test_db_dir = "test_chroma_db"
         #make sure to use param
@@ -1,14 +1,107 @@
 import streamlit as st
 import pandas as pd
-import subprocess
-import sys
+import time
 
 # Import Agent/DB for the ANALYSIS phase (Read-Only)
-from src.database import VectorDatabase
+from src.database import get_vector_database
 from src.agent import AnalystAgent
+from src.model_routing import ModelRouter, DEFAULT_ROUTES
+from src.manifest import IngestManifest
+from src.index_store import IndexStore
+from src.field_table import FieldTable, MULTI_FIELD_PATH, SINGLE_FIELD_PATH
+from src.ingest_worker import DATA_DIR, pipeline_id
+from src.jobs import IngestJob
 
 # --- CONSTANTS ---
-DB_DIR = "test_chroma_db" 
+DB_DIR = "test_chroma_db"  # index root; readers open the version CURRENT points to
+# Redraw the live results table at most this often while tokens stream in
+LIVE_TABLE_REFRESH_SECONDS = 0.15
+
+# --- SHARED RESOURCES ---
+# Built once per process and reused across reruns and sessions.
+# Keyed by index version, so an ingest that changes the index gets a fresh agent
+# (get_vector_database reopens the Chroma client for the new version too).
+@st.cache_resource(max_entries=1, show_spinner=False)
+def get_agent(db_dir: str, index_version: str, route_models: bool = False) -> AnalystAgent:
+    router = ModelRouter(DEFAULT_ROUTES) if route_models else None
+    return AnalystAgent(get_vector_database(db_dir), router=router)
+
+# --- BACKGROUND INGESTION ---
+# The worker runs as a subprocess (file locks die with it) but is no longer awaited:
+# the job lives in session state and the UI polls its progress.
+def current_job():
+    return st.session_state.get("ingest_job")
+
+def start_ingest_job() -> IngestJob:
+    job = current_job()
+    if job is not None and job.running:
+        return job
+    # Optionally precompute the standard fields so later analyses answer instantly
+    args = ["--precompute-fields"] if st.session_state.get("precompute_fields") else []
+    job = IngestJob(args).start()
+    st.session_state["ingest_job"] = job
+    return job
+
+def describe_progress(job: IngestJob) -> tuple[float, str]:
+    """
+    (fraction of files read, one-line summary) for a job's latest progress event.
+    """
+    snap = job.snapshot()
+    files_total = snap.get("files_total") or 0
+    files_read = snap.get("files_read", 0)
+    fraction = min(files_read / files_total, 1.0) if files_total else 0.0
+    summary = (f"{files_read}/{files_total} files read · "
+               f"{snap.get('chunks_embedded', 0)} chunks embedded · "
+               f"{snap.get('chunks_per_sec', 0)} chunks/s")
+    return fraction, summary
+
+def wait_for_job(job: IngestJob):
+    """
+    Blocks this run until `job` finishes, streaming its progress. Stops the run on failure.
+    """
+    with st.status("🔄 Running Ingestion Pipeline...", expanded=True) as status:
+        bar = st.progress(0.0)
+        line = st.empty()
+        while job.running:
+            fraction, summary = describe_progress(job)
+            bar.progress(fraction)
+            line.text(summary)
+            time.sleep(0.5)
+
+        fraction, summary = describe_progress(job)
+        bar.progress(fraction)
+        line.text(summary)
+        if job.status != "succeeded":
+            status.update(label=f"❌ Ingestion {job.status.title()}", state="error")
+            st.error("The worker script did not finish.")
+            st.code(job.log_text(), language="bash") # Show the error log
+            st.stop() # Stop execution here
+
+        st.code(job.log_text(), language="bash")
+        status.update(label="✅ Ingestion Complete!", state="complete", expanded=False)
+
+@st.fragment(run_every=1.0)
+def ingest_panel():
+    """
+    Live ingestion status in the sidebar (re-rendered every second on its own).
+    """
+    job = current_job()
+    if job is None:
+        st.caption("No ingestion started in this session.")
+        return
+
+    fraction, summary = describe_progress(job)
+    if job.running:
+        st.progress(fraction)
+        st.caption(f"⏳ {summary}")
+        if st.button("⛔ Cancel Ingestion"):
+            job.cancel()
+            st.rerun(scope="fragment")
+    else:
+        icons = {"succeeded": "✅", "failed": "❌", "cancelled": "⛔"}
+        st.caption(f"{icons.get(job.status, '')} Last ingestion {job.status}. {summary}")
+        with st.expander("Worker log"):
+            st.code(job.log_text(), language="bash")
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(
@@ -21,7 +114,7 @@ st.set_page_config(
 st.title("🤖 AI Financial Analyst Agent")
 st.markdown(f"""
 This tool uses **LangChain**, **Ollama**, and **ChromaDB**.
-Current Architecture: **Subprocess Ingestion** (Prevents File Locks).
+Current Architecture: **Background Subprocess Ingestion** (Prevents File Locks, never blocks analysis).
 """)
 
 # --- SIDEBAR: SYSTEM CONTROLS ---
@@ -30,12 +123,36 @@ with st.sidebar:
     
     if st.button("📊 Check Database Connection"):
         try:
-            # We connect in Read-Only mode effectively
-            vdb = VectorDatabase(persist_directory=DB_DIR)
-            st.success(f"✅ Connected to: {vdb.persist_directory}")
+            # We connect in Read-Only mode effectively (reuses the shared connection)
+            index_path = IndexStore(DB_DIR).current_path()
+            if index_path is None:
+                st.warning("No index has been built yet. Run an analysis to ingest documents.")
+            else:
+                vdb = get_vector_database(index_path)
+                st.success(f"✅ Connected to: {vdb.persist_directory}")
         except Exception as e:
             st.error(f"Connection failed: {e}")
 
+    st.subheader("📥 Ingestion")
+    st.checkbox(
+        "Precompute standard fields during ingestion",
+        key="precompute_fields",
+        help="Extracts Revenue, CEO, Primary Risks and Future Projections for every detected "
+             "company at ingest time, so analyses of those fields are instant.",
+    )
+    if st.button("🔄 Update Index"):
+        start_ingest_job()
+    ingest_panel()
+
+    st.subheader("🧠 Models")
+    st.checkbox(
+        "Route fields to per-field models",
+        key="route_models",
+        help="Asks for each field separately: llama3.2:1b answers short values (Revenue, CEO), "
+             "llama3.2 writes summaries and retries rejected answers. "
+             "Pull both first: ollama pull llama3.2:1b && ollama pull llama3.2",
+    )
+
 # --- MAIN INPUT AREA ---
 col1, col2 = st.columns(2)
 
@@ -51,6 +168,20 @@ with col2:
     fields_text = st.text_area("Enter fields (one per line):", value=default_fields, height=150)
     target_fields = [f.strip() for f in fields_text.split('\n') if f.strip()]
 
+wait_for_ingest = st.checkbox(
+    "Wait for document changes to be indexed before analyzing",
+    value=True,
+    help="Untick to analyze the current index right away while re-indexing runs in the background.",
+)
+
+def results_frame(rows: list[dict], target_fields: list[str]) -> pd.DataFrame:
+    """
+    Results table: one row per company, requested fields in order, blanks as "N/A".
+    """
+    df = pd.DataFrame(rows)
+    cols = ["Company"] + [f for f in target_fields if f in df.columns]
+    return df.reindex(columns=cols).fillna("N/A")
+
 # --- ANALYSIS LOGIC ---
 if st.button("🚀 Start Analysis", type="primary"):
     if not companies or not target_fields:
@@ -59,50 +190,85 @@ if st.button("🚀 Start Analysis", type="primary"):
         results_area = st.container()
         progress_bar = st.progress(0)
         status_text = st.empty()
+        # Filled cell by cell while the model streams; replaced by the final table
+        live_table = st.empty()
         all_results = []
         
-        # --- PHASE 1: INGESTION (VIA SUBPROCESS) ---
+        # --- PHASE 1: INGESTION (VIA BACKGROUND SUBPROCESS) ---
         # We run the heavy lifting in a separate process.
         # This guarantees the file lock is released when the process dies.
-        with st.status("🔄 Running Ingestion Pipeline...", expanded=True) as status:
-            st.write("🚀 Launching worker process...")
-            
-            try:
-                # Calls 'ingest_worker.py' using the same python interpreter
-                result = subprocess.run(
-                    [sys.executable, "ingest_worker.py"],
-                    capture_output=True,
-                    text=True,
-                    check=True # Raises error if script fails
-                )
-                
-                # Show the logs from the worker script
-                st.code(result.stdout, language="bash")
-                status.update(label="✅ Ingestion Complete!", state="complete", expanded=False)
-                
-            except subprocess.CalledProcessError as e:
-                status.update(label="❌ Ingestion Failed", state="error")
-                st.error(e)
-                st.error("The worker script crashed.")
-                st.error(e.stderr) # Show the error log
-                st.stop() # Stop execution here
+        live_index = IndexStore(DB_DIR).current_path()
+        job = current_job()
+        if job is not None and job.running:
+            if wait_for_ingest or live_index is None:
+                wait_for_job(job)
+            else:
+                st.info("⏳ Ingestion is running in the background. Analyzing the current index.")
+        # Hashing the corpus is far cheaper than spawning the worker,
+        # so skip it entirely when the index already matches the files.
+        elif live_index and IngestManifest.load(live_index).is_unchanged(DATA_DIR, pipeline_id()):
+            st.success("✅ No document changes detected. Reusing existing index.")
+        else:
+            job = start_ingest_job()
+            # With no index at all there is nothing to analyze yet, so always wait
+            if wait_for_ingest or live_index is None:
+                wait_for_job(job)
+            else:
+                st.info("🔄 Documents changed: re-indexing in the background. "
+                        "This analysis uses the current index; re-run once the update is live.")
         
         # --- PHASE 2: ANALYSIS (MAIN PROCESS) ---
-        # Now that the worker is dead and locks are gone, we can safely connect.
+        # Readers never touch the version the worker is building, so this is safe
+        # even while ingestion is still running.
+        precomputed_cells = 0
         try:
-            # Initialize DB Connection
-            shared_vdb = VectorDatabase(persist_directory=DB_DIR)
+            # Pin this run to the version that is live right now.
+            # A later ingest publishes a new version without disturbing this one.
+            index_path = IndexStore(DB_DIR).current_path()
+            if index_path is None:
+                raise RuntimeError("No index available. Add documents and run ingestion first.")
+
+            # Shared DB Connection + Agent (one per index version)
+            shared_vdb = get_vector_database(index_path)
             
-            # Clean Room: Create a fresh Agent wrapper
-            agent = AnalystAgent(shared_vdb)
+            # Clean Room: the agent keeps no per-company state between calls,
+            # so one cached instance is safe to reuse
+            route_models = st.session_state.get("route_models", False)
+            agent = get_agent(index_path, shared_vdb.index_version(), route_models)
+
+            # Values precomputed at ingest (only served while their files are unchanged)
+            field_table = FieldTable.load(index_path)
+            manifest = IngestManifest.load(index_path)
 
             for i, company in enumerate(companies):
                 status_text.text(f"Analyzing {company}...")
                 
                 try:
-                    # Call your monolithic function
-                    company_data = agent.analyze_company(company, target_fields)
+                    # Only values from the prompt this run would use (aliases resolve to the row)
+                    path = SINGLE_FIELD_PATH if route_models else MULTI_FIELD_PATH
+                    company_data = field_table.lookup(company, target_fields, manifest, path=path)
+                    precomputed_cells += len(company_data)
+                    # Only new fields (or companies with changed documents) go to the agent
+                    missing_fields = [f for f in target_fields if f not in company_data]
                     company_data["Company"] = company
+                    if missing_fields:
+                        # Stream the answer into the table as the model writes it.
+                        # Routing picks a model per field, so each field is its own stream.
+                        if route_models:
+                            streams = (
+                                ({field: value} for value in agent.stream_single_field(company, field))
+                                for field in missing_fields
+                            )
+                        else:
+                            streams = [agent.stream_company(company, missing_fields)]
+                        last_draw = 0.0
+                        for stream in streams:
+                            for partial in stream:
+                                company_data.update(partial)
+                                if time.monotonic() - last_draw >= LIVE_TABLE_REFRESH_SECONDS:
+                                    live_table.dataframe(results_frame(all_results + [company_data], target_fields),
+                                                         use_container_width=True)
+                                    last_draw = time.monotonic()
                     all_results.append(company_data)
                     
                 except Exception as e:
@@ -119,16 +285,18 @@ if st.button("🚀 Start Analysis", type="primary"):
         # --- PHASE 3: DISPLAY RESULTS ---
         status_text.text("✅ Analysis Complete!")
         progress_bar.empty()
+        live_table.empty()
         
         with results_area:
             st.subheader("📊 Analysis Results")
             
             if all_results:
-                df = pd.DataFrame(all_results)
-                cols = ["Company"] + [f for f in target_fields if f in df.columns]
-                df = df.reindex(columns=cols).fillna("N/A")
+                df = results_frame(all_results, target_fields)
                 
                 st.dataframe(df, use_container_width=True)
+                if precomputed_cells:
+                    st.caption(f"⚡ {precomputed_cells} of {len(companies) * len(target_fields)} values "
+                               "served from the field table precomputed at ingest.")
                 
                 csv = df.to_csv(index=False).encode('utf-8')
                 st.download_button(
@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import pathlib
+import threading
+from typing import Optional
+import pandas as pd
+
+# Default location for main.py runs; one JSON line per finished (company, field) cell
+CHECKPOINT_PATH = "runs/analysis_checkpoint.jsonl"
+# Partial results are rewritten at most this often while a run is going
+DEFAULT_SNAPSHOT_SECONDS = 30.0
+
+
+class RunCheckpoint:
+    """
+    Append-only record of the finished cells of a batch run, so a crashed run can resume.
+
+    Every finished (company, field) value is appended (and fsynced) as one JSON line the
+    moment it is known. Opening the same file again loads those cells, and the agent
+    skips them. Cells computed against a different index version are ignored, like the
+    response cache. Partial results are also written to CSV (and Parquet, if pyarrow is
+    installed) every `snapshot_seconds`, so they can be used while the run goes on.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_PATH, index_version: Optional[str] = None,
+                 companies: Optional[list[str]] = None, fields: Optional[list[str]] = None,
+                 csv_path: Optional[str] = None, parquet_path: Optional[str] = None,
+                 snapshot_seconds: float = DEFAULT_SNAPSHOT_SECONDS):
+        """
+        Args:
+            path (str): The JSON-lines checkpoint file (created if missing).
+            index_version (str): Version of the index this run reads (`VectorDatabase.index_version()`).
+            companies (list[str]): Row order for the snapshots.
+            fields (list[str]): Column order for the snapshots.
+            csv_path (str): Partial/final results CSV. None = no CSV.
+            parquet_path (str): Partial/final results Parquet file. None = no Parquet.
+            snapshot_seconds (float): Min seconds between partial snapshots.
+        """
+        self.path = pathlib.Path(path)
+        self.index_version = index_version
+        self.companies = list(companies or [])
+        self.fields = list(fields or [])
+        self.csv_path = csv_path
+        self.parquet_path = parquet_path
+        self.snapshot_seconds = snapshot_seconds
+        self.cells: dict[tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+        # 0 = the first finished cell writes a snapshot right away, so there is a
+        # partial results file from the start instead of only after snapshot_seconds
+        self._last_snapshot = 0.0
+
+        stale = self._load()
+        if self.cells:
+            print(f"♻️  Resuming from {self.path}: {len(self.cells)} finished cells.")
+        if stale:
+            print(f"🗑️  Ignoring {stale} checkpointed cells from another index version.")
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        if self._ends_mid_line():
+            # Close the line cut short by the crash, or the next cell would be glued to it
+            self._file.write("\n")
+            self._file.flush()
+
+    def _ends_mid_line(self) -> bool:
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return False
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def _load(self) -> int:
+        """
+        Reads the cells already in the file. Returns how many were skipped as stale.
+        """
+        if not self.path.exists():
+            return 0
+        stale = 0
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short by the crash: that cell simply runs again
+                    continue
+                if self.index_version and entry.get("index_version") != self.index_version:
+                    stale += 1
+                    continue
+                self.cells[(entry["company"], entry["field"])] = entry["value"]
+        return stale
+
+    def is_done(self, company: str, field: str) -> bool:
+        return (company, field) in self.cells
+
+    def pending_fields(self, company: str, fields: list[str]) -> list[str]:
+        return [field for field in fields if not self.is_done(company, field)]
+
+    def record(self, company: str, field: str, value: str):
+        """
+        Appends one finished cell and flushes it to disk before returning.
+        """
+        entry = {
+            "company": company,
+            "field": field,
+            "value": value,
+            "index_version": self.index_version,
+            "at": time.time(),
+        }
+        with self._lock:
+            self.cells[(company, field)] = value
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if time.monotonic() - self._last_snapshot >= self.snapshot_seconds:
+                self._write_snapshot()
+
+    def rows(self) -> list[dict]:
+        """
+        One row per company (in `companies` order), "N/A" for cells not finished yet.
+        """
+        return [
+            {"Company": company, **{field: self.cells.get((company, field), "N/A") for field in self.fields}}
+            for company in self.companies
+        ]
+
+    def _write_snapshot(self):
+        self._last_snapshot = time.monotonic()
+        df = pd.DataFrame(self.rows(), columns=["Company"] + self.fields)
+        if self.csv_path:
+            tmp_path = f"{self.csv_path}.tmp"
+            df.to_csv(tmp_path, index=False)
+            os.replace(tmp_path, self.csv_path)
+        if self.parquet_path:
+            try:
+                tmp_path = f"{self.parquet_path}.tmp"
+                df.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, self.parquet_path)
+            except ImportError:
+                print("⚠️  Parquet output needs pyarrow (pip install pyarrow); writing CSV only.")
+                self.parquet_path = None
+
+    def snapshot(self):
+        """
+        Writes the current (partial) results now.
+        """
+        with self._lock:
+            self._write_snapshot()
+
+    def finish(self) -> bool:
+        """
+        Writes the final results. If every cell is done the checkpoint is removed, so the
+        next run starts fresh; otherwise it is kept and the next run resumes from it.
+
+        Returns:
+            bool: True if the run is complete.
+        """
+        self.snapshot()
+        self.close()
+        missing = sum(not self.is_done(company, field) for company in self.companies for field in self.fields)
+        if missing:
+            print(f"⏸️  {missing} cells unfinished. Run again to resume from {self.path}.")
+        else:
+            self.path.unlink(missing_ok=True)
+        return not missing
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+# --- TICKET TEST BLOCK ---
+
+if __name__ == "__main__":
+    import tempfile
+
+    print("🧪 STARTING TEST: Run checkpoint\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path, csv_path = f"{tmp}/run.jsonl", f"{tmp}/results.csv"
+        options = dict(companies=["Apex", "Tesla"], fields=["Revenue", "CEO"], csv_path=csv_path)
+
+        # 1. The first finished cell is snapshotted at once
+        checkpoint = RunCheckpoint(path, index_version="v1", **options)
+        checkpoint.record("Apex", "Revenue", "$4.2 billion")
+        assert pd.read_csv(csv_path).loc[0, "Revenue"] == "$4.2 billion"
+        checkpoint.record("Apex", "CEO", "Elena Rostova")
+        checkpoint.close()
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"company": "Tesla", "fie')  # a crash mid-write
+        print("   ✅ First cell is snapshotted immediately")
+
+        # 2. A new run resumes from the finished cells and ignores the torn line
+        checkpoint = RunCheckpoint(path, index_version="v1", **options)
+        assert checkpoint.pending_fields("Apex", options["fields"]) == []
+        assert checkpoint.pending_fields("Tesla", options["fields"]) == ["Revenue", "CEO"]
+        checkpoint.close()
+
+        # 3. Cells from another index version are recomputed
+        checkpoint = RunCheckpoint(path, index_version="v2", **options)
+        assert not checkpoint.cells
+        checkpoint.record("Tesla", "CEO", "Elon Musk")
+        checkpoint.close()
+        checkpoint = RunCheckpoint(path, index_version="v2", **options)
+        assert checkpoint.cells == {("Tesla", "CEO"): "Elon Musk"}
+        print("   ✅ Resume skips finished cells of the same index version")
+
+        # 4. finish() removes the checkpoint only once every cell is done
+        for company in options["companies"]:
+            for field in options["fields"]:
+                checkpoint.record(company, field, "x")
+        assert checkpoint.finish()
+        assert not pathlib.Path(path).exists()
+        print("   ✅ A complete run removes its checkpoint")
+
+    print("\n✅ TICKET COMPLETE: Batch runs resume after a crash.")
@@ -0,0 +1,286 @@
+import re
+import json
+import hashlib
+import pathlib
+from collections import deque
+from typing import Iterator, Optional
+
+# Editable list of known issuers: {"companies": [{"company", "ticker", "aliases": [...]}]}
+COMPANY_REGISTRY_PATH = "data/company_registry.json"
+# Bump when `detect` changes, so existing indexes are re-tagged (part of the fingerprint)
+DETECTOR_VERSION = 2
+
+# A mention in the report header (title block) decides the company; mentions further
+# down (filings also name competitors, suppliers and customers) only count when the
+# header names no known company, or to break a tie between header mentions.
+HEADER_CHARS = 1000
+NAME_WEIGHT = 1.0
+# Short tickers collide with ordinary words, so they count for less and must match case exactly
+TICKER_WEIGHT = 0.5
+
+
+class AhoCorasick:
+    """
+    Multi-pattern string matcher: finds every occurrence of every pattern in ONE pass
+    over the text, so the cost is linear in the text length no matter how many
+    patterns (companies) are registered.
+    """
+
+    def __init__(self, patterns: list[str]):
+        """
+        Args:
+            patterns (list[str]): Strings to find (matched case-insensitively).
+        """
+        self.patterns = patterns
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[list[int]] = [[]]
+
+        # 1. Trie of all patterns
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for char in (c.lower() for c in pattern):
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].append(index)
+
+        # 2. Failure links (breadth-first), merging outputs of suffix states
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child].extend(self._output[self._fail[child]])
+
+    def iter_matches(self, text: str) -> Iterator[tuple[int, int]]:
+        """
+        Yields (start offset, pattern index) for every match in `text`.
+        """
+        state = 0
+        # Lower-cased one character at a time, so offsets stay aligned with `text`
+        for position, char in enumerate(c.lower() for c in text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for index in self._output[state]:
+                yield position - len(self.patterns[index]) + 1, index
+
+
+# Dropped from the end of names when resolving user input ("Apex Technologies Inc" -> "apex technologies")
+LEGAL_SUFFIXES = {"inc", "incorporated", "corp", "corporation", "co", "ltd", "limited", "plc", "llc", "sa", "ag"}
+
+
+def normalize_name(name: str) -> str:
+    """
+    Case-, punctuation- and legal-suffix-insensitive form of a company name.
+    """
+    words = re.sub(r"[^a-z0-9&]+", " ", name.lower()).split()
+    while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+def _is_word_boundary(text: str, start: int, end: int) -> bool:
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    return not before.isalnum() and not after.isalnum()
+
+
+class CompanyRegistry:
+    """
+    Known companies (names, aliases, tickers) and a detector that tags a document
+    with the company it is about.
+    """
+
+    def __init__(self, companies: list[dict]):
+        """
+        Args:
+            companies (list[dict]): [{"company": str, "ticker": str, "aliases": list[str]}]
+        """
+        self.companies = companies
+        # One automaton over every name, alias and ticker: (company index, weight, case-sensitive)
+        patterns, self._targets = [], []
+        for company_index, entry in enumerate(companies):
+            for name in {entry["company"], *entry.get("aliases", [])}:
+                patterns.append(name)
+                self._targets.append((company_index, NAME_WEIGHT, False))
+            if entry.get("ticker"):
+                patterns.append(entry["ticker"])
+                self._targets.append((company_index, TICKER_WEIGHT, True))
+        self._matcher = AhoCorasick(patterns)
+
+    @classmethod
+    def load(cls, path: str = COMPANY_REGISTRY_PATH) -> "CompanyRegistry":
+        """
+        Loads the registry JSON. A missing file gives an empty registry (everything is "Unknown").
+        """
+        registry_path = pathlib.Path(path)
+        if not registry_path.exists():
+            print(f"⚠️  No company registry at {registry_path}; companies will be tagged 'Unknown'.")
+            return cls([])
+        data = json.loads(registry_path.read_text(encoding="utf-8"))
+        return cls(data.get("companies", []))
+
+    def fingerprint(self) -> str:
+        """
+        Short hash of the registry content and detector version (tags change when either does).
+        """
+        payload = json.dumps({"detector": DETECTOR_VERSION, "companies": self.companies}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+    def resolve(self, name: str) -> Optional[str]:
+        """
+        The canonical company name for what a user typed: any name, alias or ticker,
+        ignoring case, punctuation and legal suffixes, or an unambiguous leading part
+        of a name ("Apex" -> "Apex Technologies").
+
+        Returns:
+            str | None: The registry's company name, or None if unknown or ambiguous.
+        """
+        key = normalize_name(name)
+        if not key:
+            return None
+        names = [
+            (entry["company"], normalize_name(alias))
+            for entry in self.companies
+            for alias in {entry["company"], *entry.get("aliases", []), entry.get("ticker") or ""}
+            if alias
+        ]
+        exact = {company for company, alias in names if alias == key}
+        if len(exact) == 1:
+            return exact.pop()
+        prefix = {company for company, alias in names if alias.startswith(key + " ")}
+        if not exact and len(prefix) == 1:
+            return prefix.pop()
+        return None
+
+    def _mentions(self, text: str) -> list[tuple[int, int, int]]:
+        """
+        Whole-word mentions as (start, end, pattern index), keeping only the longest
+        match where several overlap: "Apex Technologies Inc." is ONE mention, not also
+        one of "Apex Technologies".
+        """
+        candidates = []
+        for start, index in self._matcher.iter_matches(text):
+            pattern = self._matcher.patterns[index]
+            end = start + len(pattern)
+            if not _is_word_boundary(text, start, end):
+                continue
+            if self._targets[index][2] and text[start:end] != pattern:
+                continue
+            candidates.append((start, end, index))
+
+        # Leftmost-longest: earliest start first, longer first at the same start
+        mentions, covered_until = [], -1
+        for start, end, index in sorted(candidates, key=lambda m: (m[0], -(m[1] - m[0]))):
+            if start >= covered_until:
+                mentions.append((start, end, index))
+                covered_until = end
+        return mentions
+
+    def detect(self, text: str) -> Optional[dict]:
+        """
+        Finds the company a document is about, in one pass over the whole text.
+
+        Every whole-word mention scores for its company (less for tickers). Companies
+        named in the header win; the rest of the text decides among them, or on its own
+        when the header names no known company.
+
+        Returns:
+            dict | None: {"company": ..., "ticker": ...} or None if no company is mentioned.
+        """
+        header_scores: dict[int, float] = {}
+        scores: dict[int, float] = {}
+        first_seen: dict[int, int] = {}
+        for start, _, index in self._mentions(text):
+            company_index, weight, _ = self._targets[index]
+            if start < HEADER_CHARS:
+                header_scores[company_index] = header_scores.get(company_index, 0.0) + weight
+            scores[company_index] = scores.get(company_index, 0.0) + weight
+            first_seen.setdefault(company_index, start)
+
+        if not scores:
+            return None
+        # Header score, then overall score; ties go to the company mentioned first
+        best = max(scores, key=lambda i: (header_scores.get(i, 0.0), scores[i], -first_seen[i]))
+        entry = self.companies[best]
+        return {"company": entry["company"], "ticker": entry.get("ticker")}
+
+
+_registry: Optional[CompanyRegistry] = None
+
+
+def get_company_registry() -> CompanyRegistry:
+    """
+    The registry for this process, loaded once (each chunking worker process loads its own).
+    """
+    global _registry
+    if _registry is None:
+        _registry = CompanyRegistry.load()
+    return _registry
+
+
+# --- TICKET TEST BLOCK ---
+
+if __name__ == "__main__":
+    import random
+
+    print("🧪 STARTING TEST: Company detection\n")
+
+    # 1. Aho-Corasick finds exactly what a brute-force scan finds
+    rng = random.Random(0)
+    patterns = ["he", "she", "his", "hers", "Apex", "apex tech", "x"]
+    for _ in range(200):
+        text = "".join(rng.choice("hesirxApt ") for _ in range(60))
+        found = sorted(AhoCorasick(patterns).iter_matches(text))
+        expected = sorted(
+            (start, index) for index, pattern in enumerate(patterns)
+            for start in range(len(text)) if text[start:start + len(pattern)].lower() == pattern.lower()
+        )
+        assert found == expected, (text, found, expected)
+    print("   ✅ Automaton matches brute force")
+
+    registry = CompanyRegistry([
+        {"company": "Apex Technologies", "ticker": "APX", "aliases": ["Apex Technologies Inc."]},
+        {"company": "GreenField Power", "ticker": "GPWR", "aliases": []},
+        {"company": "Tesla", "ticker": "TSLA", "aliases": ["Tesla Inc."]},
+    ])
+    filler = " The company invested in operations." * 40
+
+    def detected(text: str) -> Optional[str]:
+        result = registry.detect(text)
+        return result["company"] if result else None
+
+    # 2. A long alias is one mention, not also one of the shorter name inside it
+    assert len(registry._mentions("Tesla Inc. reported.")) == 1
+    assert len(registry._mentions("Apex Technologies Inc. and Apex Technologies")) == 2
+
+    # 3. The header company wins over competitors named (even often) in the body
+    report = "GREENFIELD POWER\nQuarterly report of GreenField Power." + filler + " Apex Technologies Inc. competes." * 3
+    assert detected(report) == "GreenField Power", detected(report)
+    report = "GREENFIELD POWER\nQuarterly report." + filler + " Apex Technologies competes." * 6
+    assert detected(report) == "GreenField Power", detected(report)
+    print("   ✅ Header company beats body mentions")
+
+    # 4. No header mention: the body decides; tickers must match case
+    assert detected(filler + " Tesla Inc. delivered cars." + " Tesla grew.") == "Tesla"
+    assert detected("We apx nothing here.") is None
+    assert detected("Ticker: APX") == "Apex Technologies"
+    print("   ✅ Body-only and ticker detection")
+
+    # 5. User input resolves to the canonical name
+    for typed, expected in [("Apex", "Apex Technologies"), ("apex technologies inc", "Apex Technologies"),
+                            ("APEX TECHNOLOGIES, INC.", "Apex Technologies"), ("gpwr", "GreenField Power"),
+                            ("Tesla Inc", "Tesla"), ("Unknown Corp", None), ("", None)]:
+        assert registry.resolve(typed) == expected, (typed, registry.resolve(typed))
+    print("   ✅ Names, aliases, tickers and prefixes resolve")
+
+    print("\n✅ TICKET COMPLETE: Documents are tagged with the company they are about.")
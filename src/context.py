@@ -0,0 +1,138 @@
+import math
+from typing import Optional
+from langchain_core.documents import Document
+
+# Rough size of a llama-family token in English text. Good enough for budgeting
+# without shipping a tokenizer; Ollama reports exact counts after the call (see tracing).
+CHARS_PER_TOKEN = 4
+
+# Ollama runs llama3.2 with a 2048-token context window by default. 1500 tokens of
+# context leaves room for the instructions and the answer instead of silently
+# truncating the prompt (see Challanges_encountered.md #5).
+DEFAULT_CONTEXT_TOKEN_BUDGET = 1500
+
+# Shorter shared edges are treated as coincidence, not splitter overlap
+MIN_OVERLAP_CHARS = 40
+# Don't append a cut-off fragment smaller than this once the budget is nearly spent
+MIN_PARTIAL_CHARS = 200
+SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate token count of `text`.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _overlap(left: str, right: str) -> int:
+    """
+    Length of the longest suffix of `left` that is also a prefix of `right`.
+    """
+    longest = min(len(left), len(right))
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _dedupe(docs: list[Document]) -> list[tuple[Document, str]]:
+    """
+    Drops repeated chunks and trims text that neighbouring chunks of the same file
+    already contain (the splitter repeats up to 400 chars verbatim at every boundary).
+
+    Returns:
+        list[tuple[Document, str]]: Kept chunks with their remaining text, in input order.
+    """
+    kept: list[tuple[Document, str]] = []
+    for doc in docs:
+        text = doc.page_content
+        source = doc.metadata.get("source")
+        for other, other_text in kept:
+            if other.metadata.get("source") != source:
+                continue
+            if text in other_text:
+                text = ""
+                break
+            # Our head repeats the other chunk's tail, or our tail repeats its head
+            head = _overlap(other_text, text)
+            if head:
+                text = text[head:]
+            tail = _overlap(text, other_text)
+            if tail:
+                text = text[:-tail]
+        text = text.strip()
+        if text:
+            kept.append((doc, text))
+    return kept
+
+
+def build_context(docs: list[Document], token_budget: Optional[int] = DEFAULT_CONTEXT_TOKEN_BUDGET) -> tuple[str, list[Document]]:
+    """
+    Assembles the prompt context from retrieved chunks.
+
+    1. Keeps the retrieval (relevance) order.
+    2. Removes duplicate chunks and the text repeated by the splitter overlap.
+    3. Stops adding chunks once `token_budget` is reached (the chunk that crosses the
+       budget is cut, so the most relevant text is never dropped entirely).
+
+    Args:
+        docs (list[Document]): Retrieved chunks, most relevant first.
+        token_budget (int): Max estimated tokens of context. None = no limit.
+
+    Returns:
+        tuple[str, list[Document]]: (context text, the chunks that made it in)
+    """
+    parts, used = [], []
+    remaining = None if token_budget is None else token_budget * CHARS_PER_TOKEN
+
+    for doc, text in _dedupe(docs):
+        if remaining is not None:
+            if parts:
+                remaining -= len(SEPARATOR)
+            if remaining <= 0:
+                break
+            if len(text) > remaining:
+                if parts and remaining < MIN_PARTIAL_CHARS:
+                    break
+                text = text[:remaining]
+            remaining -= len(text)
+        parts.append(text)
+        used.append(doc)
+
+    return SEPARATOR.join(parts), used
+
+
+# --- TICKET TEST BLOCK ---
+
+if __name__ == "__main__":
+    print("🧪 STARTING TEST: Context assembly\n")
+
+    body = " ".join(f"Sentence {i} of the annual report." for i in range(60))
+    cut, overlap_start, end = body.index("Sentence 20"), body.index("Sentence 15"), body.index("Sentence 35")
+    first, second = body[:cut], body[overlap_start:end]  # sentences 15-19 repeated by the splitter
+    docs = [
+        Document(page_content=first, metadata={"source": "apex.txt"}),
+        Document(page_content=second, metadata={"source": "apex.txt"}),
+        Document(page_content=first, metadata={"source": "apex.txt"}),
+        Document(page_content=first, metadata={"source": "tesla.txt"}),
+    ]
+
+    # 1. The overlap is kept once, duplicates of the same file are dropped
+    kept = _dedupe(docs)
+    assert [doc.metadata["source"] for doc, _ in kept] == ["apex.txt", "apex.txt", "tesla.txt"]
+    assert kept[1][1] == body[cut:end].strip()
+    print("   ✅ Splitter overlap and duplicate chunks are removed")
+
+    # 2. Another file sharing the same text is kept (different company, same boilerplate)
+    context, used = build_context(docs, token_budget=None)
+    assert context == SEPARATOR.join([first.strip(), body[cut:end].strip(), first.strip()])
+    assert _overlap("abc", "abc") == 0  # shorter than MIN_OVERLAP_CHARS: coincidence
+
+    # 3. The budget cuts the chunk that crosses it, and never exceeds it
+    context, used = build_context(docs, token_budget=250)
+    assert len(context) <= 250 * CHARS_PER_TOKEN
+    assert len(used) == 2 and context.startswith(first.strip())
+    print("   ✅ Context stays within the token budget")
+
+    print("\n✅ TICKET COMPLETE: Prompts get deduplicated, budgeted context.")
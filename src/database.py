@@ -1,31 +1,91 @@
+import json
+import uuid
 import shutil
+import threading
 import pathlib
 from pathlib import Path
+from typing import Optional, Union
 from langchain_chroma import Chroma
+from chromadb.api.client import SharedSystemClient
 from langchain_ollama import OllamaEmbeddings
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from src.embedding_cache import CachedEmbeddings, DEFAULT_MAX_ENTRIES
+from src.response_cache import served_model
+from src.manifest import IngestManifest
+from src.index_store import IndexStore, VERSIONS_DIR
+from src.tracing import span
+from src.lexical import BM25Index
+
+EMBEDDING_MODEL = "mxbai-embed-large"
+# Kept OUTSIDE the Chroma directory on purpose, so wiping the DB keeps the cache.
+EMBEDDING_CACHE_PATH = "embedding_cache/embeddings.sqlite3"
+
+# Search modes for `retrieve` / `retrieve_many`
+RETRIEVAL_MODES = ("vector", "hybrid", "lexical")
+# Reciprocal Rank Fusion constant (the usual 60) and candidate pool per ranking in hybrid mode
+RRF_K = 60
+HYBRID_CANDIDATES_PER_K = 4
+
+def build_filter(company: Optional[str] = None, year: Optional[str] = None,
+                 doc_type: Optional[str] = None) -> Optional[dict]:
+    """
+    Builds a Chroma `where` filter from the tags added by `load_and_chunk_documents_MD_tagging`.
+
+    Returns:
+        dict | None: None when no tag is given (search the whole corpus).
+    """
+    conditions = [
+        {key: value}
+        for key, value in (("company", company), ("year", year), ("doc_type", doc_type))
+        if value
+    ]
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    # Chroma needs an explicit $and for more than one condition
+    return {"$and": conditions}
+
 
 class VectorDatabase:
     """
     Manages the local vector store (ChromaDB) and embedding generation.
     """
     #we could decouple innit by putting the db and model init in a diff fucntion
-    def __init__(self, persist_directory: str):
+    def __init__(self, persist_directory: str,
+                 embedding_cache_path: Optional[str] = EMBEDDING_CACHE_PATH,
+                 embedding_cache_size: int = DEFAULT_MAX_ENTRIES,
+                 embedding_function: Optional[Embeddings] = None):
         
         """
         Initialize the Vector Database.
         
         Args:
             persist_directory (str): Path where the vector vectors are saved to disk.
+            embedding_cache_path (str): SQLite file for cached embeddings. None disables the cache.
+            embedding_cache_size (int): Max number of cached vectors before LRU eviction.
+            embedding_function (Embeddings): Override the Ollama embedder (used by benchmarks).
         """
         self.persist_directory = persist_directory
         
         # 1. Initialize the Embedding Model
         # Switched to 'mxbai-embed-large' as requested.
         # This model is currently State-of-the-Art (SOTA) for open-source embeddings.
-        self.embedding_function = OllamaEmbeddings(
-            model="mxbai-embed-large",
+        self.embedding_function = embedding_function or OllamaEmbeddings(
+            model=EMBEDDING_MODEL,
         )
+
+        # Wrap it in a persistent cache so the same text (chunk or query) is only
+        # ever embedded once per model, even across DB wipes and collections.
+        # Vectors from another Ollama server (e.g. the benchmark fake) are kept apart.
+        if embedding_cache_path:
+            self.embedding_function = CachedEmbeddings(
+                self.embedding_function,
+                model_name=served_model(EMBEDDING_MODEL),
+                cache_path=embedding_cache_path,
+                max_entries=embedding_cache_size,
+            )
         
         # 2. Initialize Chroma (The Vector Store)
         # This will create the folder 'chroma_db' in your project root if it doesn't exist.
@@ -34,39 +94,281 @@ class VectorDatabase:
             embedding_function=self.embedding_function
         )
 
-    def add_documents(self, documents: list[Document]):
+        # 3. Lexical (BM25) index over the same chunks, persisted next to Chroma
+        self.lexical = BM25Index.load(self.persist_directory)
+
+    def index_version(self) -> str:
+        """
+        Identifies the current index content (from the ingest manifest), for cache invalidation.
+        """
+        return IngestManifest.load(self.persist_directory).fingerprint()
+
+    def add_documents(self, documents: list[Document], ids: Optional[list[str]] = None):
         """
         Embeds and saves a list of Documents to the database.
+
+        Args:
+            documents (list[Document]): The chunks to embed.
+            ids (list[str]): Optional stable IDs. Chroma upserts, so re-adding an ID overwrites it.
         """
         if not documents:
             print("⚠️  No documents provided to add.")
             return
 
         print(f"📥 Adding {len(documents)} documents to ChromaDB...")
-        
-        # Chroma handles the batching and embedding automatically here
-        self.db.add_documents(documents)
+
+        texts = [doc.page_content for doc in documents]
+        if ids is None:
+            ids = [doc.id or str(uuid.uuid4()) for doc in documents]
+
+        # Embed and upsert as two steps (instead of Chroma's add_documents) so each is timed
+        with span("embed", chunks=len(texts), chars=sum(len(t) for t in texts)):
+            embeddings = self.embedding_function.embed_documents(texts)
+        with span("upsert", chunks=len(texts)):
+            self.db._collection.upsert(
+                ids=list(ids),
+                embeddings=embeddings,
+                documents=texts,
+                # Chroma rejects empty metadata dicts, but accepts None
+                metadatas=[doc.metadata or None for doc in documents],
+            )
+        self.lexical.add(list(ids), documents)
         
         print("✅ Documents indexed successfully.")
 
-    def retrieve(self, query: str, k: int = 3) -> list[Document]:
+    def delete_ids(self, ids: list[str]):
+        """
+        Removes specific chunks (e.g. stale chunks of an edited file).
+        """
+        if not ids:
+            return
+        self.db.delete(ids=ids)
+        self.lexical.remove(ids)
+        print(f"🗑️  Removed {len(ids)} stale chunks.")
+
+    def delete_sources(self, sources: list[str]):
+        """
+        Removes every chunk whose `source` metadata matches one of `sources` (deleted files).
         """
-        Performs semantic search for the query.
+        if not sources:
+            return
+        # One Chroma delete and one pass over the lexical index for the whole batch
+        self.db.delete(where={"source": {"$in": list(sources)}})
+        self.lexical.remove(self.lexical.ids_for_sources(sources))
+        for source in sources:
+            print(f"🗑️  Removed all chunks for: {source}")
+
+    def sources_by_company(self) -> dict[str, list[str]]:
+        """
+        {company: [source files]} from the chunk tags (indexes built with tagging only).
+        """
+        raw = self.db._collection.get(include=["metadatas"])
+        companies: dict[str, set] = {}
+        for meta in raw["metadatas"]:
+            if meta and meta.get("company") and meta.get("source"):
+                companies.setdefault(meta["company"], set()).add(meta["source"])
+        return {company: sorted(sources) for company, sources in companies.items()}
+
+    def save_lexical_index(self):
+        """
+        Persists the BM25 index (done by the ingest worker before publishing a version).
+        """
+        self.lexical.save()
+
+    def rebuild_lexical_index(self):
+        """
+        Rebuilds the BM25 index from every chunk stored in Chroma (no embedding calls).
+        Used for indexes built before the lexical index existed.
+        """
+        raw = self.db._collection.get(include=["documents", "metadatas"])
+        self.lexical = BM25Index(self.lexical.path)
+        self.lexical.add(
+            raw["ids"],
+            [Document(page_content=text, metadata=meta or {}) for text, meta in zip(raw["documents"], raw["metadatas"])],
+        )
+        print(f"🔤 Rebuilt lexical index over {len(self.lexical)} chunks.")
+
+    def retrieve(self, query: str, k: int = 3, filter: Optional[dict] = None,
+                 mode: str = "vector") -> list[Document]:
+        """
+        Performs semantic, lexical or hybrid search for the query.
         
         Args:
             query (str): The question or topic to search for.
             k (int): Number of matching chunks to return.
+            filter (dict): Optional Chroma `where` filter (see `build_filter`).
+                It is pushed down to Chroma, so only matching chunks are scanned.
+            mode (str): "vector" (embeddings only), "hybrid" (BM25 and vector rankings fused)
+                or "lexical" (BM25 only: no embedding call, falls back to vector on no hits).
             
         Returns:
             list[Document]: The most relevant text chunks.
         """
-        print(f"🔎 Searching for: '{query}'")
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode!r}")
+        print(f"🔎 Searching for: '{query}'" + (f" where {filter}" if filter else "")
+              + (f" ({mode})" if mode != "vector" else ""))
+
+        if mode != "vector" and len(self.lexical):
+            candidates = k * HYBRID_CANDIDATES_PER_K if mode == "hybrid" else k
+            lexical_ids = self._lexical_search(query, candidates, filter)
+            if mode == "lexical" and lexical_ids:
+                return self._get_by_ids(lexical_ids)
+            if mode == "hybrid":
+                vector_docs = self._vector_search(query, candidates, filter)
+                return self._fuse(lexical_ids, vector_docs, k)
+
+        return self._vector_search(query, k, filter)
+
+    def _vector_search(self, query: str, k: int, filter: Optional[dict]) -> list[Document]:
+        # Embed the query, then search by vector (two steps so each is timed)
+        with span("embed", chunks=1, chars=len(query)):
+            embedding = self.embedding_function.embed_query(query)
+        with span("similarity_search", queries=1, k=k, filtered=bool(filter)) as attrs:
+            results = self.db.similarity_search_by_vector(embedding, k=k, filter=filter)
+            attrs["chunks"] = len(results)
+        return results
+
+    def _lexical_search(self, query: str, k: int, filter: Optional[dict]) -> list[str]:
+        with span("lexical_search", queries=1, k=k, filtered=bool(filter)) as attrs:
+            ids = [chunk_id for chunk_id, _ in self.lexical.search(query, k=k, filter=filter)]
+            attrs["chunks"] = len(ids)
+        return ids
+
+    def _get_by_ids(self, ids: list[str]) -> list[Document]:
+        """
+        Fetches stored chunks by ID, in the given order (a plain lookup, no embedding).
+        """
+        if not ids:
+            return []
+        raw = self.db._collection.get(ids=ids, include=["documents", "metadatas"])
+        found = {
+            doc_id: Document(id=doc_id, page_content=text, metadata=meta or {})
+            for doc_id, text, meta in zip(raw["ids"], raw["documents"], raw["metadatas"])
+        }
+        return [found[doc_id] for doc_id in ids if doc_id in found]
+
+    def _fuse(self, lexical_ids: list[str], vector_docs: list[Document], k: int) -> list[Document]:
+        """
+        Reciprocal Rank Fusion of the BM25 and vector rankings (rank-based, so the two
+        score scales never need to be calibrated against each other).
+        """
+        scores: dict[str, float] = {}
+        for rank, chunk_id in enumerate(lexical_ids):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1 / (RRF_K + rank + 1)
+        by_id = {}
+        for rank, doc in enumerate(vector_docs):
+            by_id[doc.id] = doc
+            scores[doc.id] = scores.get(doc.id, 0.0) + 1 / (RRF_K + rank + 1)
+
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        missing = self._get_by_ids([chunk_id for chunk_id in best if chunk_id not in by_id])
+        by_id.update({doc.id: doc for doc in missing})
+        return [by_id[chunk_id] for chunk_id in best if chunk_id in by_id]
+
+    def retrieve_many(self, queries: list[str], k: int = 3,
+                      filters: Union[dict, list[Optional[dict]], None] = None,
+                      mode: str = "vector") -> list[list[Document]]:
+        """
+        Performs semantic (or lexical / hybrid, see `retrieve`) search for many queries at once.
+
+        All queries are embedded in ONE batched embedding request (repeated queries only
+        once), and queries that share the same filter are sent to Chroma as ONE
+        multi-vector query.
         
-        # similarity_search returns the raw documents
-        results = self.db.similarity_search(query, k=k)
+        Args:
+            queries (list[str]): The questions or topics to search for.
+            k (int): Number of matching chunks to return per query.
+            filters (dict | list[dict]): A Chroma `where` filter for every query,
+                or one filter per query (aligned with `queries`).
+            mode (str): "vector", "hybrid" or "lexical" (same meaning as in `retrieve`).
+            
+        Returns:
+            list[list[Document]]: The most relevant chunks for each query, aligned to `queries`.
+        """
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode!r}")
+        if not queries:
+            return []
+
+        if filters is None or isinstance(filters, dict):
+            per_query_filters = [filters] * len(queries)
+        else:
+            per_query_filters = list(filters)
+            if len(per_query_filters) != len(queries):
+                raise ValueError(f"Got {len(per_query_filters)} filters for {len(queries)} queries.")
+
+        print(f"🔎 Batch searching {len(queries)} queries (k={k}"
+              + (f", {mode})..." if mode != "vector" else ")..."))
+
+        if mode == "vector" or not len(self.lexical):
+            return self._vector_search_many(queries, k, per_query_filters)
+
+        candidates = k * HYBRID_CANDIDATES_PER_K if mode == "hybrid" else k
+        lexical_ids = [
+            self._lexical_search(query, candidates, where)
+            for query, where in zip(queries, per_query_filters)
+        ]
+
+        if mode == "hybrid":
+            vector_docs = self._vector_search_many(queries, candidates, per_query_filters)
+            return [self._fuse(ids, docs, k) for ids, docs in zip(lexical_ids, vector_docs)]
+
+        # Lexical: only queries without a single lexical hit pay for an embedding
+        results = [self._get_by_ids(ids) for ids in lexical_ids]
+        misses = [i for i, docs in enumerate(results) if not docs]
+        if misses:
+            fallback = self._vector_search_many(
+                [queries[i] for i in misses], k, [per_query_filters[i] for i in misses]
+            )
+            for i, docs in zip(misses, fallback):
+                results[i] = docs
+        return results
+
+    def _vector_search_many(self, queries: list[str], k: int,
+                            per_query_filters: list[Optional[dict]]) -> list[list[Document]]:
+        # 1. One embedding call for every DISTINCT query (cache misses only, if the cache is on).
+        # Field-major runs send the same query once per company filter.
+        unique = list(dict.fromkeys(queries))
+        with span("embed", chunks=len(unique), chars=sum(len(q) for q in unique)):
+            vectors = dict(zip(unique, self.embedding_function.embed_documents(unique)))
+        embeddings = [vectors[query] for query in queries]
+
+        # 2. Group queries by filter so each group is a single Chroma query
+        groups = {}
+        for i, where in enumerate(per_query_filters):
+            key = json.dumps(where, sort_keys=True)
+            groups.setdefault(key, (where, []))[1].append(i)
+
+        results: list[list[Document]] = [[] for _ in queries]
+        for where, indexes in groups.values():
+            with span("similarity_search", queries=len(indexes), k=k, filtered=bool(where)) as attrs:
+                raw = self.db._collection.query(
+                    query_embeddings=[embeddings[i] for i in indexes],
+                    n_results=k,
+                    where=where or None,
+                    include=["documents", "metadatas"],
+                )
+                attrs["chunks"] = sum(len(ids) for ids in raw["ids"])
+            for position, i in enumerate(indexes):
+                results[i] = [
+                    Document(id=doc_id, page_content=text, metadata=meta or {})
+                    for doc_id, text, meta in zip(
+                        raw["ids"][position], raw["documents"][position], raw["metadatas"][position]
+                    )
+                ]
         
         return results
 
+    def close(self):
+        """
+        Releases the Chroma client (and its SQLite handles) held by this process.
+        """
+        if self.lexical.dirty:
+            self.lexical.save()
+        _drop_chroma_system(self.persist_directory)
+        if isinstance(self.embedding_function, CachedEmbeddings):
+            self.embedding_function.close()
            
     def create_txt_file_test(self,file_path) -> str:
       
@@ -85,6 +387,73 @@ class VectorDatabase:
         except Exception as e:
             print(f"An error occurred: {e}")
         
+# --- PROCESS-WIDE CONNECTIONS ---
+# Opening OllamaEmbeddings + a Chroma client (SQLite + HNSW load) on every Streamlit rerun
+# is visible latency, so callers share one VectorDatabase per directory instead.
+_open_databases: dict[tuple[str, str], VectorDatabase] = {}  # (index root, version) -> db
+_open_databases_lock = threading.Lock()
+
+
+def _drop_chroma_system(persist_directory: str):
+    """
+    Forgets chromadb's shared in-process client for a directory, so the next Chroma()
+    re-reads it from disk instead of serving a stale in-memory view.
+    """
+    identifiers = {persist_directory, str(pathlib.Path(persist_directory).resolve())}
+    for identifier in identifiers:
+        system = SharedSystemClient._identifier_to_system.pop(identifier, None)
+        SharedSystemClient._identifier_to_refcount.pop(identifier, None)
+        if system is not None:
+            try:
+                system.stop()
+            except Exception as e:
+                print(f"⚠️  Error closing Chroma client for {identifier}: {e}")
+
+
+def _index_key(persist_directory: str) -> tuple[str, str]:
+    """
+    (index root, version) for a directory: versions/<id> under an IndexStore root, or
+    an un-versioned directory keyed by its manifest (which changes with every ingest).
+    """
+    path = pathlib.Path(persist_directory).resolve()
+    if path.parent.name == VERSIONS_DIR:
+        return str(path.parent.parent), path.name
+    return str(path), IngestManifest.load(persist_directory).fingerprint()
+
+
+def get_vector_database(persist_directory: str) -> VectorDatabase:
+    """
+    Returns the process-wide VectorDatabase for `persist_directory`.
+
+    One instance per (index root, version). Opening a version closes the cached ones
+    for older versions of the same root that are no longer current, so a long-running
+    app doesn't pile up Chroma clients (and file handles that block `IndexStore.prune`).
+    """
+    root, version = _index_key(persist_directory)
+
+    with _open_databases_lock:
+        vdb = _open_databases.get((root, version))
+        if vdb is None:
+            vdb = VectorDatabase(persist_directory=persist_directory)
+            _open_databases[(root, version)] = vdb
+
+        keep = {version, IndexStore(root).current_version()}
+        for key in [key for key in _open_databases if key[0] == root and key[1] not in keep]:
+            print(f"🔄 Closing index version {key[1]} (no longer current)...")
+            _open_databases.pop(key).close()
+        return vdb
+
+
+def close_vector_databases():
+    """
+    Closes every shared VectorDatabase (e.g. before deleting an index directory).
+    """
+    with _open_databases_lock:
+        for vdb in _open_databases.values():
+            vdb.close()
+        _open_databases.clear()
+
+
 #this just checks if the chroma db already exists and deletes it if i does does nothing if not
 #this same func should be put in the actual prod folder to clear the db
 def check_clear_database():
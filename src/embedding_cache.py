@@ -0,0 +1,208 @@
+import time
+import array
+import sqlite3
+import hashlib
+import pathlib
+import threading
+from langchain_core.embeddings import Embeddings
+
+# Default cap: ~200k vectors of mxbai-embed-large (1024 floats) is roughly 800MB on disk.
+DEFAULT_MAX_ENTRIES = 200_000
+
+# SQLite limits the number of "?" placeholders per statement
+_SQL_BATCH = 500
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Disk-backed embedding cache that sits between Chroma and the real embedding model.
+
+    Vectors are stored as float32 blobs in SQLite, keyed by sha256(model name + text),
+    and evicted least-recently-used once the cache grows past `max_entries`.
+    Because the cache lives outside the Chroma directory it survives DB wipes.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str, cache_path: str,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            underlying (Embeddings): The embedding model to call on a cache miss.
+            model_name (str): Part of the key, so switching models never returns stale vectors.
+            cache_path (str): Path of the SQLite cache file.
+            max_entries (int): Maximum number of vectors kept before LRU eviction.
+        """
+        self.underlying = underlying
+        self.model_name = model_name
+        self.cache_path = pathlib.Path(cache_path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # One shared connection guarded by a lock (the agent may embed from several threads)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: list[str]) -> dict[str, list[float]]:
+        """
+        Fetches cached vectors for `keys` and refreshes their LRU timestamp.
+        """
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array.array("f", blob).tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})",
+                        [now, *batch],
+                    )
+            self._conn.commit()
+        return found
+
+    def _store(self, entries: dict[str, list[float]]):
+        """
+        Writes new vectors and evicts the least recently used ones past the size cap.
+
+        The size is counted inside the same write transaction as the inserts: the ingest
+        worker and the app write to one file from different processes, so a count kept
+        in memory would be stale and let the cache grow past `max_entries`. Only cache
+        misses get here, and each one already cost an embedding call.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array.array("f", vector).tobytes(), now) for key, vector in entries.items()],
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,),
+                )
+            self._conn.commit()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds a batch of texts, only sending cache misses to the underlying model
+        (in one batched call, with duplicate texts embedded once).
+        """
+        keys = [self._key(t) for t in texts]
+        cached = self._lookup(list(set(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self._store(fresh)
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        """
+        Embeds a search query through the same cache (repeated queries never hit the model twice).
+        """
+        key = self._key(text)
+        cached = self._lookup([key])
+        if key in cached:
+            self.hits += 1
+            return cached[key]
+
+        self.misses += 1
+        vector = self.underlying.embed_query(text)
+        self._store({key: vector})
+        return vector
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- TICKET TEST BLOCK ---
+
+if __name__ == "__main__":
+    import tempfile
+
+    print("🧪 STARTING TEST: Embedding cache\n")
+
+    class CountingEmbeddings(Embeddings):
+        """Fake embedder: a vector derived from the text, and a count of texts embedded."""
+
+        def __init__(self):
+            self.calls = 0
+
+        def embed_documents(self, texts: list[str]) -> list[list[float]]:
+            self.calls += len(texts)
+            return [[float(len(text)), float(sum(map(ord, text)) % 97)] for text in texts]
+
+        def embed_query(self, text: str) -> list[float]:
+            return self.embed_documents([text])[0]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = f"{tmp}/embeddings.sqlite3"
+
+        # 1. Misses go to the model once (duplicates included), then everything is a hit
+        fake = CountingEmbeddings()
+        cache = CachedEmbeddings(fake, "model-a", path)
+        first = cache.embed_documents(["revenue", "ceo", "revenue"])
+        assert fake.calls == 2 and cache.misses == 2 and cache.hits == 1
+        assert cache.embed_documents(["ceo", "revenue"]) == first[1:]
+        assert cache.embed_query("revenue") == first[0]
+        assert fake.calls == 2 and cache.hits == 4
+        print("   ✅ Cached texts are never embedded twice")
+
+        # 2. Another model name never sees model-a's vectors
+        other = CountingEmbeddings()
+        CachedEmbeddings(other, "model-b", path).embed_query("revenue")
+        assert other.calls == 1
+        print("   ✅ Vectors are kept per model")
+
+        # 3. LRU eviction holds across connections (e.g. the worker and the app)
+        small_path = f"{tmp}/small.sqlite3"
+        worker = CachedEmbeddings(CountingEmbeddings(), "m", small_path, max_entries=3)
+        app = CachedEmbeddings(CountingEmbeddings(), "m", small_path, max_entries=3)
+        worker.embed_documents(["a", "b"])
+        time.sleep(0.01)
+        app.embed_documents(["c", "d"])  # app opened before the worker wrote a and b
+        time.sleep(0.01)
+        worker.embed_query("c")           # c becomes the most recently used
+        worker.embed_documents(["e"])
+        rows = app._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        assert rows == 3, rows
+        survivors = CountingEmbeddings()
+        CachedEmbeddings(survivors, "m", small_path, max_entries=3).embed_documents(["c", "d", "e"])
+        assert survivors.calls == 0
+        for cached in (cache, worker, app):
+            cached.close()
+        print("   ✅ The size cap holds with several writers, least recently used go first")
+
+    print("\n✅ TICKET COMPLETE: Embeddings are cached on disk.")
@@ -0,0 +1,276 @@
+import re
+import threading
+from typing import Iterable, Iterator, Optional
+from langchain_core.documents import Document
+
+# Matches at or above this confidence are returned without asking the LLM
+DEFAULT_MIN_CONFIDENCE = 0.8
+
+# A rule match this many chars after one of these words is about someone else
+# ("former CEO John Smith"), so it is skipped
+STALE_ROLE_WINDOW = 30
+STALE_ROLE = r"\b(?:former|previous|prior|interim|acting|outgoing|retired|ex-)\s*\S*\s*$"
+
+MONEY = r"\$\d[\d,]*(?:\.\d+)?(?:\s*(?:billion|million|trillion))?"
+# Capitalised words that are titles or filler, never part of a person's name
+TITLE_WORDS = (
+    "Board|Chair|Chairman|Chairwoman|Chairperson|Founder|Co-Founder|Cofounder|President|Director|"
+    "Executive|Chief|Officer|CEO|Company|Former|Interim|Acting|Current|Vice|Senior|Managing|"
+    "Mr|Ms|Mrs|The|Our|Its|Said"
+)
+_NAME_WORD = rf"(?!(?:{TITLE_WORDS})\b)[A-Z][a-zA-Z'\-]+"
+# "Elena Rostova", "Dr. Amara Singh", "Mary-Jane O'Neil"; starts at a word boundary and
+# skips titles, so "Board Chair Elena Rostova" gives "Elena Rostova"
+PERSON = rf"(?<![\w.])(?:Dr\.\s+)?(?!(?:{TITLE_WORDS})\b)[A-Z][a-z]+(?:\s+{_NAME_WORD}){{1,2}}"
+
+
+def normalize_field(field: str) -> str:
+    return " ".join(field.lower().split())
+
+
+class ExtractionMatch:
+    """
+    A value found by a rule, with how much we trust it.
+    """
+
+    def __init__(self, value: str, confidence: float, extractor: str, chunk_id: Optional[str] = None):
+        self.value = value
+        self.confidence = confidence
+        self.extractor = extractor
+        self.chunk_id = chunk_id
+
+    def __repr__(self):
+        return f"ExtractionMatch({self.value!r}, confidence={self.confidence}, extractor={self.extractor!r})"
+
+
+class PatternExtractor:
+    """
+    Regex rules for one kind of field (e.g. revenue), tried in order over the chunks.
+    """
+
+    def __init__(self, name: str, fields: Iterable[str], patterns: list[tuple[str, float]], flags: int = 0,
+                 agreement_confidence: Optional[float] = None, skip_stale_roles: bool = False):
+        """
+        Args:
+            name (str): Extractor name (shown in stats).
+            fields (Iterable[str]): Field names it answers (case-insensitive), e.g. ["Revenue", "Total Revenue"].
+            patterns (list[tuple[str, float]]): (regex with ONE capture group for the value, confidence),
+                most specific first.
+            flags (int): `re` flags for every pattern.
+            agreement_confidence (float): Confidence when two separate matches give the same
+                value and no match disagrees (for rules too weak to trust on one match).
+            skip_stale_roles (bool): Ignore matches right after "former", "interim", ... (see STALE_ROLE).
+        """
+        self.name = name
+        self.fields = {normalize_field(field) for field in fields}
+        self.patterns = [(re.compile(pattern, flags), confidence) for pattern, confidence in patterns]
+        self.agreement_confidence = agreement_confidence
+        self.skip_stale_roles = skip_stale_roles
+
+    def handles(self, field: str) -> bool:
+        return normalize_field(field) in self.fields
+
+    def _matches(self, docs: list[Document]) -> Iterator[tuple[str, float, Optional[str], str]]:
+        """
+        Every usable match, most specific pattern first, chunks in relevance order.
+        Yields (value, confidence, chunk id, matched text with its lead-in).
+        """
+        for pattern, confidence in self.patterns:
+            for doc in docs:
+                text = doc.page_content
+                for found in pattern.finditer(text):
+                    lead_in = text[max(0, found.start() - STALE_ROLE_WINDOW):found.start()]
+                    if self.skip_stale_roles and _STALE_ROLE.search(lead_in):
+                        continue
+                    value = " ".join(found.group(1).split()).rstrip(".,")
+                    yield value, confidence, doc.id, lead_in + found.group(0)
+
+    def extract(self, docs: list[Document]) -> Optional[ExtractionMatch]:
+        """
+        The first match of the most specific pattern, searching chunks in relevance order.
+        With `agreement_confidence`, a second match of the same value raises the confidence.
+        """
+        if self.agreement_confidence is None:
+            first = next(self._matches(docs), None)
+            if first is None:
+                return None
+            value, confidence, chunk_id, _ = first
+            return ExtractionMatch(value, confidence, self.name, chunk_id)
+
+        # Chunks overlap, so the same sentence can be found twice: count each passage once
+        matches = {}
+        for value, confidence, chunk_id, passage in self._matches(docs):
+            matches.setdefault(passage, (value, confidence, chunk_id))
+        if not matches:
+            return None
+        ordered = sorted(matches.values(), key=lambda match: -match[1])
+        value, confidence, chunk_id = ordered[0]
+        values = {match[0].lower() for match in ordered}
+        if len(ordered) >= 2 and len(values) == 1:
+            confidence = max(confidence, self.agreement_confidence)
+        return ExtractionMatch(value, confidence, self.name, chunk_id)
+
+
+def default_extractors() -> list[PatternExtractor]:
+    """
+    Rules for the fields we ask for most (patterns seen in the sample filings).
+    """
+    return [
+        PatternExtractor(
+            "revenue",
+            ["Revenue", "Total Revenue", "Revenues", "Total Revenues", "Net Revenue", "Sales", "Net Sales"],
+            [
+                (rf"\b(?:Total|Consolidated)\s+(?:Net\s+)?(?:Revenues?|Sales)\b[^.$]{{0,80}}?\b(?:was|were|of|reached|totaled)\s+({MONEY})", 0.95),
+                (rf"\breported\s+(?:total\s+)?(?:revenues?|sales)\s+of\s+({MONEY})", 0.9),
+                # Often a segment's revenue, not the total: the LLM decides
+                (rf"\b(?:revenues?|sales)\b[^.$]{{0,40}}?\b(?:was|of|reached)\s+({MONEY})", 0.5),
+            ],
+            flags=re.IGNORECASE,
+        ),
+        PatternExtractor(
+            "ceo",
+            ["CEO", "Chief Executive Officer", "CEO Name"],
+            [
+                (rf"({PERSON}),\s+(?:(?:President|Chairman|Founder)\s+and\s+)?(?:Chief Executive Officer|CEO)\b", 0.75),
+                (rf"\b(?:Chief Executive Officer|CEO)\s+({PERSON})", 0.7),
+            ],
+            # One name next to "CEO" is often someone else's: only trusted when repeated
+            agreement_confidence=0.9,
+            skip_stale_roles=True,
+        ),
+        PatternExtractor(
+            "fiscal_year",
+            ["Fiscal Year", "FY"],
+            [
+                (r"\bFiscal Year Ended\s+[A-Z][a-z]+\s+\d{1,2},\s+(\d{4})", 0.95),
+                (r"\bfiscal year\s+(\d{4})\b", 0.85),
+                (r"\bPeriod Ended\s+[A-Z][a-z]+\s+\d{1,2},\s+(\d{4})", 0.8),
+            ],
+            flags=re.IGNORECASE,
+        ),
+    ]
+
+
+_STALE_ROLE = re.compile(STALE_ROLE, re.IGNORECASE)
+
+
+class ExtractorRegistry:
+    """
+    Runs rule-based extractors before the LLM and keeps hit-rate statistics.
+
+    Extractors are pluggable: `register` more, or build a registry from your own list.
+    """
+
+    def __init__(self, extractors: Optional[list[PatternExtractor]] = None,
+                 min_confidence: float = DEFAULT_MIN_CONFIDENCE):
+        """
+        Args:
+            extractors (list[PatternExtractor]): Rules to use (defaults to `default_extractors()`).
+            min_confidence (float): Matches below this fall back to the LLM.
+        """
+        self.extractors = default_extractors() if extractors is None else list(extractors)
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict] = {}
+
+    def register(self, extractor: PatternExtractor):
+        # Later registrations win, so a custom rule can override a default one
+        self.extractors.insert(0, extractor)
+
+    def run(self, field: str, docs: list[Document]) -> Optional[ExtractionMatch]:
+        """
+        Returns a confident match for `field`, or None (= ask the LLM).
+        """
+        best = None
+        covered = False
+        for extractor in self.extractors:
+            if not extractor.handles(field):
+                continue
+            covered = True
+            match = extractor.extract(docs)
+            if match and (best is None or match.confidence > best.confidence):
+                best = match
+        hit = best is not None and best.confidence >= self.min_confidence
+
+        with self._lock:
+            stats = self._stats.setdefault(field, {"calls": 0, "covered": 0, "hits": 0})
+            stats["calls"] += 1
+            stats["covered"] += covered
+            stats["hits"] += hit
+        return best if hit else None
+
+    def stats(self) -> dict[str, dict]:
+        """
+        Per field: calls, calls with a matching extractor ("covered"), confident hits
+        (= LLM calls saved) and the hit rate.
+        """
+        with self._lock:
+            return {
+                field: {**stats, "hit_rate": round(stats["hits"] / stats["calls"], 3) if stats["calls"] else 0.0}
+                for field, stats in self._stats.items()
+            }
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        calls = sum(s["calls"] for s in stats.values())
+        hits = sum(s["hits"] for s in stats.values())
+        lines = [f"{'field':<24}{'calls':>8}{'covered':>9}{'hits':>7}{'hit rate':>10}"]
+        for field, s in stats.items():
+            lines.append(f"{field:<24}{s['calls']:>8}{s['covered']:>9}{s['hits']:>7}{s['hit_rate']:>10.0%}")
+        lines.append(f"LLM calls saved: {hits}/{calls}" + (f" ({hits / calls:.0%})" if calls else ""))
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+# --- TICKET TEST BLOCK ---
+
+if __name__ == "__main__":
+    print("🧪 STARTING TEST: Rule-based extractors\n")
+
+    registry = ExtractorRegistry()
+    ceo = next(extractor for extractor in registry.extractors if extractor.name == "ceo")
+
+    def chunk(text: str, chunk_id: str = "c1") -> Document:
+        return Document(id=chunk_id, page_content=text)
+
+    # 1. Titles before the name are not part of it
+    cases = [
+        ("Board Chair Elena Rostova, CEO, opened the call.", "Elena Rostova"),
+        ("Company Founder John Smith, Chief Executive Officer, said results were strong.", "John Smith"),
+        ("Remarked Dr. Amara Singh, President and CEO.", "Dr. Amara Singh"),
+        # 2. The former CEO is not the CEO
+        ("The former CEO John Smith retired in May; current CEO Jane Doe took over.", "Jane Doe"),
+        ("Interim CEO Mark Lee led the quarter.", None),
+    ]
+    for text, expected in cases:
+        match = ceo.extract([chunk(text)])
+        value = match.value if match else None
+        assert value == expected, f"{text!r}: expected {expected!r}, got {value!r}"
+        print(f"   ✅ {text[:50]!r} -> {value!r}")
+
+    # 3. A single CEO match is below the skip threshold: the LLM decides
+    assert registry.run("CEO", [chunk("Board Chair Elena Rostova, CEO, opened the call.")]) is None
+    print("   ✅ One match -> LLM")
+
+    # 4. Two separate passages agreeing are trusted; the same passage twice (chunk overlap) is not
+    agreeing = [chunk("said Elena Rostova, Chief Executive Officer of Apex.", "c1"),
+                chunk("Apex CEO Elena Rostova will present at the conference.", "c2")]
+    match = registry.run("CEO", agreeing)
+    assert match is not None and match.value == "Elena Rostova", match
+    overlap = [chunk("said Elena Rostova, Chief Executive Officer of Apex.", "c1"),
+               chunk("said Elena Rostova, Chief Executive Officer of Apex.", "c2")]
+    assert registry.run("CEO", overlap) is None
+    conflicting = [chunk("said Elena Rostova, Chief Executive Officer of Apex.", "c1"),
+                   chunk("GreenField CEO Amara Singh will present.", "c2")]
+    assert registry.run("CEO", conflicting) is None
+    print("   ✅ Agreement -> rule hit; overlap or conflict -> LLM")
+
+    # 5. Revenue rules unchanged
+    match = registry.run("Revenue", [chunk("Total Revenue for the quarter was $4.2 billion, up 18%.")])
+    assert match is not None and match.value == "$4.2 billion", match
+    print("   ✅ Revenue rule hit")
+
+    print("\n✅ TICKET COMPLETE: Extractors return the right values or defer to the LLM.")
@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import pathlib
+from typing import Iterable, Optional
+
+from src.manifest import IngestManifest
+from src.company_registry import get_company_registry
+
+# Stored inside each index version, next to the ingest manifest
+FIELD_TABLE_FILENAME = "field_table.json"
+# 2: values carry the extraction path that produced them
+FIELD_TABLE_VERSION = 2
+
+# Extraction paths (which prompt produced a value). Precompute uses the app's default
+# one, so a precomputed cell is exactly what the app would have streamed.
+MULTI_FIELD_PATH = "stream_company"
+SINGLE_FIELD_PATH = "stream_single_field"
+PRECOMPUTE_PATH = MULTI_FIELD_PATH
+
+# The fields the UI and main.py ask for; precomputed at ingest when enabled
+PRECOMPUTE_FIELDS = ["Revenue", "CEO", "Primary Risks", "Future Projections"]
+
+
+def normalize_company(company: str) -> str:
+    return " ".join(company.lower().split())
+
+
+def company_key(company: str) -> str:
+    """
+    Row key for a company: its registry name if the registry knows it ("Apex",
+    "APX" -> "apex technologies"), else the name as typed, normalized.
+    """
+    return normalize_company(get_company_registry().resolve(company) or company)
+
+
+class FieldTable:
+    """
+    Field values extracted at ingest time, one row per detected company.
+
+    Each row remembers the source files (and their hashes) it was computed from, so
+    a row is only served while every one of those files is unchanged in the index.
+    """
+
+    def __init__(self, path, rows: Optional[dict] = None, attempts: Optional[dict] = None):
+        """
+        Args:
+            path: Location of the table JSON file.
+            rows (dict): {company: {"sources": {file: sha256}, "fields": {field: value},
+                "paths": {field: extraction path}, "computed_at": float}}
+            attempts (dict): {manifest fingerprint: [fields]} of the completed precompute runs.
+        """
+        self.path = pathlib.Path(path)
+        self.rows = rows or {}
+        self.attempts = attempts or {}
+
+    @classmethod
+    def load(cls, db_dir: str) -> "FieldTable":
+        """
+        Loads the table stored in `db_dir`. Returns an empty table if there is none.
+        """
+        path = pathlib.Path(db_dir) / FIELD_TABLE_FILENAME
+        if not path.exists():
+            return cls(path)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Ignoring unreadable field table at {path}: {e}")
+            return cls(path)
+        if data.get("version") != FIELD_TABLE_VERSION:
+            return cls(path)
+        return cls(path, rows=data.get("rows", {}), attempts=data.get("attempts", {}))
+
+    def save(self):
+        """
+        Writes the table atomically (temp file + rename).
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"version": FIELD_TABLE_VERSION, "rows": self.rows, "attempts": self.attempts}
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def _find(self, company: str) -> Optional[str]:
+        key = company_key(company)
+        for name in self.rows:
+            if company_key(name) == key:
+                return name
+        return None
+
+    def record(self, company: str, sources: dict[str, str], fields: dict[str, str],
+               path: str = PRECOMPUTE_PATH):
+        """
+        Stores (or extends) a company's row. Values for other fields are kept only if
+        they were computed from the same sources.
+
+        Args:
+            path (str): The extraction path that produced `fields` (see MULTI_FIELD_PATH).
+        """
+        name = self._find(company) or get_company_registry().resolve(company) or company
+        row = self.rows.get(name)
+        if row is None or row.get("sources") != sources:
+            row = {"sources": dict(sources), "fields": {}, "paths": {}}
+        row["fields"].update(fields)
+        row["paths"].update({field: path for field in fields})
+        row["computed_at"] = time.time()
+        self.rows[name] = row
+
+    def sync(self, company_sources: dict[str, dict[str, str]]) -> list[str]:
+        """
+        Drops every row whose company now has a different set of files (added, edited
+        or removed), so stale values can never be served.
+
+        Args:
+            company_sources (dict): {company: {file: sha256}} for the index being built.
+
+        Returns:
+            list[str]: The companies that were dropped.
+        """
+        current = {company_key(company): sources for company, sources in company_sources.items()}
+        dropped = [
+            name for name, row in self.rows.items()
+            if current.get(company_key(name)) != row.get("sources")
+        ]
+        for name in dropped:
+            del self.rows[name]
+        return dropped
+
+    def record_attempt(self, fingerprint: str, fields: Iterable[str]):
+        """
+        Remembers that `fields` were precomputed for the index with this manifest
+        fingerprint, even if that produced no rows (e.g. no company was detected).
+        Only the latest index's attempt is kept.
+        """
+        done = set(fields) | set(self.attempts.get(fingerprint, []))
+        self.attempts = {fingerprint: sorted(done)}
+
+    def attempted(self, fingerprint: str, fields: Iterable[str]) -> bool:
+        """
+        True if every one of `fields` was already precomputed for this index content.
+        """
+        return set(fields) <= set(self.attempts.get(fingerprint, []))
+
+    def missing_fields(self, company: str, fields: Iterable[str], path: str = PRECOMPUTE_PATH) -> list[str]:
+        """
+        The fields that still have to be computed for `company` (through `path`).
+        """
+        name = self._find(company)
+        paths = self.rows[name].get("paths", {}) if name is not None else {}
+        return [field for field in fields if paths.get(field) != path]
+
+    def lookup(self, company: str, fields: Iterable[str], manifest: IngestManifest,
+               path: str = PRECOMPUTE_PATH) -> dict[str, str]:
+        """
+        The precomputed values for `company` that are still valid for the index `manifest`
+        describes and were produced by the extraction `path` the caller would use.
+
+        Returns:
+            dict[str, str]: {field: value} for the requested fields that are available
+                (missing fields, unknown companies and stale rows are simply absent).
+        """
+        name = self._find(company)
+        if name is None:
+            return {}
+        row = self.rows[name]
+        sources = row.get("sources", {})
+        fresh = bool(sources) and all(
+            manifest.files.get(source, {}).get("sha256") == digest for source, digest in sources.items()
+        )
+        if not fresh:
+            return {}
+        paths = row.get("paths", {})
+        return {
+            field: row["fields"][field] for field in fields
+            if field in row.get("fields", {}) and paths.get(field) == path
+        }
+
+
+# --- TICKET TEST BLOCK ---
+
+if __name__ == "__main__":
+    import tempfile
+
+    print("🧪 STARTING TEST: Precomputed field table\n")
+
+    import src.company_registry as company_registry
+    company_registry._registry = company_registry.CompanyRegistry([
+        {"company": "Apex Technologies", "ticker": "APX", "aliases": ["Apex Technologies Inc."]},
+    ])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = IngestManifest(pathlib.Path(tmp) / "manifest.json", pipeline="p1",
+                                  files={"apex.txt": {"sha256": "a1", "chunk_ids": []}})
+
+        # 1. Rows are served only while their source files are unchanged
+        table = FieldTable.load(tmp)
+        table.record("Apex Technologies", {"apex.txt": "a1"}, {"Revenue": "$4.2 billion"})
+        assert table.lookup("apex  technologies", ["Revenue", "CEO"], manifest) == {"Revenue": "$4.2 billion"}
+        assert table.missing_fields("Apex Technologies", ["Revenue", "CEO"]) == ["CEO"]
+        assert table.sync({"Apex Technologies": {"apex.txt": "a2"}}) == ["Apex Technologies"]
+        assert table.lookup("Apex Technologies", ["Revenue"], manifest) == {}
+        print("   ✅ Stale rows are dropped")
+
+        # 2. Aliases and tickers find the registry name's row
+        table.record("APX", {"apex.txt": "a1"}, {"Revenue": "$4.2 billion"})
+        assert list(table.rows) == ["Apex Technologies"]
+        assert table.lookup("Apex", ["Revenue"], manifest) == {"Revenue": "$4.2 billion"}
+        assert table.lookup("Apex Technologies Inc.", ["Revenue"], manifest) == {"Revenue": "$4.2 billion"}
+        assert table.lookup("Apexa Corp", ["Revenue"], manifest) == {}
+        print("   ✅ Company names resolve through the registry")
+
+        # 3. A value is only served to callers using the path that produced it
+        table.record("Apex", {"apex.txt": "a1"}, {"CEO": "Elena Rostova"}, path=SINGLE_FIELD_PATH)
+        assert table.lookup("Apex", ["Revenue", "CEO"], manifest) == {"Revenue": "$4.2 billion"}
+        assert table.lookup("Apex", ["Revenue", "CEO"], manifest, path=SINGLE_FIELD_PATH) == {"CEO": "Elena Rostova"}
+        assert table.missing_fields("Apex", ["Revenue", "CEO"]) == ["CEO"]
+        print("   ✅ Values from different prompts are never mixed")
+        table.rows.clear()
+
+        # 4. An attempt that produced no rows still counts for that index content
+        table.record_attempt(manifest.fingerprint(), ["Revenue", "CEO"])
+        table.save()
+        reloaded = FieldTable.load(tmp)
+        assert not reloaded.rows
+        assert reloaded.attempted(manifest.fingerprint(), ["CEO", "Revenue"])
+        assert not reloaded.attempted(manifest.fingerprint(), ["Revenue", "Primary Risks"])
+        manifest.files["apex.txt"]["sha256"] = "a2"
+        assert not reloaded.attempted(manifest.fingerprint(), ["Revenue"])
+        print("   ✅ Precompute attempts are remembered per index content")
+
+    print("\n✅ TICKET COMPLETE: Field values are precomputed once per index.")
@@ -0,0 +1,95 @@
+from typing import Optional
+
+from src.extractors import normalize_field
+
+# Value kinds for single-field extraction. A single value never needs more than a
+# line, so every mode stops at the first newline; the token caps only bound the
+# damage when a model rambles on without one.
+GENERATION_MODES = {
+    # "$4.2 billion", "2024", "18%"
+    "numeric": {"max_tokens": 16, "stop": ["\n"]},
+    # "Elena Rostova", "Austin, Texas"
+    "short_text": {"max_tokens": 32, "stop": ["\n"]},
+    # "Supply chain disruptions; rising interest rates"
+    "text": {"max_tokens": 128, "stop": ["\n"]},
+}
+
+# Fields without an entry here use DEFAULT_MODE
+DEFAULT_FIELD_MODES = {
+    "Revenue": "numeric",
+    "Total Revenue": "numeric",
+    "Net Income": "numeric",
+    "Operating Income": "numeric",
+    "EPS": "numeric",
+    "Fiscal Year": "numeric",
+    "CEO": "short_text",
+    "CFO": "short_text",
+    "Headquarters": "short_text",
+    "Ticker": "short_text",
+}
+DEFAULT_MODE = "text"
+
+
+class GenerationProfile:
+    """
+    Decoding limits for one kind of field: how many tokens the model may generate
+    and which sequences end the answer.
+    """
+
+    def __init__(self, name: str, max_tokens: Optional[int] = None, stop: Optional[list[str]] = None):
+        """
+        Args:
+            name (str): Profile name (shown in traces).
+            max_tokens (int): Ollama `num_predict`. None = model default (unbounded).
+            stop (list[str]): Stop sequences. None = model default.
+        """
+        self.name = name
+        self.max_tokens = max_tokens
+        self.stop = list(stop) if stop else None
+
+    @classmethod
+    def for_mode(cls, mode: str) -> "GenerationProfile":
+        if mode not in GENERATION_MODES:
+            raise ValueError(f"Unknown generation mode '{mode}'. Use one of {list(GENERATION_MODES)}.")
+        return cls(mode, **GENERATION_MODES[mode])
+
+    def cache_key(self) -> dict:
+        # Truncated answers differ from full ones, so limits are part of the response cache key
+        return {"max_tokens": self.max_tokens, "stop": self.stop}
+
+    def apply(self, llm):
+        """
+        A copy of `llm` with this profile's limits (the original is left untouched).
+
+        Uses the model's own `num_predict` / `stop` fields rather than an `options`
+        dict, which would replace every other default option (temperature included).
+        """
+        return llm.model_copy(update={"num_predict": self.max_tokens, "stop": self.stop})
+
+    def __repr__(self):
+        return f"GenerationProfile({self.name!r}, max_tokens={self.max_tokens}, stop={self.stop!r})"
+
+
+class GenerationProfiles:
+    """
+    Maps field names (case-insensitive) to generation profiles.
+    """
+
+    def __init__(self, field_modes: Optional[dict] = None, default: str = DEFAULT_MODE):
+        """
+        Args:
+            field_modes (dict): {field: mode name or GenerationProfile}. Merged over
+                DEFAULT_FIELD_MODES, so only overrides need to be given.
+            default (str): Mode for fields that are not listed.
+        """
+        self.default = GenerationProfile.for_mode(default)
+        self._profiles: dict[str, GenerationProfile] = {}
+        for field, mode in {**DEFAULT_FIELD_MODES, **(field_modes or {})}.items():
+            self.set(field, mode)
+
+    def set(self, field: str, mode):
+        profile = mode if isinstance(mode, GenerationProfile) else GenerationProfile.for_mode(mode)
+        self._profiles[normalize_field(field)] = profile
+
+    def for_field(self, field: str) -> GenerationProfile:
+        return self._profiles.get(normalize_field(field), self.default)
@@ -0,0 +1,260 @@
+import os
+import json
+import stat
+import time
+import uuid
+import shutil
+import pathlib
+from typing import Optional
+
+# Layout under the index root (e.g. "test_chroma_db"):
+#   CURRENT                     -> {"version": "<id>"}  (the only file readers trust)
+#   versions/<id>/              -> one complete Chroma directory + its ingest manifest
+#   versions/<id>/BUILDING      -> only while <id> is unpublished (removed by publish())
+#   ingest.lock                 -> held by the one worker allowed to build at a time
+CURRENT_POINTER = "CURRENT"
+VERSIONS_DIR = "versions"
+BUILD_MARKER = "BUILDING"
+LOCK_FILENAME = "ingest.lock"
+
+
+def remove_readonly(func, path, _):
+    """Helper to force delete read-only files on Windows"""
+    os.chmod(path, stat.S_IWRITE)
+    func(path)
+
+
+class BuildLock:
+    """
+    Exclusive, non-blocking lock on a file under the index root.
+
+    Uses an OS file lock (fcntl / msvcrt), so it is released when the holding process
+    dies, however it dies: a worker killed without running any handler never leaves a
+    stale lock behind.
+    """
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self._file = None
+
+    def acquire(self) -> bool:
+        """
+        Takes the lock. Returns False (without waiting) if another process holds it.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.path, "a+", encoding="utf-8")
+        try:
+            if os.name == "nt":
+                import msvcrt
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # The PID is only informational (e.g. to find the worker holding the lock)
+        lock_file.truncate(0)
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            if os.name == "nt":
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+class IndexStore:
+    """
+    Versioned index directories with an atomically flipped "current" pointer.
+
+    Ingest builds a new version next to the live one and only publishes it once it is
+    complete, so readers keep serving the old version during (or after a crashed) ingest.
+    Readers resolve `current_path()` once and stay pinned to that version for the run.
+    """
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root (str): Index root directory (holds CURRENT and versions/).
+        """
+        self.root = pathlib.Path(root)
+        self.versions_dir = self.root / VERSIONS_DIR
+        self.pointer_path = self.root / CURRENT_POINTER
+
+    def _is_legacy(self) -> bool:
+        # Indexes built before versioning keep Chroma files directly in the root
+        return not self.pointer_path.exists() and (self.root / "chroma.sqlite3").exists()
+
+    def current_version(self) -> Optional[str]:
+        """
+        The published version id, or None if nothing has been published yet.
+        """
+        if not self.pointer_path.exists():
+            return None
+        try:
+            return json.loads(self.pointer_path.read_text(encoding="utf-8"))["version"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️  Unreadable index pointer at {self.pointer_path}: {e}")
+            return None
+
+    def current_path(self) -> Optional[str]:
+        """
+        Directory of the published index (the legacy un-versioned root counts too).
+        Returns None if there is no index at all.
+        """
+        version = self.current_version()
+        if version is not None:
+            return str(self.versions_dir / version)
+        if self._is_legacy():
+            return str(self.root)
+        return None
+
+    def build_lock(self) -> BuildLock:
+        """
+        The lock a worker must hold while it builds, publishes or prunes versions.
+        """
+        return BuildLock(self.root / LOCK_FILENAME)
+
+    def begin_version(self, copy_current: bool = True) -> tuple[str, str]:
+        """
+        Creates a new, unpublished version directory.
+
+        Args:
+            copy_current (bool): Start from a copy of the current index (for incremental
+                updates) instead of an empty directory (full rebuild).
+
+        Returns:
+            tuple[str, str]: (version id, directory to build into)
+        """
+        version = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        build_path = self.versions_dir / version
+        current = self.current_path()
+
+        if copy_current and current is not None:
+            print(f"📋 Copying current index into new version {version}...")
+            shutil.copytree(
+                current, build_path,
+                ignore=shutil.ignore_patterns(VERSIONS_DIR, CURRENT_POINTER, LOCK_FILENAME, "*.tmp"),
+            )
+        else:
+            build_path.mkdir(parents=True)
+        (build_path / BUILD_MARKER).touch()
+        return version, str(build_path)
+
+    def publish(self, version: str):
+        """
+        Atomically makes `version` the current index (write temp file + rename).
+        """
+        (self.versions_dir / version / BUILD_MARKER).unlink(missing_ok=True)
+        tmp_path = self.pointer_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"version": version}), encoding="utf-8")
+        os.replace(tmp_path, self.pointer_path)
+        print(f"🔀 Index version {version} is now live.")
+
+    def discard(self, version: str):
+        """
+        Deletes an unpublished (e.g. failed) version.
+        """
+        if version == self.current_version():
+            raise ValueError(f"Refusing to discard the live index version {version}.")
+        shutil.rmtree(self.versions_dir / version, onerror=remove_readonly)
+
+    def prune(self, keep: int = 2):
+        """
+        Deletes unfinished builds and old versions, keeping the newest `keep` published
+        ones (the live one always survives).
+
+        Unfinished builds are those still marked BUILDING: a worker that was killed
+        without running its cleanup (e.g. cancelled on Windows, where terminate() runs
+        no handler) leaves one behind. Only call this while holding `build_lock()`,
+        otherwise a build in progress would be deleted.
+
+        Readers may still be pinned to the previous version, hence keep=2 by default.
+        Versions that are still locked (open on Windows) are skipped and retried next time.
+        """
+        if not self.versions_dir.exists():
+            return
+        current = self.current_version()
+        versions = sorted(p.name for p in self.versions_dir.iterdir() if p.is_dir())
+        unfinished = [
+            version for version in versions
+            if version != current and (self.versions_dir / version / BUILD_MARKER).exists()
+        ]
+        published = [version for version in versions if version not in unfinished]
+        for version in unfinished:
+            self._remove(version, "unfinished index build")
+        for version in published[:-keep] if keep > 0 else published:
+            if version != current:
+                self._remove(version, "old index version")
+
+    def _remove(self, version: str, label: str):
+        try:
+            shutil.rmtree(self.versions_dir / version, onerror=remove_readonly)
+            print(f"🧹 Removed {label} {version}.")
+        except OSError as e:
+            print(f"⚠️  Could not remove {label} {version} (still open?): {e}")
+
+
+# --- TICKET TEST BLOCK ---
+
+if __name__ == "__main__":
+    import tempfile
+
+    print("🧪 STARTING TEST: Versioned index store\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = IndexStore(tmp)
+
+        # 1. Nothing is live until publish()
+        first, first_path = store.begin_version(copy_current=False)
+        (pathlib.Path(first_path) / "chroma.sqlite3").write_text("v1")
+        assert store.current_path() is None
+        store.publish(first)
+        assert store.current_version() == first
+        assert not (pathlib.Path(first_path) / BUILD_MARKER).exists()
+
+        # 2. A new version starts from a copy of the live one
+        time.sleep(1)
+        second, second_path = store.begin_version()
+        assert (pathlib.Path(second_path) / "chroma.sqlite3").read_text() == "v1"
+        assert store.current_version() == first
+        store.publish(second)
+        print("   ✅ Versions are built aside and published atomically")
+
+        # 3. prune drops builds a killed worker left behind, then keeps the newest `keep`
+        time.sleep(1)
+        orphan, _ = store.begin_version()
+        time.sleep(1)
+        third, _ = store.begin_version()
+        store.publish(third)
+        store.prune(keep=2)
+        remaining = sorted(p.name for p in store.versions_dir.iterdir())
+        assert remaining == [second, third], remaining
+        store.prune(keep=1)
+        assert sorted(p.name for p in store.versions_dir.iterdir()) == [third]
+        print("   ✅ Unfinished builds and old versions are pruned")
+
+        # 4. Only one holder of the build lock at a time
+        lock, other = store.build_lock(), store.build_lock()
+        assert lock.acquire()
+        assert not other.acquire()
+        lock.release()
+        assert other.acquire()
+        other.release()
+        print("   ✅ Build lock is exclusive")
+
+    print("\n✅ TICKET COMPLETE: Ingest never touches the live index.")
@@ -0,0 +1,156 @@
+import time
+import queue
+import threading
+from typing import Callable, Iterable, Optional
+from langchain_core.documents import Document
+
+from src.database import VectorDatabase
+from src.ingestion import iter_chunk_batches
+
+# Marks the end of the producer's stream
+_DONE = object()
+
+
+def stream_into_database(vdb: VectorDatabase, chunks: Iterable[Document], batch_size: int = 64,
+                         queue_depth: int = 2, on_batch: Optional[Callable[[dict], None]] = None) -> dict:
+    """
+    Runs the read -> split -> embed -> upsert pipeline with bounded memory.
+
+    A background thread pulls chunks from `chunks` (reading/splitting lazily) and groups
+    them into batches; the calling thread embeds and upserts each batch as soon as it is
+    ready. The queue between them holds at most `queue_depth` batches, so a slow embed
+    server pauses the reader instead of letting chunks pile up in RAM (back-pressure).
+
+    Args:
+        vdb (VectorDatabase): Destination store.
+        chunks (Iterable[Document]): A lazy stream of chunks (e.g. built on `iter_file_chunks`).
+            Chunks with `doc.id` set are upserted under that ID.
+        batch_size (int): Chunks per embedding/upsert call.
+        queue_depth (int): Max batches buffered between reader and embedder.
+        on_batch (callable): Called with the running stats after every batch.
+
+    Returns:
+        dict: {"batches": int, "chunks": int, "seconds": float}
+    """
+    batches = queue.Queue(maxsize=max(1, queue_depth))
+    stop = threading.Event()
+
+    def hand_over(item) -> bool:
+        # Wait for room in the queue, but give up if the consumer died
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for batch in iter_chunk_batches(chunks, batch_size):
+                if not hand_over(batch):
+                    return
+            hand_over(_DONE)
+        except BaseException as e:
+            hand_over(e)
+
+    reader = threading.Thread(target=produce, name="ingest-reader", daemon=True)
+    reader.start()
+
+    stats = {"batches": 0, "chunks": 0, "seconds": 0.0}
+    start = time.perf_counter()
+    try:
+        while True:
+            item = batches.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+
+            ids = [doc.id for doc in item]
+            vdb.add_documents(item, ids=ids if all(ids) else None)
+
+            stats["batches"] += 1
+            stats["chunks"] += len(item)
+            stats["seconds"] = time.perf_counter() - start
+            rate = stats["chunks"] / stats["seconds"] if stats["seconds"] else 0.0
+            print(f"📦 Batch {stats['batches']}: {len(item)} chunks "
+                  f"(total {stats['chunks']}, {rate:.1f} chunks/s)")
+            if on_batch:
+                on_batch(dict(stats))
+    finally:
+        stop.set()
+        reader.join(timeout=5)
+
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+# --- TICKET TEST BLOCK ---
+
+if __name__ == "__main__":
+    print("🧪 STARTING TEST: Streaming ingestion pipeline\n")
+
+    class FakeVectorDatabase:
+        """Records upserts instead of embedding them."""
+        def __init__(self, fail_on_batch: Optional[int] = None):
+            self.calls = []
+            self.fail_on_batch = fail_on_batch
+
+        def add_documents(self, documents, ids=None):
+            if len(self.calls) + 1 == self.fail_on_batch:
+                raise RuntimeError("embed server went away")
+            self.calls.append((len(documents), ids))
+
+    def make_chunks(n: int, fail_after: Optional[int] = None, with_ids: bool = True):
+        for i in range(n):
+            if i == fail_after:
+                raise ValueError("unreadable file")
+            yield Document(page_content=f"chunk {i}", id=f"doc-{i}" if with_ids else None)
+
+    def run_with_deadline(fn, seconds: float = 10):
+        # Runs fn on a thread so a deadlock fails the test instead of hanging it
+        outcome = {}
+        def target():
+            try:
+                outcome["result"] = fn()
+            except BaseException as e:
+                outcome["error"] = e
+        worker = threading.Thread(target=target, daemon=True)
+        worker.start()
+        worker.join(seconds)
+        assert not worker.is_alive(), "pipeline deadlocked"
+        return outcome
+
+    # 1. Batch and chunk counts, with and without chunk IDs
+    vdb = FakeVectorDatabase()
+    seen = []
+    stats = stream_into_database(vdb, make_chunks(10), batch_size=4, on_batch=seen.append)
+    assert (stats["batches"], stats["chunks"]) == (3, 10)
+    assert [size for size, _ in vdb.calls] == [4, 4, 2]
+    assert vdb.calls[0][1] == ["doc-0", "doc-1", "doc-2", "doc-3"]
+    assert [s["chunks"] for s in seen] == [4, 8, 10]
+
+    vdb = FakeVectorDatabase()
+    stream_into_database(vdb, make_chunks(3, with_ids=False), batch_size=4)
+    assert vdb.calls == [(3, None)]
+    print("   ✅ Batches and chunk counts are correct")
+
+    # 2. A reader error reaches the caller after the batches before it were stored
+    vdb = FakeVectorDatabase()
+    outcome = run_with_deadline(lambda: stream_into_database(vdb, make_chunks(100, fail_after=9),
+                                                             batch_size=4, queue_depth=1))
+    assert isinstance(outcome.get("error"), ValueError)
+    assert [size for size, _ in vdb.calls] == [4, 4]
+    print("   ✅ Reader errors propagate without deadlocking")
+
+    # 3. An embed error stops the reader instead of leaving it blocked on a full queue
+    vdb = FakeVectorDatabase(fail_on_batch=1)
+    started = time.perf_counter()
+    outcome = run_with_deadline(lambda: stream_into_database(vdb, make_chunks(1000),
+                                                             batch_size=4, queue_depth=1))
+    assert isinstance(outcome.get("error"), RuntimeError)
+    assert time.perf_counter() - started < 3
+    print("   ✅ Embed errors propagate and stop the reader")
+
+    print("\n✅ TICKET COMPLETE: Ingestion streams batches with bounded memory.")
@@ -1,61 +1,308 @@
 # ingest_worker.py
 import sys
-import shutil
+import signal
+import threading
 import pathlib
-import os
-import stat
+import argparse
 
 
 from src.database import VectorDatabase
 from src.ingestion import *
+from src.manifest import IngestManifest, MANIFEST_FILENAME, assign_chunk_ids
+from src.index_store import IndexStore
+from src.jobs import emit_progress
+from src.tracing import get_tracer
+from src.ingest_pipeline import stream_into_database
+from src.field_table import FieldTable, PRECOMPUTE_FIELDS, PRECOMPUTE_PATH
+from src.company_registry import get_company_registry
 
 # CONSTANTS
-DB_DIR = "test_chroma_db"
+DB_DIR = "test_chroma_db"  # index root: CURRENT pointer + versions/
 DATA_DIR = "data/txt_files_med_test" 
+# Bump this whenever the chunking settings change: chunk IDs depend on them,
+# so a new pipeline id forces every file to be re-chunked on the next run.
+INGEST_PIPELINE = "load_and_chunk_documents_MD_tagging:1000/200"
 
-def remove_readonly(func, path, _):
-    """Helper to force delete read-only files on Windows"""
-    os.chmod(path, stat.S_IWRITE)
-    func(path)
+def pipeline_id() -> str:
+    """
+    INGEST_PIPELINE plus the company registry's fingerprint: editing the registry
+    changes the company tags, so every file has to be re-tagged on the next run.
+    """
+    return f"{INGEST_PIPELINE}+registry:{get_company_registry().fingerprint()}"
 
-def main():
-    print(f"⚙️ WORKER: Starting Ingestion Process...")
-    
-    # 1. DELETE EXISTING DB
-    # Since this is a fresh process, we can aggressively delete the folder.
-    db_path = pathlib.Path(DB_DIR)
-    if db_path.exists():
-        print(f"🧹 WORKER: Removing old database at {DB_DIR}...")
+class IngestCancelled(Exception):
+    """Raised inside the worker when the job runner cancels it."""
+
+class IngestError(Exception):
+    """The ingest failed or could not start. The live index is unchanged."""
+
+class IndexBusy(IngestError):
+    """Another worker holds the index's build lock."""
+
+def _raise_cancelled(signum, frame):
+    raise IngestCancelled("Ingestion cancelled.")
+
+def select_new_chunks(file_stream, manifest, current_hashes, stale_ids, counts, retag=False):
+    """
+    Filters a stream of (file name, chunks) down to the chunks that are not embedded yet.
+
+    Chunks whose hash already exists in the index keep their vectors. As a side effect
+    each file is recorded in the manifest and its no-longer-present chunk IDs are
+    appended to `stale_ids`.
+
+    With `retag=True` (the tagging changed) every chunk is yielded so its metadata is
+    rewritten; the embedding cache still spares the embedding calls.
+    """
+    for source, chunks in file_stream:
+        old_ids = set(manifest.chunk_ids(source))
+        source_ids = assign_chunk_ids(chunks)
+        counts["files"] += 1
+        counts["chunks"] += len(chunks)
+
+        stale_ids.extend(old_ids.difference(source_ids))
+        for chunk_id, doc in zip(source_ids, chunks):
+            if retag or chunk_id not in old_ids:
+                yield doc
+
+        # Empty files are recorded too, so they don't look "changed" next time
+        manifest.record(source, current_hashes[source], source_ids)
+
+def _field_table_incomplete(index_path, manifest, fields) -> bool:
+    # True unless `fields` were already precomputed for exactly this index content.
+    # Compared against the recorded attempt, not the rows: a corpus with no detected
+    # companies has an empty table forever and would otherwise republish every run.
+    if index_path is None:
+        return True
+    return not FieldTable.load(index_path).attempted(manifest.fingerprint(), fields)
+
+def precompute_field_table(vdb, table, company_sources, fields):
+    """
+    Extracts `fields` for every detected company that doesn't have them yet and stores
+    the values in `table`. A company that fails is skipped (the UI falls back to the agent).
+
+    Uses the app's own extraction path (`stream_company`, PRECOMPUTE_PATH), so a row never
+    mixes precomputed values with ones the app would have produced from another prompt.
+
+    Returns:
+        int: The number of companies that failed.
+    """
+    # Imported here: only this optional stage needs the LLM
+    from src.agent import AnalystAgent
+
+    agent = AnalystAgent(vdb)
+    companies = [company for company in company_sources if company != "Unknown"]
+    failed = 0
+    for i, company in enumerate(companies):
+        missing = table.missing_fields(company, fields)
+        if not missing:
+            continue
+        emit_progress("precompute", company=company, companies_done=i, companies_total=len(companies))
         try:
-            shutil.rmtree(db_path, onerror=remove_readonly)
-            print("   ✅ Old database removed.")
+            # The last dict streamed is the final, parsed row
+            for values in agent.stream_company(company, missing):
+                pass
         except Exception as e:
-            print(f"   ❌ Error removing DB: {e}")
-            sys.exit(1)
+            print(f"   ⚠️ Could not precompute fields for {company}: {e}")
+            failed += 1
+            continue
+        table.record(company, company_sources[company], values, path=PRECOMPUTE_PATH)
+        print(f"   📋 Precomputed {len(missing)} fields for {company}.")
+    return failed
 
-    # 2. LOAD DOCUMENTS
-    print(f"📂 WORKER: Loading docs from {DATA_DIR}...")
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest text filings into the Chroma index.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Build a fresh index version from scratch instead of updating a copy of the current one.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes used to read/split files in parallel (0 = one per CPU core).")
+    parser.add_argument("--batch-size", type=int, default=64,
+                        help="Chunks per embedding/upsert call.")
+    parser.add_argument("--queue-depth", type=int, default=2,
+                        help="Max batches buffered between the file reader and the embedder.")
+    parser.add_argument("--precompute-fields", nargs="*", metavar="FIELD",
+                        help="Extract these fields for every detected company and store them with the index "
+                             f"(no FIELD = {', '.join(PRECOMPUTE_FIELDS)}). Needs Ollama's LLM.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """
+    Process entry point (the job runner's subprocess): `run` with a SIGTERM handler,
+    exiting with status 1 if the ingest fails.
+    """
+    # A cancel from the job runner (SIGTERM) unwinds through the normal error path,
+    # so the half-built version is discarded and the live index is left alone.
+    # (Windows has no SIGTERM handler: see IngestJob.cancel.)
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _raise_cancelled)
     try:
-        raw_docs = load_and_chunk_documents(DATA_DIR)
-        
-        if not raw_docs:
-            print("   ⚠️ No documents found. Exiting.")
-            sys.exit(0)
-            
-        print(f"   found {len(raw_docs)} chunks.")
-
-        # 3. EMBED & STORE
-        # Initialize DB (creates new folder)
-        print("🧠 WORKER: Embedding data (this may take a moment)...")
-        vdb = VectorDatabase(persist_directory=DB_DIR)
-        vdb.add_documents(raw_docs)
-        print("   ✅ Embedding complete.")
+        run(argv)
+    except IngestError:
+        sys.exit(1)
+
+def run(argv=None) -> str:
+    """
+    Runs one ingest in the calling process. Installs no signal handlers and never exits,
+    so a caller such as main.py can carry on with the current version when it fails.
+
+    Returns:
+        str: "up_to_date" (nothing to do) or "published" (a new version is live).
+
+    Raises:
+        IndexBusy: Another worker (e.g. the app's) is building this index right now.
+        IngestError: The ingest failed; its build was discarded.
+    """
+    args = parse_args(argv)
+    print(f"⚙️ WORKER: Starting Ingestion Process...")
+    store = IndexStore(DB_DIR)
+
+    # One worker per index at a time, even across app sessions: two concurrent
+    # builds would each publish a version missing the other's files.
+    lock = store.build_lock()
+    if not lock.acquire():
+        print(f"   ❌ Another ingestion is already running on {DB_DIR}. Try again once it has finished.")
+        raise IndexBusy(f"Another ingestion is already running on {DB_DIR}.")
+    try:
+        return run_ingest(args, store)
+    finally:
+        lock.release()
+
+def run_ingest(args, store) -> str:
+    """
+    Brings the index in `store` up to date with DATA_DIR (steps 1-8). Caller holds the build lock.
+    """
+    current_path = store.current_path()
+    
+    # 1. DIFF THE CORPUS AGAINST THE LIVE INDEX'S MANIFEST
+    # A full rebuild simply starts from an empty manifest.
+    print(f"📂 WORKER: Hashing docs in {DATA_DIR}...")
+    try:
+        if args.rebuild or current_path is None:
+            manifest = IngestManifest(pathlib.Path(DB_DIR) / MANIFEST_FILENAME)
+        else:
+            manifest = IngestManifest.load(current_path)
+        current_hashes = IngestManifest.scan(DATA_DIR)
+        pipeline = pipeline_id()
+        changed, removed = manifest.diff(current_hashes, pipeline)
+        retag = bool(manifest.files) and manifest.pipeline != pipeline
+
+        precompute_pending = args.precompute_fields is not None and _field_table_incomplete(
+            current_path, manifest, args.precompute_fields or PRECOMPUTE_FIELDS
+        )
+        if not changed and not removed and not precompute_pending:
+            print("   ✅ Index is up to date. Nothing to embed.")
+            print("🏁 WORKER: Task Finished.")
+            return "up_to_date"
+
+        print(f"   {len(changed)} new/changed files, {len(removed)} removed files.")
+        emit_progress("plan", files_total=len(changed), files_removed=len(removed))
+    except Exception as e:
+        print(f"   ❌ Critical Error in Worker: {e}")
+        raise IngestError(str(e)) from e
+
+    # 2. BUILD INTO A NEW VERSION (the live index is never touched)
+    # Incremental runs start from a copy of the live index; --rebuild starts empty.
+    version, build_path = store.begin_version(copy_current=not args.rebuild)
+    print(f"🏗️ WORKER: Building index version {version}...")
+    vdb = None
+    try:
+        manifest.path = pathlib.Path(build_path) / MANIFEST_FILENAME
+        vdb = VectorDatabase(persist_directory=build_path)
+
+        # Versions built before the lexical index existed get one from their stored chunks
+        if not len(vdb.lexical) and manifest.files:
+            vdb.rebuild_lexical_index()
+
+        # 3. DROP VECTORS FOR DELETED FILES
+        if removed:
+            vdb.delete_sources(removed)
+            for source in removed:
+                manifest.forget(source)
+
+        # Files the manifest has never seen may still have untracked vectors
+        # (e.g. an index built before manifests existed), so clear them first.
+        untracked = [source for source in changed if source not in manifest.files]
+        if untracked:
+            vdb.delete_sources(untracked)
+
+        # 4. STREAM ONLY THE CHANGED FILES -> EMBED & STORE ONLY NEW CHUNKS
+        # Files are read and split lazily, one at a time, and new chunks are embedded in
+        # batches as they arrive, so memory stays flat no matter how big the corpus is.
+        # The tagged loader adds company/ticker/year/doc_type so the agent can pre-filter.
+        print("🧠 WORKER: Embedding new chunks (this may take a moment)...")
+        file_stream = iter_file_chunks(DATA_DIR, file_names=changed, tagging=True, workers=args.workers)
+        stale_ids, counts = [], {"files": 0, "chunks": 0}
+        new_chunks = select_new_chunks(file_stream, manifest, current_hashes, stale_ids, counts, retag=retag)
+
+        def report(batch_stats):
+            emit_progress(
+                "batch",
+                version=version,
+                files_read=counts["files"],
+                files_total=len(changed),
+                chunks_embedded=batch_stats["chunks"],
+                chunks_per_sec=round(batch_stats["chunks"] / batch_stats["seconds"], 1) if batch_stats["seconds"] else 0.0,
+            )
+
+        stats = stream_into_database(vdb, new_chunks, batch_size=args.batch_size,
+                                     queue_depth=args.queue_depth, on_batch=report)
+
+        vdb.delete_ids(stale_ids)
+        print(f"   ✅ Embedded {stats['chunks']} chunks in {stats['batches']} batches, "
+              f"reused {counts['chunks'] - stats['chunks']}.")
+
+        # 5. COMMIT THE MANIFEST (AND THE LEXICAL INDEX)
+        manifest.pipeline = pipeline
+        vdb.save_lexical_index()
+        manifest.save()
+
+        # 6. KEEP THE PRECOMPUTED FIELD TABLE IN STEP WITH THE NEW VERSION
+        # Rows for companies whose files changed are always dropped; they are only
+        # recomputed (with the LLM) when --precompute-fields is given.
+        table = FieldTable.load(build_path)
+        if table.rows or args.precompute_fields is not None:
+            company_sources = {
+                company: {source: manifest.files[source]["sha256"] for source in sources if source in manifest.files}
+                for company, sources in vdb.sources_by_company().items()
+            }
+            dropped = table.sync(company_sources)
+            if dropped:
+                print(f"   🧾 Dropped stale precomputed fields for: {', '.join(dropped)}")
+            if args.precompute_fields is not None:
+                print("📋 WORKER: Precomputing fields for detected companies...")
+                fields = args.precompute_fields or PRECOMPUTE_FIELDS
+                # Companies that failed (e.g. Ollama was down) keep the attempt open,
+                # so the next "Update Index" retries them
+                if not precompute_field_table(vdb, table, company_sources, fields):
+                    table.record_attempt(manifest.fingerprint(), fields)
+            table.save()
+
+        # 7. FLIP THE POINTER
+        # Until publish() the old version stays live, so a crash anywhere above
+        # leaves readers untouched and the next run simply retries.
+        vdb.close()
+        store.publish(version)
+        emit_progress("published", version=version, files_read=counts["files"],
+                      files_total=len(changed), chunks_embedded=stats["chunks"])
         
     except Exception as e:
         print(f"   ❌ Critical Error in Worker: {e}")
-        sys.exit(1)
+        if vdb is not None:
+            vdb.close()
+        try:
+            store.discard(version)
+        except Exception as cleanup_error:
+            print(f"   ⚠️ Could not remove failed build {version}: {cleanup_error}")
+        raise IngestError(str(e)) from e
+
+    # 8. CLEAN UP OLD VERSIONS (readers may still be pinned to the previous one)
+    # and builds a killed worker left behind
+    store.prune(keep=2)
 
     print("🏁 WORKER: Task Finished.")
+    return "published"
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Run from the project root: python -m src.ingest_worker
+    # Set ANALYST_TRACE_FILE=traces/ingest.jsonl to also keep the per-span trace.
+    main()
+    get_tracer().print_summary("Ingest timing summary")
@@ -1,159 +1,252 @@
-
+import os
 import re
+import time
 import pathlib
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, Optional
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+from src.tracing import get_tracer
+from src.company_registry import get_company_registry
 
 
 
 
-def load_and_chunk_documents(data_dir: str = "data/txt_files_med_test") -> list[Document]:
+def _select_files(path: pathlib.Path, file_names: Optional[Iterable[str]] = None) -> list[pathlib.Path]:
     """
-    Loads .txt files from the specified directory and splits them into chunks.
-    
-    Args:
-        data_dir (str): Relative path to the directory containing text files.
-        
-    Returns:
-        list[Document]: A list of LangChain Document objects ready for embedding.
+    Returns the .txt files in `path` (sorted, so chunk order is stable between runs),
+    optionally restricted to `file_names`.
     """
-    
-    # 1. Setup Pathlib for OS-agnostic path handling
-    # This automatically handles Windows ('\') vs Mac/Linux ('/') backslashes
-    path = pathlib.Path(data_dir)
-    
-    if not path.exists():
-        raise FileNotFoundError(f"The directory '{path}' does not exist. Please create it and add .txt files.")
-    
-    documents = []
-    
-    # 2. Define the Splitter
+    files = sorted(path.glob("*.txt"))
+    if file_names is not None:
+        wanted = set(file_names)
+        files = [f for f in files if f.name in wanted]
+    return files
+
+
+def _make_splitter(tagging: bool) -> RecursiveCharacterTextSplitter:
+    """
+    The splitter used by each loader. The settings are part of the chunk IDs,
+    so bump INGEST_PIPELINE in ingest_worker.py when changing them.
+    """
+    if tagging:
+        # Keeping your larger chunk settings to prevent context fragmentation
+        return RecursiveCharacterTextSplitter(
+            chunk_size=1000,
+            chunk_overlap=200,
+            length_function=len,
+            separators=["\n\n", "\n", ".", " "],
+            is_separator_regex=False,
+        )
     # 1000/200 is a standard "Goldilocks" zone for keeping context intact
-    splitter = RecursiveCharacterTextSplitter(
+    return RecursiveCharacterTextSplitter(
         chunk_size=2000,
         chunk_overlap=400,
         length_function=len,
         is_separator_regex=False,
     )
+
+
+def _detect_metadata(file_name: str, text_content: str) -> dict:
+    """
+    Enriches a file's metadata with company / ticker / year / doc type.
+    """
+    # We look at the first 1000 chars to identify the date
+    header_text = text_content[:1000]
     
-    print(f"📂 Scanning directory: {path.resolve()}")
+    # Default metadata
+    meta = {"source": file_name}
+    
+    # A. Detect Company
+    # One pass over the whole document with the registry's multi-pattern matcher,
+    # so the cost per file stays the same however many issuers data/company_registry.json lists.
+    detected = get_company_registry().detect(text_content)
+    if detected:
+        meta["company"] = detected["company"]
+        if detected.get("ticker"):
+            meta["ticker"] = detected["ticker"]
+    else:
+        meta["company"] = "Unknown"
+    
+    # B. Detect Year (looks for 2024, 2025, etc.)
+    year_match = re.search(r"\b(202[4-9])\b", header_text)
+    if year_match:
+        meta["year"] = year_match.group(1)
+    
+    # C. Detect Doc Type
+    if "Quarterly" in header_text or "10-Q" in header_text:
+        meta["doc_type"] = "10-Q"
+    elif "Annual" in header_text or "10-K" in header_text:
+        meta["doc_type"] = "10-K"
+    
+    return meta
 
-    # 3. Iterate through all .txt files
-    for file_path in path.glob("*.txt"):
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                text_content = f.read()
-            
-            # Skip empty files
-            if not text_content.strip():
-                print(f"⚠️  Skipping empty file: {file_path.name}")
-                continue
 
-            # 4. Create Documents and Split
-            # We explicitly add the 'source' metadata so we know which file came from where
+def _chunk_file(file_path: pathlib.Path, tagging: bool = False) -> Optional[list[Document]]:
+    """
+    Reads and splits ONE file.
+
+    Returns:
+        list[Document] | None: The chunks ([] for an empty file), or None if the file failed to load.
+    """
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            text_content = f.read()
+        
+        # Skip empty files
+        if not text_content.strip():
+            print(f"⚠️  Skipping empty file: {file_path.name}")
+            return []
+
+        # Create Documents and Split
+        # We explicitly add the 'source' metadata so we know which file came from where
+        # The splitter will automatically copy this metadata to every chunk!
+        if tagging:
+            meta = _detect_metadata(file_path.name, text_content)
+        else:
             #TODO update to tag fy, quarter etc
-            raw_doc = Document(
-                page_content=text_content,
-                metadata={"source": file_path.name} 
-            )
-            
-            # Split the single large document into smaller chunks
-            chunks = splitter.split_documents([raw_doc])
-            documents.extend(chunks)
-            
+            meta = {"source": file_path.name}
+
+        raw_doc = Document(
+            page_content=text_content,
+            metadata=meta
+        )
+        
+        # Split the single large document into smaller chunks
+        chunks = _make_splitter(tagging).split_documents([raw_doc])
+        
+        if tagging:
+            print(f"✅ Loaded {file_path.name}: {len(chunks)} chunks. Tags: {meta}")
+        else:
             print(f"✅ Loaded {file_path.name}: {len(chunks)} chunks created.")
-            
-        except Exception as e:
-            print(f"❌ Error loading {file_path.name}: {e}")
+        return chunks
+        
+    except Exception as e:
+        print(f"❌ Error loading {file_path.name}: {e}")
+        return None
 
-    return documents
 
-def load_and_chunk_documents_MD_tagging(data_dir: str) -> list[Document]:
+def _timed_chunk_file(file_path: pathlib.Path, tagging: bool = False) -> tuple[Optional[list[Document]], float]:
     """
-    Loads .txt files from the specified directory and splits them into chunks
-    with enriched metadata tags.
+    `_chunk_file` plus its duration in ms (timed where it runs, so pool workers report
+    their own split time rather than the parent's wait).
     """
-    
-    # 1. Setup Pathlib
+    start = time.perf_counter()
+    chunks = _chunk_file(file_path, tagging)
+    return chunks, (time.perf_counter() - start) * 1000
+
+
+def _iter_chunked_in_pool(files: list[pathlib.Path], tagging: bool,
+                          workers: int) -> Iterator[tuple[pathlib.Path, tuple[Optional[list[Document]], float]]]:
+    """
+    Chunks files in a process pool, yielding results in the original file order.
+
+    Only `workers * 2` files are in flight at once, so a slow consumer (the embedder)
+    holds the pool back instead of letting finished chunks pile up in memory.
+    """
+    pending = deque()
+    remaining = iter(files)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for file_path in islice(remaining, workers * 2):
+            pending.append((file_path, pool.submit(_timed_chunk_file, file_path, tagging)))
+
+        while pending:
+            file_path, future = pending.popleft()
+            next_file = next(remaining, None)
+            if next_file is not None:
+                pending.append((next_file, pool.submit(_timed_chunk_file, next_file, tagging)))
+            yield file_path, future.result()
+
+
+def iter_file_chunks(data_dir: str, file_names: Optional[Iterable[str]] = None,
+                     tagging: bool = False, workers: int = 1) -> Iterator[tuple[str, list[Document]]]:
+    """
+    Streams a directory one file at a time, so only one file's text is in memory.
+
+    Args:
+        data_dir (str): Relative path to the directory containing text files.
+        file_names (Iterable[str]): Optional subset of file names to load.
+        tagging (bool): Use the metadata-enriching loader (company / year / doc type).
+        workers (int): Processes used to read/split files in parallel. 1 = in this process,
+            0 = one per CPU core. Output order (and therefore chunk IDs) is the same either way.
+
+    Yields:
+        tuple[str, list[Document]]: (file name, its chunks). Files that fail to load are skipped.
+    """
+    # Setup Pathlib for OS-agnostic path handling
+    # This automatically handles Windows ('\') vs Mac/Linux ('/') backslashes
     path = pathlib.Path(data_dir)
     
     if not path.exists():
-        raise FileNotFoundError(f"The directory '{path}' does not exist.")
-    
-    documents = []
-    
-    # 2. Define the Splitter
-    # Keeping your larger chunk settings to prevent context fragmentation
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len,
-        separators=["\n\n", "\n", ".", " "],
-        is_separator_regex=False,
-    )
-    
+        raise FileNotFoundError(f"The directory '{path}' does not exist. Please create it and add .txt files.")
+
     print(f"📂 Scanning directory: {path.resolve()}")
 
-    # 3. Iterate through all .txt files
-    for file_path in path.glob("*.txt"):
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                text_content = f.read()
-            
-            if not text_content.strip():
-                print(f"⚠️  Skipping empty file: {file_path.name}")
-                continue
+    files = _select_files(path, file_names)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
 
-            # --- NEW METADATA ENRICHMENT LOGIC ---
-            # We look at the first 1000 chars to identify the company/date
-            header_text = text_content[:1000]
-            
-            # Default metadata
-            meta = {"source": file_path.name}
-            
-            # A. Detect Company
-            if "Apex Technologies" in header_text:
-                meta["company"] = "Apex Technologies"
-                meta["ticker"] = "APX"
-            elif "GreenField Power" in header_text:
-                meta["company"] = "GreenField Power"
-                meta["ticker"] = "GPWR"
-            elif "OmniMarkets" in header_text:
-                meta["company"] = "OmniMarkets Global Group"
-                meta["ticker"] = "OMG"
-            else:
-                meta["company"] = "Unknown"
-            
-            # B. Detect Year (looks for 2024, 2025, etc.)
-            year_match = re.search(r"\b(202[4-9])\b", header_text)
-            if year_match:
-                meta["year"] = year_match.group(1)
-            
-            # C. Detect Doc Type
-            if "Quarterly" in header_text or "10-Q" in header_text:
-                meta["doc_type"] = "10-Q"
-            elif "Annual" in header_text or "10-K" in header_text:
-                meta["doc_type"] = "10-K"
-            
-            # -------------------------------------
-
-            # 4. Create Document with Rich Metadata
-            # The splitter will automatically copy this metadata to every chunk!
-            raw_doc = Document(
-                page_content=text_content,
-                metadata=meta
-            )
-            
-            # Split the single large document into smaller chunks
-            chunks = splitter.split_documents([raw_doc])
-            
-            documents.extend(chunks)
-            
-            print(f"✅ Loaded {file_path.name}: {len(chunks)} chunks. Tags: {meta}")
-            
-        except Exception as e:
-            print(f"❌ Error loading {file_path.name}: {e}")
+    if workers == 1 or len(files) <= 1:
+        results = ((file_path, _timed_chunk_file(file_path, tagging)) for file_path in files)
+    else:
+        results = _iter_chunked_in_pool(files, tagging, workers)
+
+    tracer = get_tracer()
+    for file_path, (chunks, split_ms) in results:
+        tracer.record(
+            "split", split_ms, file=file_path.name,
+            chunks=len(chunks or []), chars=sum(len(c.page_content) for c in chunks or []),
+        )
+        if chunks is not None:
+            yield file_path.name, chunks
+
+
+def iter_chunk_batches(chunks: Iterable[Document], batch_size: int = 64) -> Iterator[list[Document]]:
+    """
+    Groups a stream of chunks into fixed-size batches (the last one may be smaller).
+    """
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
+
+def load_and_chunk_documents(data_dir: str = "data/txt_files_med_test", file_names: Optional[Iterable[str]] = None, workers: int = 1) -> list[Document]:
+    """
+    Loads .txt files from the specified directory and splits them into chunks.
+    
+    Args:
+        data_dir (str): Relative path to the directory containing text files.
+        file_names (Iterable[str]): Optional subset of file names to load (used by incremental ingest).
+        workers (int): Processes used to chunk files in parallel (0 = one per CPU core).
+        
+    Returns:
+        list[Document]: A list of LangChain Document objects ready for embedding.
+    """
+    documents = []
+    for _, chunks in iter_file_chunks(data_dir, file_names, tagging=False, workers=workers):
+        documents.extend(chunks)
+    return documents
+
+def load_and_chunk_documents_MD_tagging(data_dir: str, file_names: Optional[Iterable[str]] = None, workers: int = 1) -> list[Document]:
+    """
+    Loads .txt files from the specified directory and splits them into chunks
+    with enriched metadata tags.
+
+    Args:
+        data_dir (str): Relative path to the directory containing text files.
+        file_names (Iterable[str]): Optional subset of file names to load (used by incremental ingest).
+        workers (int): Processes used to chunk files in parallel (0 = one per CPU core).
+    """
+    documents = []
+    for _, chunks in iter_file_chunks(data_dir, file_names, tagging=True, workers=workers):
+        documents.extend(chunks)
     return documents
 
 
@@ -0,0 +1,231 @@
+import os
+import re
+import json
+import math
+import pathlib
+from typing import Optional
+from langchain_core.documents import Document
+
+# Stored next to the Chroma files (and the ingest manifest) in each index version
+BM25_FILENAME = "bm25_index.json"
+BM25_VERSION = 1
+
+# Standard BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Keeps money and percentages together: "$4.2", "18%", "2,500"
+TOKEN_PATTERN = re.compile(r"\$?[a-z0-9]+(?:[.,][0-9]+)*%?")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were which with".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def matches_filter(metadata: dict, where: Optional[dict]) -> bool:
+    """
+    Evaluates a Chroma-style `where` filter (as built by `build_filter`) against metadata.
+    Supports plain equality, {"$eq": ...}, {"$in": [...]} and "$and" / "$or".
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            if "$eq" in condition and value != condition["$eq"]:
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class BM25Index:
+    """
+    In-process inverted index with BM25 scoring over the same chunk IDs as Chroma.
+
+    Only term frequencies and chunk metadata are stored (the text itself stays in Chroma),
+    so a lexical search never needs the embedding server.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Location of the index JSON file.
+        """
+        self.path = pathlib.Path(path)
+        self.postings: dict[str, dict[str, int]] = {}
+        self.docs: dict[str, dict] = {}  # chunk id -> {"len": int, "meta": dict}
+        # chunk id -> its distinct terms, so a removal only touches that chunk's postings.
+        # Derived from `postings`, so it is rebuilt on load rather than stored.
+        self.doc_terms: dict[str, list[str]] = {}
+        self.total_length = 0
+        self.dirty = False
+
+    @classmethod
+    def load(cls, db_dir: str) -> "BM25Index":
+        """
+        Loads the index stored in `db_dir`. Returns an empty index if there is none.
+        """
+        index = cls(pathlib.Path(db_dir) / BM25_FILENAME)
+        if not index.path.exists():
+            return index
+        try:
+            data = json.loads(index.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Ignoring unreadable lexical index at {index.path}: {e}")
+            return index
+        if data.get("version") != BM25_VERSION:
+            return index
+
+        index.docs = data.get("docs", {})
+        index.postings = data.get("postings", {})
+        for token, postings in index.postings.items():
+            for chunk_id in postings:
+                index.doc_terms.setdefault(chunk_id, []).append(token)
+        index.total_length = sum(entry["len"] for entry in index.docs.values())
+        return index
+
+    def save(self):
+        """
+        Writes the index atomically (temp file + rename).
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"version": BM25_VERSION, "docs": self.docs, "postings": self.postings}
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, ids: list[str], documents: list[Document]):
+        """
+        Indexes chunks. Re-adding an ID replaces it (same upsert semantics as Chroma).
+        """
+        self.remove([chunk_id for chunk_id in ids if chunk_id in self.docs])
+        for chunk_id, doc in zip(ids, documents):
+            tokens = tokenize(doc.page_content)
+            counts: dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                self.postings.setdefault(token, {})[chunk_id] = count
+            self.docs[chunk_id] = {"len": len(tokens), "meta": dict(doc.metadata)}
+            self.doc_terms[chunk_id] = list(counts)
+            self.total_length += len(tokens)
+        self.dirty = True
+
+    def remove(self, ids: list[str]):
+        """
+        Drops chunks from the index (unknown IDs are ignored).
+        """
+        for chunk_id in ids:
+            entry = self.docs.pop(chunk_id, None)
+            if entry is None:
+                continue
+            self.total_length -= entry["len"]
+            for token in self.doc_terms.pop(chunk_id, ()):
+                postings = self.postings.get(token)
+                if postings is None:
+                    continue
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self.postings[token]
+            self.dirty = True
+
+    def ids_for_sources(self, sources: list[str]) -> list[str]:
+        """
+        Every chunk ID whose `source` metadata is one of `sources` (one pass over the index).
+        """
+        wanted = set(sources)
+        return [chunk_id for chunk_id, entry in self.docs.items() if entry["meta"].get("source") in wanted]
+
+    def search(self, query: str, k: int = 3, filter: Optional[dict] = None) -> list[tuple[str, float]]:
+        """
+        Scores every chunk that shares a term with the query.
+
+        Returns:
+            list[tuple[str, float]]: Up to `k` (chunk id, BM25 score), best first.
+        """
+        if not self.docs:
+            return []
+        n_docs = len(self.docs)
+        avg_length = self.total_length / n_docs or 1.0
+        allowed = {}  # memoised filter result per chunk
+
+        scores: dict[str, float] = {}
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings.items():
+                if filter:
+                    if chunk_id not in allowed:
+                        allowed[chunk_id] = matches_filter(self.docs[chunk_id]["meta"], filter)
+                    if not allowed[chunk_id]:
+                        continue
+                length_norm = 1 - BM25_B + BM25_B * self.docs[chunk_id]["len"] / avg_length
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+# --- TICKET TEST BLOCK ---
+
+if __name__ == "__main__":
+    import tempfile
+
+    print("🧪 STARTING TEST: BM25 lexical index\n")
+
+    chunks = {
+        "apex-0": Document(page_content="Apex revenue was $4.2 billion, up 18%.", metadata={"source": "apex.txt", "company": "Apex"}),
+        "apex-1": Document(page_content="Apex faces supply chain risks.", metadata={"source": "apex.txt", "company": "Apex"}),
+        "tesla-0": Document(page_content="Tesla revenue was $96.8 billion.", metadata={"source": "tesla.txt", "company": "Tesla"}),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = BM25Index.load(tmp)
+        index.add(list(chunks), list(chunks.values()))
+
+        # 1. Exact figures are tokens of their own, and filters apply
+        assert tokenize("Revenue was $4.2 billion, up 18%.") == ["revenue", "$4.2", "billion", "up", "18%"]
+        assert index.search("$4.2 billion")[0][0] == "apex-0"
+        assert [chunk_id for chunk_id, _ in index.search("revenue", k=5, filter={"company": {"$eq": "Tesla"}})] == ["tesla-0"]
+        print("   ✅ Search ranks exact terms and honours filters")
+
+        # 2. The saved index scores exactly like the one in memory
+        index.save()
+        reloaded = BM25Index.load(tmp)
+        assert len(reloaded) == 3 and reloaded.total_length == index.total_length
+        assert reloaded.search("revenue billion", k=3) == index.search("revenue billion", k=3)
+        print("   ✅ Persisted index round-trips")
+
+        # 3. Removing a file's chunks removes every trace of them; re-adding replaces
+        assert sorted(reloaded.doc_terms["apex-1"]) == sorted(index.doc_terms["apex-1"])
+        reloaded.remove(reloaded.ids_for_sources(["apex.txt", "missing.txt"]))
+        assert list(reloaded.docs) == ["tesla-0"] and list(reloaded.doc_terms) == ["tesla-0"]
+        assert "risks" not in reloaded.postings and "$4.2" not in reloaded.postings
+        assert reloaded.postings["revenue"] == {"tesla-0": 1}
+        assert reloaded.total_length == reloaded.docs["tesla-0"]["len"]
+        reloaded.add(["tesla-0"], [Document(page_content="Tesla revenue was $97.7 billion.", metadata={"source": "tesla.txt"})])
+        assert "$96.8" not in reloaded.postings and len(reloaded) == 1
+        assert reloaded.postings["$97.7"] == {"tesla-0": 1}
+        reloaded.dirty = False
+        reloaded.remove(["apex-0", "unknown"])
+        assert not reloaded.dirty
+        print("   ✅ Removed and replaced chunks leave no stale postings")
+
+    print("\n✅ TICKET COMPLETE: Hybrid retrieval has a persisted lexical index.")
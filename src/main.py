@@ -1,7 +1,13 @@
+import argparse
 import pandas as pd
 from src.agent import AnalystAgent
 from src.database import VectorDatabase
-from src.ingestion import load_and_chunk_documents 
+from src.model_routing import ModelRouter, DEFAULT_ROUTES
+from src.ingestion import load_and_chunk_documents
+from src.index_store import IndexStore
+from src import ingest_worker
+from src.tracing import get_tracer
+from src.checkpoint import RunCheckpoint, CHECKPOINT_PATH
 
 
 
@@ -20,32 +26,15 @@ It happens when a variable (like context) isn't properly wiped clean between loo
 
  #reinitilzing agent causes AGENTcontext to blank every to you make one
 """
-def test_single_field(all_results,companies,fields_to_extract, agent,vdb):
+def test_single_field(all_results,companies,fields_to_extract, agent,vdb, max_concurrency=4):
      
     #for longer documents, more specifc lookups
-    for company in companies:
-        print(f"\n🏢 Analyzing {company}...")
-        
-        # Create a dictionary to hold results for THIS company
-        company_data = {"Company": company}
-        #current_agent = AnalystAgent(vdb)
-        try:
-            # --- THE NEW LOOP ---
-            for field in fields_to_extract:
-                # We ask the agent for ONE thing at a time
-                value = agent.analyze_single_field(company, field)
-                
-                # Save it
-                company_data[field] = value
-                print(f"   ✅ {field}: {value}")
-            
-            # Append the completed row to our master list
-            all_results.append(company_data)
-            
-        except Exception as e:
-            print(f"❌ Error analyzing {company}: {e}")
+    # Every company x field cell runs as its own single-field extraction,
+    # fanned out over a bounded thread pool instead of a serial double loop.
+    print(f"\n🏢 Analyzing {len(companies)} companies x {len(fields_to_extract)} fields...")
+    all_results.extend(agent.analyze_many(companies, fields_to_extract, max_concurrency=max_concurrency))
 
-        # Output Results
+    # Output Results
     if all_results:
         df = pd.DataFrame(all_results)
 
@@ -75,48 +64,28 @@ from src.database import VectorDatabase
 from src.agent import AnalystAgent
 
 
-#this creates a new agent every time a new company is seached with the same db
-def run_clean_room_analysis(companies, fields_to_extract,vdb):
+#each company x field cell is an isolated single-field call, run concurrently with the same db
+#mode="structured" asks for all fields in one JSON call per company and only re-queries broken fields
+#mode="field_major" embeds one query per field and searches it in every company's partition (wide tables)
+#pass a RunCheckpoint to make the run resumable (finished cells are skipped on the next run)
+def run_clean_room_analysis(companies, fields_to_extract,vdb, max_concurrency=4, mode="single_field", checkpoint=None):
     print("🚀 Starting 'Clean Room' Analysis Pipeline...\n")
     
     # 1. HEAVY LIFTING: Initialize Database ONCE outside the loop
     # We load the data from disk here. This takes time (e.g., 2 seconds).
     
-    
-    all_results = []
-
-    # 2. OUTER LOOP: Iterate Companies
-    for company in companies:
-        print(f"\n🏢 Processing: {company}")
-        print("   Build: Creating fresh Agent instance...")
-        
-        # --- THE NEW APPROACH ---
-        # We spawn a BRAND NEW agent just for this company.
-        # It has zero memory of previous iterations.
-        # We pass 'shared_vdb' so we don't waste time reloading files.
-        disposable_agent = AnalystAgent(vdb)
-        
-        # Dictionary to hold this company's data
-        row_data = {"Company": company}
-        
-        # 3. INNER LOOP: Iterate Fields (Sequential Extraction)
-        for field in fields_to_extract:
-            try:
-                # The disposable agent focuses on one field at a time
-                value = disposable_agent.analyze_single_field(company, field)
-                row_data[field] = value
-                print(f"   ✅ {field}: {value}")
-                
-            except Exception as e:
-                print(f"   ❌ Error on {field}: {e}")
-                row_data[field] = "ERROR"
-        
-        # 4. TEARDOWN
-        # When the loop restarts, 'disposable_agent' is overwritten/deleted.
-        # No variables survive to the next company.
-        all_results.append(row_data)
+    # 2. FAN OUT: Iterate Companies x Fields (Sequential Extraction, run concurrently)
+    # analyze_single_field keeps no state on the agent: each cell gets its own retrieval
+    # and context, so no variables survive from one company to the next.
+    # We pass 'shared_vdb' so we don't waste time reloading files.
+    agent = AnalystAgent(vdb)
+    print(f"   Build: {len(companies) * len(fields_to_extract)} cells, max {max_concurrency} in flight...")
+    all_results = agent.analyze_many(companies, fields_to_extract, max_concurrency=max_concurrency, mode=mode,
+                                     checkpoint=checkpoint)
+    if checkpoint is not None:
+        checkpoint.finish()
 
-    # 5. Output Results
+    # 3. Output Results
     if all_results:
         df = pd.DataFrame(all_results)
         
@@ -132,12 +101,20 @@ def run_clean_room_analysis(companies, fields_to_extract,vdb):
 
         
 
-def test_list_fields(all_results,companies,fields_to_extract, agent):
+def test_list_fields(all_results,companies,fields_to_extract, agent, checkpoint=None):
      
     for company in companies:
         try:
+            # Resume: only the fields a previous (crashed) run didn't finish
+            pending = checkpoint.pending_fields(company, fields_to_extract) if checkpoint else fields_to_extract
+            if not pending:
+                print(f"♻️  {company} already done, skipping.")
             # We explicitly ask for context around the company name
-            data = agent.analyze_company(company, fields_to_extract)
+            data = agent.analyze_company(company, pending) if pending else {}
+            if checkpoint:
+                for field in pending:
+                    checkpoint.record(company, field, data.get(field, "N/A"))
+                data = {field: checkpoint.cells[(company, field)] for field in fields_to_extract}
             data["Company"] = company
             all_results.append(data)
             print(f"✅ Finished analyzing {company}")
@@ -145,6 +122,10 @@ def test_list_fields(all_results,companies,fields_to_extract, agent):
         except Exception as e:
             print(f"❌ Error analyzing {company}: {e}")
 
+    # Final CSV/Parquet; the checkpoint is kept only if some company failed
+    if checkpoint:
+        checkpoint.finish()
+
     # Output Results
     if all_results:
         df = pd.DataFrame(all_results)
@@ -175,39 +156,54 @@ def check_clear_database():
         else:  
             print("db did not exist before")
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest new filings, then compare companies field by field.")
+    parser.add_argument("--mode", choices=["company", "single_field", "structured", "session", "field_major"],
+                        help="'company' = one pipe-delimited call per company; the others are the "
+                             "AnalystAgent.analyze_many modes (default: company, or single_field with --route-models).")
+    parser.add_argument("--route-models", action="store_true",
+                        help="Route single-field extraction per field: llama3.2:1b for short values, llama3.2 "
+                             "for summaries and rejected answers (see src/model_routing.py).")
+    args = parser.parse_args(argv)
+    if args.mode is None:
+        # Routing only applies to single-value prompts
+        args.mode = "single_field" if args.route_models else "company"
+    elif args.route_models and args.mode == "company":
+        parser.error("--route-models needs a mode that extracts single fields (single_field, structured, session or field_major).")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
     print("🚀 Starting Comparative Analyst Agent...\n")
 
     # --- STEP 1: AUTO-INGESTION (The New Part) ---
     print("🔄 Checking for new documents...")
     
-    # 1. Load raw text files
-    raw_docs = load_and_chunk_documents("data/txt_files_med_test")
-
-   
- 
-    
-    if raw_docs:
-        # 2. Connect to DB and clear old data (Optional: clear only if you want a fresh start)
-        # For a clean test loop, we often wipe the DB so we don't have duplicate chunks.
-        test_db_dir = "test_chroma_db"
-        #make sure to use param
-        check_clear_database()
-        vdb = VectorDatabase(test_db_dir)
-        
-       
-        
-        # 3. Add the new chunks
-        vdb.add_documents(raw_docs)
-        print(f"✅ Ingestion Complete: {len(raw_docs)} chunks loaded into ChromaDB.\n")
-    else:
-        print("⚠️ No documents found in data/raw_docs/ to ingest.\n")
+    # 1. Incremental ingest into a new index version (same code path as the Streamlit worker)
+    # Tagged with company metadata so the agent can filter each search to one company.
+    # The live version is only swapped once the new one is complete.
+    # Run in-process through run(): it never exits this process, so when ingest is
+    # busy (e.g. the app is indexing) or fails, the analysis uses the current version.
+    try:
+        ingest_worker.run([])
+    except ingest_worker.IngestError as e:
+        print(f"⚠️ Index not updated: {e}\n   Falling back to the current version.\n")
+
+    # 2. Pin this run to the version that is live right now
+    # A later ingest can publish a newer version without affecting this run.
+    index_path = IndexStore(ingest_worker.DB_DIR).current_path()
+    if index_path is None:
+        print("⚠️ No index available. Add documents to data/txt_files_med_test/ first.\n")
+        return
+    vdb = VectorDatabase(index_path)
+    print(f"✅ Using index: {index_path}\n")
 
     # --- STEP 2: ANALYSIS (The Existing Part) ---
     
     # Initialize the Agent
     
-    agent = AnalystAgent(vdb)
+    router = ModelRouter(DEFAULT_ROUTES) if args.route_models else None
+    agent = AnalystAgent(vdb, router=router)
 
     # Define Your Targets
     
@@ -230,11 +226,34 @@ def main():
 
     all_results = []
 
-
-
-    test_list_fields(all_results,companies,fields_to_extract, agent)
+    # Every finished cell is saved as it completes, and partial results are written to
+    # analysis_results.csv/.parquet as the run goes. After a crash, re-running resumes.
+    checkpoint = RunCheckpoint(
+        CHECKPOINT_PATH,
+        index_version=vdb.index_version(),
+        companies=companies,
+        fields=fields_to_extract,
+        csv_path="analysis_results.csv",
+        parquet_path="analysis_results.parquet",
+    )
+
+    if args.mode == "company":
+        test_list_fields(all_results,companies,fields_to_extract, agent, checkpoint)
+    else:
+        all_results = agent.analyze_many(companies, fields_to_extract, mode=args.mode, checkpoint=checkpoint)
+        checkpoint.finish()
+        print(pd.DataFrame(all_results).reindex(columns=["Company"] + fields_to_extract).to_string(index=False))
     #run_clean_room_analysis(companies,fields_to_extract,vdb)
     #test_single_field(all_results,companies,fields_to_extract, agent,vdb)
+
+    # Where did the wall time go? (set ANALYST_TRACE_FILE to keep every span as JSON lines)
+    get_tracer().print_summary()
+    if agent.extractors is not None and agent.extractors.stats():
+        print("\n⚡ Rule-based extraction (LLM calls saved)")
+        print(agent.extractors.format_stats())
+    if agent.router is not None and agent.router.stats():
+        print("\n🔀 Model routing (per route)")
+        print(agent.router.format_stats())
     
 
    
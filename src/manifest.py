@@ -0,0 +1,220 @@
+import os
+import json
+import hashlib
+import pathlib
+from typing import Iterable, Optional
+from langchain_core.documents import Document
+
+# The manifest lives INSIDE the Chroma directory, so wiping the DB also wipes
+# the manifest and the next ingest automatically becomes a full rebuild.
+MANIFEST_FILENAME = "ingest_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def hash_file(file_path) -> str:
+    """
+    Returns the sha256 of a file's raw bytes (read in blocks, so large filings are fine).
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_chunk(source: str, text: str) -> str:
+    """
+    Returns the sha256 of a chunk, scoped to its source file.
+    """
+    return hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()
+
+
+def assign_chunk_ids(chunks: list[Document]) -> list[str]:
+    """
+    Gives every chunk a deterministic, content-derived ID (also set on `doc.id`).
+
+    Identical chunks inside the same file (repeated boilerplate) get an occurrence
+    suffix so Chroma never sees duplicate IDs in one batch.
+
+    Returns:
+        list[str]: The IDs, aligned with `chunks`.
+    """
+    seen = {}
+    ids = []
+    for doc in chunks:
+        base = hash_chunk(doc.metadata.get("source", ""), doc.page_content)
+        occurrence = seen.get(base, 0)
+        seen[base] = occurrence + 1
+
+        chunk_id = f"{base[:32]}-{occurrence}"
+        doc.id = chunk_id
+        ids.append(chunk_id)
+    return ids
+
+
+class IngestManifest:
+    """
+    Records what is currently embedded in a Chroma directory:
+    one entry per source file with its content hash and the chunk IDs it produced.
+    """
+
+    def __init__(self, path, pipeline: str = "", files: Optional[dict] = None):
+        """
+        Args:
+            path: Location of the manifest JSON file.
+            pipeline (str): Identifier of the chunking pipeline that produced the IDs.
+            files (dict): {source_name: {"sha256": str, "chunk_ids": list[str]}}
+        """
+        self.path = pathlib.Path(path)
+        self.pipeline = pipeline
+        self.files = files or {}
+
+    @classmethod
+    def load(cls, db_dir: str) -> "IngestManifest":
+        """
+        Loads the manifest stored in `db_dir`. Returns an empty manifest if there is none
+        (or if it is unreadable) which forces a full ingest.
+        """
+        path = pathlib.Path(db_dir) / MANIFEST_FILENAME
+        if not path.exists():
+            return cls(path)
+
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Ignoring unreadable manifest at {path}: {e}")
+            return cls(path)
+
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(path, pipeline=data.get("pipeline", ""), files=data.get("files", {}))
+
+    def save(self):
+        """
+        Writes the manifest atomically (temp file + rename) so a crash never leaves half a file.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "version": MANIFEST_VERSION,
+            "pipeline": self.pipeline,
+            "files": self.files,
+        }
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def scan(data_dir: str, pattern: str = "*.txt") -> dict[str, str]:
+        """
+        Hashes every source file in `data_dir`.
+
+        Returns:
+            dict[str, str]: {file name: sha256}
+        """
+        path = pathlib.Path(data_dir)
+        if not path.exists():
+            raise FileNotFoundError(f"The directory '{path}' does not exist.")
+        return {p.name: hash_file(p) for p in sorted(path.glob(pattern))}
+
+    def diff(self, current: dict[str, str], pipeline: str = "") -> tuple[list[str], list[str]]:
+        """
+        Compares the scanned corpus against the manifest.
+
+        Args:
+            current (dict): Output of `scan`.
+            pipeline (str): The chunking pipeline about to be used. If it differs from the
+                one recorded, every file counts as changed (its chunk IDs would differ).
+
+        Returns:
+            tuple[list[str], list[str]]: (new or changed files, removed files)
+        """
+        pipeline_changed = pipeline != self.pipeline
+        changed = [
+            name for name, digest in current.items()
+            if pipeline_changed or self.files.get(name, {}).get("sha256") != digest
+        ]
+        removed = [name for name in self.files if name not in current]
+        return changed, removed
+
+    def is_unchanged(self, data_dir: str, pipeline: str = "") -> bool:
+        """
+        True when the DB already reflects every file in `data_dir` (nothing to ingest).
+        """
+        if not self.path.exists():
+            return False
+        changed, removed = self.diff(self.scan(data_dir), pipeline)
+        return not changed and not removed
+
+    def fingerprint(self) -> str:
+        """
+        A short hash identifying this exact index content (changes on every ingest that
+        adds, edits or removes a file). Used to invalidate caches built on top of the index.
+        """
+        state = {
+            "pipeline": self.pipeline,
+            "files": {name: entry.get("sha256") for name, entry in self.files.items()},
+        }
+        return hashlib.sha256(json.dumps(state, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    def chunk_ids(self, source: str) -> list[str]:
+        return list(self.files.get(source, {}).get("chunk_ids", []))
+
+    def record(self, source: str, file_hash: str, chunk_ids: Iterable[str]):
+        self.files[source] = {"sha256": file_hash, "chunk_ids": list(chunk_ids)}
+
+    def forget(self, source: str):
+        self.files.pop(source, None)
+
+
+# --- TICKET TEST BLOCK ---
+
+if __name__ == "__main__":
+    import tempfile
+
+    print("🧪 STARTING TEST: Ingest manifest\n")
+
+    # 1. Chunk IDs depend on content and source only; repeats get an occurrence suffix
+    chunks = [
+        Document(page_content="Revenue was $4.2 billion.", metadata={"source": "apex.txt"}),
+        Document(page_content="Forward-looking statements.", metadata={"source": "apex.txt"}),
+        Document(page_content="Forward-looking statements.", metadata={"source": "apex.txt"}),
+        Document(page_content="Forward-looking statements.", metadata={"source": "tesla.txt"}),
+    ]
+    ids = assign_chunk_ids(chunks)
+    assert len(set(ids)) == 4 and [doc.id for doc in chunks] == ids
+    assert ids[1].split("-")[0] == ids[2].split("-")[0] and ids[2].endswith("-1")
+    assert ids[1].split("-")[0] != ids[3].split("-")[0]
+    assert assign_chunk_ids([Document(page_content="Revenue was $4.2 billion.", metadata={"source": "apex.txt"})]) == ids[:1]
+    print("   ✅ Chunk IDs are deterministic and unique")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = pathlib.Path(tmp) / "data"
+        data_dir.mkdir()
+        (data_dir / "apex.txt").write_text("Apex report", encoding="utf-8")
+        (data_dir / "tesla.txt").write_text("Tesla report", encoding="utf-8")
+
+        # 2. A new manifest sees every file as new; after recording, nothing changed
+        # (unless the chunking pipeline did)
+        manifest = IngestManifest.load(tmp)
+        current = IngestManifest.scan(data_dir)
+        assert manifest.diff(current, "p1") == (["apex.txt", "tesla.txt"], [])
+        for name, digest in current.items():
+            manifest.record(name, digest, [f"{name}-chunk"])
+        manifest.pipeline = "p1"
+        manifest.save()
+        manifest = IngestManifest.load(tmp)
+        assert manifest.is_unchanged(data_dir, "p1")
+        assert manifest.diff(IngestManifest.scan(data_dir), "p2") == (["apex.txt", "tesla.txt"], [])
+        fingerprint = manifest.fingerprint()
+
+        # 3. Edited, added and removed files are reported
+        (data_dir / "apex.txt").write_text("Apex report, restated", encoding="utf-8")
+        (data_dir / "tesla.txt").unlink()
+        (data_dir / "zeta.txt").write_text("Zeta report", encoding="utf-8")
+        current = IngestManifest.scan(data_dir)
+        assert manifest.diff(current, "p1") == (["apex.txt", "zeta.txt"], ["tesla.txt"])
+        manifest.forget("tesla.txt")
+        assert manifest.fingerprint() != fingerprint
+        print("   ✅ Manifest diff finds new, changed and removed files")
+
+    print("\n✅ TICKET COMPLETE: Ingestion only embeds what changed.")
@@ -0,0 +1,249 @@
+import time
+import threading
+from typing import Callable, Optional
+from langchain_ollama import OllamaLLM
+
+from src.extractors import normalize_field
+from src.generation_profiles import GenerationProfiles
+
+# Example setup: the 1B model answers short factual fields, the 3B model writes the
+# summaries and takes over whenever the small one comes back empty-handed.
+# (Pull both first: `ollama pull llama3.2:1b && ollama pull llama3.2`.)
+DEFAULT_ROUTES = {
+    "small": {"model": "llama3.2:1b", "escalate_to": "large"},
+    "large": {"model": "llama3.2"},
+}
+# Field class (the generation mode, see src/generation_profiles.py) -> route
+DEFAULT_CLASS_ROUTES = {"numeric": "small", "short_text": "small", "text": "large"}
+
+# Answers that mean "nothing found"
+NOT_FOUND_VALUES = {"", "n/a", "na", "none", "unknown", "not found", "not available", "not mentioned"}
+# A short-text value (a name, a city) longer than this is an explanation, not a value
+MAX_SHORT_TEXT_WORDS = 8
+
+
+def is_not_found(value: str) -> bool:
+    return value.strip().strip(".'\"").lower() in NOT_FOUND_VALUES
+
+
+# Per field class: does this look like a value of that kind?
+VALIDATORS: dict[str, Callable[[str], bool]] = {
+    "numeric": lambda value: any(char.isdigit() for char in value),
+    "short_text": lambda value: len(value.split()) <= MAX_SHORT_TEXT_WORDS,
+    "text": lambda value: True,
+}
+
+
+class ModelRoute:
+    """
+    One model configuration that fields can be routed to.
+    """
+
+    def __init__(self, name: str, model: str, escalate_to: Optional[str] = None, **llm_kwargs):
+        """
+        Args:
+            name (str): Route name (used in the routing tables and stats).
+            model (str): Ollama model tag, e.g. "llama3.2:1b".
+            escalate_to (str): Route to retry with when this one's answer is rejected.
+            **llm_kwargs: Extra OllamaLLM settings (e.g. num_ctx).
+        """
+        self.name = name
+        self.model = model
+        self.escalate_to = escalate_to
+        self.llm_kwargs = llm_kwargs
+
+    def __repr__(self):
+        return f"ModelRoute({self.name!r}, model={self.model!r}, escalate_to={self.escalate_to!r})"
+
+
+class ModelRouter:
+    """
+    Picks the model for each single-field extraction and escalates rejected answers.
+
+    Fields map to routes directly (`field_routes`) or through their class
+    (`class_routes`, e.g. numeric -> small model). An answer that is N/A or fails its
+    class validator is retried on the route's `escalate_to` model. Latency and
+    acceptance are tracked per route.
+    """
+
+    def __init__(self, routes: Optional[dict] = None, class_routes: Optional[dict] = None,
+                 field_routes: Optional[dict] = None, default_route: Optional[str] = None,
+                 field_classes: Optional[GenerationProfiles] = None):
+        """
+        Args:
+            routes (dict): {route name: {"model": ..., "escalate_to": ..., **llm kwargs}}.
+            class_routes (dict): {field class: route name}.
+            field_routes (dict): {field: route name}, overrides the class mapping.
+            default_route (str): Route for everything else (defaults to the class route of "text").
+            field_classes (GenerationProfiles): Field -> class mapping (the generation mode).
+        """
+        routes = DEFAULT_ROUTES if routes is None else routes
+        self.routes = {name: ModelRoute(name, **config) for name, config in routes.items()}
+        self.class_routes = DEFAULT_CLASS_ROUTES if class_routes is None else dict(class_routes)
+        self.field_routes = {normalize_field(field): route for field, route in (field_routes or {}).items()}
+        self.default_route = default_route or self.class_routes.get("text") or next(iter(self.routes))
+        self.field_classes = field_classes or GenerationProfiles()
+        self._validate_config()
+
+        self._llms: dict[str, OllamaLLM] = {}
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict] = {}
+
+    def _validate_config(self):
+        referenced = [self.default_route, *self.class_routes.values(), *self.field_routes.values()]
+        referenced += [route.escalate_to for route in self.routes.values() if route.escalate_to]
+        unknown = sorted(set(referenced) - set(self.routes))
+        if unknown:
+            raise ValueError(f"Unknown model route(s) {unknown}. Defined routes: {list(self.routes)}.")
+        for route in self.routes.values():
+            seen = {route.name}
+            while route.escalate_to:
+                if route.escalate_to in seen:
+                    raise ValueError(f"Escalation loop through route '{route.escalate_to}'.")
+                seen.add(route.escalate_to)
+                route = self.routes[route.escalate_to]
+
+    def field_class(self, field: str) -> str:
+        return self.field_classes.for_field(field).name
+
+    def route_for(self, field: str) -> ModelRoute:
+        name = self.field_routes.get(normalize_field(field)) or self.class_routes.get(self.field_class(field))
+        return self.routes[name or self.default_route]
+
+    def llm(self, route: ModelRoute) -> OllamaLLM:
+        """
+        The LLM for `route`, created once and shared by every call.
+        """
+        with self._lock:
+            if route.name not in self._llms:
+                self._llms[route.name] = OllamaLLM(model=route.model, temperature=0, **route.llm_kwargs)
+            return self._llms[route.name]
+
+    def accepts(self, field: str, value: str) -> bool:
+        """
+        True if `value` is a usable answer for `field` (found, and valid for its class).
+        """
+        if is_not_found(value):
+            return False
+        return VALIDATORS.get(self.field_class(field), VALIDATORS["text"])(value.strip())
+
+    def settle(self, field: str, route: ModelRoute, value: str, duration_ms: float) -> Optional[ModelRoute]:
+        """
+        Records one answer from `route`.
+
+        Returns:
+            ModelRoute | None: The route to retry on if the answer is rejected, else None.
+        """
+        accepted = self.accepts(field, value)
+        escalate = None if accepted or not route.escalate_to else self.routes[route.escalate_to]
+        with self._lock:
+            stats = self._stats.setdefault(route.name, {"calls": 0, "accepted": 0, "escalated": 0, "total_ms": 0.0})
+            stats["calls"] += 1
+            stats["accepted"] += accepted
+            stats["escalated"] += escalate is not None
+            stats["total_ms"] += duration_ms
+        if escalate is not None:
+            print(f"   ↗️  {field}: '{value.strip()}' from {route.model} rejected, escalating to {escalate.model}")
+        return escalate
+
+    def run(self, field: str, generate: Callable[[ModelRoute], str]) -> str:
+        """
+        Answers `field` with `generate(route)`, escalating until an answer is accepted
+        or the escalation chain ends (the last answer is returned either way).
+        """
+        route = self.route_for(field)
+        while True:
+            start = time.perf_counter()
+            value = generate(route)
+            route = self.settle(field, route, value, (time.perf_counter() - start) * 1000)
+            if route is None:
+                return value
+
+    def stats(self) -> dict[str, dict]:
+        """
+        Per route: model, calls, accepted answers, escalations, acceptance rate and mean latency.
+        """
+        with self._lock:
+            return {
+                name: {
+                    "model": self.routes[name].model,
+                    **stats,
+                    "accept_rate": round(stats["accepted"] / stats["calls"], 3),
+                    "mean_ms": round(stats["total_ms"] / stats["calls"], 2),
+                }
+                for name, stats in self._stats.items()
+            }
+
+    def format_stats(self) -> str:
+        lines = [f"{'route':<10}{'model':<16}{'calls':>7}{'accepted':>10}{'escalated':>11}{'accept':>8}{'mean ms':>10}"]
+        for name, s in self.stats().items():
+            lines.append(f"{name:<10}{s['model']:<16}{s['calls']:>7}{s['accepted']:>10}{s['escalated']:>11}"
+                         f"{s['accept_rate']:>8.0%}{s['mean_ms']:>10}")
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+# --- TICKET TEST BLOCK ---
+
+if __name__ == "__main__":
+    print("🧪 STARTING TEST: Model routing\n")
+
+    router = ModelRouter(DEFAULT_ROUTES)
+
+    # 1. Short values go to the small model, summaries to the large one
+    assert router.route_for("Revenue").name == "small"
+    assert router.route_for("ceo").name == "small"
+    assert router.route_for("Primary Risks").name == "large"
+    assert ModelRouter(DEFAULT_ROUTES, field_routes={"revenue": "large"}).route_for("Revenue").name == "large"
+    print("   ✅ Fields are routed by class, overrides win")
+
+    # 2. Validators reject not-found, non-numeric and rambling answers
+    assert router.accepts("Revenue", "$4.2 billion")
+    assert not router.accepts("Revenue", "N/A.")
+    assert not router.accepts("Revenue", "four billion")
+    assert not router.accepts("CEO", "The chief executive officer of the company is Elena Rostova today")
+    assert router.accepts("Primary Risks", "Supply chain disruptions; rising interest rates")
+    print("   ✅ Validators reject unusable answers")
+
+    # 3. A rejected answer is retried on the larger model (stub LLM per model)
+    answers = {"llama3.2:1b": {"Revenue": "N/A", "CEO": "Elena Rostova"},
+               "llama3.2": {"Revenue": "$4.2 billion", "Primary Risks": "N/A"}}
+    calls = []
+
+    def stub_llm(field):
+        def generate(route: ModelRoute) -> str:
+            calls.append((field, route.model))
+            return answers[route.model][field]
+        return generate
+
+    assert router.settle("Revenue", router.routes["small"], "N/A", 1.0).name == "large"
+    assert router.settle("Revenue", router.routes["large"], "N/A", 1.0) is None
+    router.reset()
+    assert router.run("Revenue", stub_llm("Revenue")) == "$4.2 billion"
+    assert router.run("CEO", stub_llm("CEO")) == "Elena Rostova"
+    assert router.run("Primary Risks", stub_llm("Primary Risks")) == "N/A"  # end of the chain
+    assert calls == [("Revenue", "llama3.2:1b"), ("Revenue", "llama3.2"),
+                     ("CEO", "llama3.2:1b"), ("Primary Risks", "llama3.2")]
+    print("   ✅ Rejected answers escalate to the larger model")
+
+    # 4. Stats per route
+    stats = router.stats()
+    assert stats["small"]["calls"] == 2 and stats["small"]["accepted"] == 1 and stats["small"]["escalated"] == 1
+    assert stats["large"]["calls"] == 2 and stats["large"]["accepted"] == 1 and stats["large"]["escalated"] == 0
+    assert stats["small"]["accept_rate"] == 0.5
+    print(router.format_stats())
+
+    # 5. Broken configurations are rejected up front
+    for routes in ({"a": {"model": "m", "escalate_to": "b"}},
+                   {"a": {"model": "m", "escalate_to": "b"}, "b": {"model": "n", "escalate_to": "a"}}):
+        try:
+            ModelRouter(routes, class_routes={}, default_route="a")
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted {routes}")
+    print("   ✅ Unknown routes and escalation loops are rejected")
+
+    print("\n✅ TICKET COMPLETE: Fields are routed to the right model size.")
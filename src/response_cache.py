@@ -0,0 +1,204 @@
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import pathlib
+import threading
+from typing import Optional
+from langchain_core.documents import Document
+
+DEFAULT_MAX_ENTRIES = 50_000
+# The size cap is checked once per this many puts (counting rows on every LLM call
+# is wasted work), so the cache may briefly exceed max_entries by up to this many
+EVICTION_INTERVAL = 100
+# Where the Ollama client connects when OLLAMA_HOST is unset
+DEFAULT_OLLAMA_HOSTS = {"", "127.0.0.1:11434", "localhost:11434", "0.0.0.0:11434"}
+
+
+def served_model(model: str) -> str:
+    """
+    `model` tagged with the Ollama server it runs on (OLLAMA_HOST), for cache keys.
+
+    A fake or remote server answers differently than the local one, so its embeddings
+    and responses must never land in (or be read from) the local cache entries. The
+    default local server keeps the bare model name, so existing caches stay valid.
+    """
+    host = os.environ.get("OLLAMA_HOST", "").strip().rstrip("/")
+    bare = host.split("://", 1)[-1]
+    if bare in DEFAULT_OLLAMA_HOSTS:
+        return model
+    return f"{model}@{bare}"
+
+
+def context_fingerprint(docs: list[Document]) -> str:
+    """
+    Hashes the IDs of the retrieved chunks (in order). Chunk IDs are content hashes,
+    so the fingerprint changes whenever the text handed to the LLM changes.
+    """
+    digest = hashlib.sha256()
+    for doc in docs:
+        chunk_id = doc.id or hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+        digest.update(chunk_id.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent cache of LLM completions for the AnalystAgent.
+
+    Only safe because extraction runs at temperature=0: the same model, prompt template,
+    field(s) and retrieved chunks produce the same answer. Entries are keyed by the
+    index version they were computed against, so answers from another index are never
+    served; they age out through LRU eviction (or `invalidate_except`).
+    """
+
+    def __init__(self, cache_path: str, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 eviction_interval: int = EVICTION_INTERVAL):
+        """
+        Args:
+            cache_path (str): Path of the SQLite cache file.
+            max_entries (int): Maximum number of responses kept before LRU eviction.
+            eviction_interval (int): Puts between two checks of the size cap.
+        """
+        self.cache_path = pathlib.Path(cache_path)
+        self.max_entries = max_entries
+        self.eviction_interval = max(1, eviction_interval)
+        # Starts "due", so the first put checks the cap (other processes write here too)
+        self._puts_since_eviction = self.eviction_interval
+        self.hits = 0
+        self.misses = 0
+
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " index_version TEXT NOT NULL,"
+            " response TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(**parts) -> str:
+        """
+        Builds a cache key from any JSON-serializable parts (model, template, field, ...).
+        """
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, response: str, index_version: str = ""):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, index_version, response, last_used) VALUES (?, ?, ?, ?)",
+                (key, index_version, response, time.time()),
+            )
+            self._puts_since_eviction += 1
+            if self._puts_since_eviction >= self.eviction_interval:
+                self._puts_since_eviction = 0
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Caller holds the lock; counted in the write transaction, so other writers' rows count too
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def invalidate_except(self, index_version: str) -> int:
+        """
+        Drops every response computed against a different index version.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM responses WHERE index_version != ?", (index_version,))
+            self._conn.commit()
+        if cursor.rowcount:
+            print(f"🧹 Response cache: dropped {cursor.rowcount} answers from an older index.")
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- TICKET TEST BLOCK ---
+
+if __name__ == "__main__":
+    import tempfile
+
+    print("🧪 STARTING TEST: Response cache\n")
+
+    docs = [Document(page_content="Revenue was $4.2 billion.", id="apex-0"),
+            Document(page_content="Elena Rostova is the CEO.", id="apex-1")]
+
+    # 1. Key parts: retrieved chunks (in order), index version and the serving host
+    assert context_fingerprint(docs) == context_fingerprint(list(docs))
+    assert context_fingerprint(docs) != context_fingerprint(docs[::-1])
+    assert context_fingerprint([Document(page_content="x")]) != context_fingerprint([Document(page_content="y")])
+    base = dict(model="llama3.2", context=context_fingerprint(docs), field="Revenue")
+    assert ResponseCache.make_key(**base, index_version="v1") == ResponseCache.make_key(index_version="v1", **base)
+    assert ResponseCache.make_key(**base, index_version="v1") != ResponseCache.make_key(**base, index_version="v2")
+
+    host = os.environ.pop("OLLAMA_HOST", None)
+    assert served_model("llama3.2") == "llama3.2"
+    os.environ["OLLAMA_HOST"] = "http://localhost:11434/"
+    assert served_model("llama3.2") == "llama3.2"
+    os.environ["OLLAMA_HOST"] = "http://127.0.0.1:11435"
+    assert served_model("llama3.2") == "llama3.2@127.0.0.1:11435"
+    if host is None:
+        os.environ.pop("OLLAMA_HOST")
+    else:
+        os.environ["OLLAMA_HOST"] = host
+    print("   ✅ Keys change with chunks, index version and Ollama host")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 2. get/put and invalidate_except
+        cache = ResponseCache(f"{tmp}/responses.sqlite3")
+        cache.put("k1", "$4.2 billion", index_version="v1")
+        cache.put("k2", "Elena Rostova", index_version="v2")
+        assert cache.get("k1") == "$4.2 billion" and cache.get("missing") is None
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert cache.invalidate_except("v2") == 1
+        assert cache.get("k1") is None and cache.get("k2") == "Elena Rostova"
+        cache.close()
+        print("   ✅ Entries from other index versions can be dropped")
+
+        # 3. LRU eviction, checked every `eviction_interval` puts
+        cache = ResponseCache(f"{tmp}/small.sqlite3", max_entries=3, eviction_interval=2)
+        for i in range(5):
+            cache.put(f"k{i}", str(i))
+            time.sleep(0.01)
+            if i == 2:
+                cache.get("k0")  # k0 becomes the most recently used
+        def keys() -> list[str]:
+            return [row[0] for row in cache._conn.execute("SELECT key FROM responses ORDER BY key")]
+
+        assert keys() == ["k0", "k3", "k4"], keys()
+        cache.put("k5", "5")  # between checks the cap may be exceeded by less than the interval
+        assert len(keys()) == 4
+        cache.close()
+        print("   ✅ Least recently used answers are evicted")
+
+    print("\n✅ TICKET COMPLETE: LLM answers are cached on disk.")
@@ -0,0 +1,119 @@
+from typing import Callable, Optional
+from langchain_core.documents import Document
+
+from src.database import VectorDatabase
+
+
+class RetrievalSession:
+    """
+    Shared retrieval context for ONE company across many fields.
+
+    All field queries are searched in a single `retrieve_many` pass, the hits are unioned
+    and de-duplicated by chunk ID, and each field is handed only its own hits, ordered as
+    they appear in the shared union. Fields that land on the same leading chunks therefore
+    produce prompts with an identical prefix, which Ollama can reuse from its KV cache.
+    """
+
+    def __init__(self, vdb: VectorDatabase, company_name: str, fields: list[str],
+                 query_builder: Callable[[str, str], str], k: int = 3,
+                 filter: Optional[dict] = None, mode: str = "vector"):
+        """
+        Args:
+            vdb (VectorDatabase): Store to search.
+            company_name (str): The company this session is scoped to.
+            fields (list[str]): Every field that will be asked about.
+            query_builder (callable): (company, field) -> search query.
+            k (int): Chunks retrieved per field.
+            filter (dict): Chroma `where` filter applied to every query (e.g. the company partition).
+            mode (str): Retrieval mode ("vector", "hybrid" or "lexical", see `VectorDatabase.retrieve`).
+        """
+        self.company_name = company_name
+        self.fields = list(fields)
+
+        hits = vdb.retrieve_many(
+            [query_builder(company_name, field) for field in self.fields], k=k, filters=filter, mode=mode
+        )
+
+        # Union in first-seen order (field order, then rank), one copy per chunk ID
+        self.chunks: list[Document] = []
+        self._positions: dict[str, int] = {}
+        self._field_ids: dict[str, list[str]] = {}
+        for field, docs in zip(self.fields, hits):
+            ids = []
+            for doc in docs:
+                chunk_id = self._chunk_id(doc)
+                if chunk_id not in self._positions:
+                    self._positions[chunk_id] = len(self.chunks)
+                    self.chunks.append(doc)
+                if chunk_id not in ids:
+                    ids.append(chunk_id)
+            self._field_ids[field] = ids
+
+        total_hits = sum(len(docs) for docs in hits)
+        print(f"   🧩 Session for {company_name}: {len(self.chunks)} unique chunks "
+              f"from {total_hits} hits across {len(self.fields)} fields.")
+
+    @staticmethod
+    def _chunk_id(doc: Document) -> str:
+        # Chunks without an ID (legacy indexes) are de-duplicated by their text
+        return doc.id or doc.page_content
+
+    def docs_for(self, field: str) -> list[Document]:
+        """
+        The chunks relevant to `field`, in shared-union order.
+        """
+        ids = self._field_ids.get(field, [])
+        positions = sorted(self._positions[chunk_id] for chunk_id in ids)
+        return [self.chunks[position] for position in positions]
+
+
+# --- TICKET TEST BLOCK ---
+
+if __name__ == "__main__":
+    print("🧪 STARTING TEST: Shared retrieval session\n")
+
+    class StubVectorDatabase:
+        """Answers `retrieve_many` from a fixed table and records how it was called."""
+        def __init__(self, hits: dict[str, list[Document]]):
+            self.hits = hits
+            self.calls = []
+
+        def retrieve_many(self, queries, k=3, filters=None, mode="vector"):
+            self.calls.append({"queries": list(queries), "k": k, "filters": filters, "mode": mode})
+            return [self.hits[query][:k] for query in queries]
+
+    def chunk(chunk_id: Optional[str], text: str) -> Document:
+        return Document(page_content=text, id=chunk_id)
+
+    a, b, c, d = chunk("a", "revenue table"), chunk("b", "ceo letter"), chunk("c", "risk factors"), chunk("d", "outlook")
+    stub = StubVectorDatabase({
+        "Acme Revenue": [a, b, a],  # duplicate hit within one field
+        "Acme CEO": [b, c],
+        "Acme Primary Risks": [d, c, a],
+        # Legacy chunks without IDs are de-duplicated by their text
+        "Acme Future Projections": [chunk(None, "guidance"), chunk(None, "guidance")],
+    })
+    fields = ["Revenue", "CEO", "Primary Risks", "Future Projections"]
+    session = RetrievalSession(stub, "Acme", fields, lambda company, field: f"{company} {field}",
+                               k=3, filter={"company": "Acme"}, mode="hybrid")
+
+    # 1. One batched search for every field, with the session's filter and mode
+    assert len(stub.calls) == 1
+    assert stub.calls[0] == {"queries": [f"Acme {f}" for f in fields], "k": 3,
+                             "filters": {"company": "Acme"}, "mode": "hybrid"}
+    print("   ✅ All fields are searched in one retrieve_many call")
+
+    # 2. The union keeps one copy per chunk, in first-seen order
+    assert [doc.page_content for doc in session.chunks] == [
+        "revenue table", "ceo letter", "risk factors", "outlook", "guidance"]
+    print("   ✅ Hits are unioned and de-duplicated")
+
+    # 3. Each field gets only its own hits, in shared-union order
+    assert session.docs_for("Revenue") == [a, b]
+    assert session.docs_for("CEO") == [b, c]
+    assert session.docs_for("Primary Risks") == [a, c, d]
+    assert [doc.page_content for doc in session.docs_for("Future Projections")] == ["guidance"]
+    assert session.docs_for("Unknown") == []
+    print("   ✅ Each field sees its own hits in union order")
+
+    print("\n✅ TICKET COMPLETE: Fields of one company share a retrieval pass.")
@@ -0,0 +1,277 @@
+import os
+import json
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from typing import Optional
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Set this to a file path to write every span as one JSON line (e.g. traces/run.jsonl).
+# It is an environment variable so the ingest worker subprocess inherits it.
+TRACE_FILE_ENV = "ANALYST_TRACE_FILE"
+
+# Numeric span attributes that are summed per stage in the summary table
+SUMMED_ATTRIBUTES = ("chunks", "chars", "context_chars", "prompt_tokens", "completion_tokens")
+
+
+class Tracer:
+    """
+    Collects timed spans for each pipeline stage (split, embed, upsert, similarity_search,
+    prompt_build, llm_call, parse).
+
+    Every span is aggregated in memory for `summary()`, and optionally appended to a
+    JSON-lines trace file. Safe to use from worker threads.
+    """
+
+    def __init__(self, trace_path: Optional[str] = None, run_id: Optional[str] = None):
+        """
+        Args:
+            trace_path (str): JSON-lines file to append spans to. None keeps them in memory only.
+            run_id (str): Identifier written on every span (defaults to a random one).
+        """
+        self.trace_path = trace_path
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats: dict[str, dict] = {}
+        self._file = None
+        if trace_path:
+            os.makedirs(os.path.dirname(trace_path) or ".", exist_ok=True)
+            self._file = open(trace_path, "a", encoding="utf-8")
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Times the enclosed block. Yields the attribute dict, so counts that are only known
+        at the end (e.g. tokens) can be added inside the block.
+
+            with tracer.span("embed", chunks=len(texts)) as attrs:
+                ...
+                attrs["cached"] = True
+        """
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        parent = stack[-1] if stack else None
+        stack.append(name)
+
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            yield attributes
+        except BaseException as e:
+            attributes["error"] = type(e).__name__
+            raise
+        finally:
+            stack.pop()
+            self.record(name, (time.perf_counter() - start) * 1000, parent=parent,
+                        started_at=started_at, **attributes)
+
+    def record(self, name: str, duration_ms: float, parent: Optional[str] = None,
+               started_at: Optional[float] = None, **attributes):
+        """
+        Adds a span that was timed elsewhere (e.g. in a worker process).
+        """
+        with self._lock:
+            stats = self._stats.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["count"] += 1
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            for key in SUMMED_ATTRIBUTES:
+                value = attributes.get(key)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    stats[key] = stats.get(key, 0) + value
+
+            if self._file is not None:
+                event = {
+                    "run_id": self.run_id,
+                    "span": name,
+                    "parent": parent,
+                    "start": round(started_at or time.time() - duration_ms / 1000, 6),
+                    "duration_ms": round(duration_ms, 3),
+                    "thread": threading.current_thread().name,
+                    **attributes,
+                }
+                self._file.write(json.dumps(event, default=str) + "\n")
+                self._file.flush()
+
+    def summary(self) -> list[dict]:
+        """
+        One row per stage, slowest (by total time) first.
+        """
+        with self._lock:
+            rows = [
+                {
+                    "stage": name,
+                    "count": stats["count"],
+                    "total_s": round(stats["total_ms"] / 1000, 3),
+                    "mean_ms": round(stats["total_ms"] / stats["count"], 2),
+                    "max_ms": round(stats["max_ms"], 2),
+                    **{key: stats[key] for key in SUMMED_ATTRIBUTES if key in stats},
+                }
+                for name, stats in self._stats.items()
+            ]
+        return sorted(rows, key=lambda row: row["total_s"], reverse=True)
+
+    def format_summary(self) -> str:
+        """
+        The summary as a fixed-width text table.
+        """
+        columns = ["stage", "count", "total_s", "mean_ms", "max_ms", *SUMMED_ATTRIBUTES]
+        header = f"{'stage':<18}" + "".join(f"{c:>18}" for c in columns[1:])
+        lines = [header, "-" * len(header)]
+        for row in self.summary():
+            lines.append(f"{row['stage']:<18}" + "".join(f"{row.get(c, ''):>18}" for c in columns[1:]))
+        return "\n".join(lines)
+
+    def print_summary(self, title: str = "Run timing summary"):
+        if not self._stats:
+            return
+        print(f"\n⏱️  {title} (run {self.run_id})")
+        print(self.format_summary())
+        if self.trace_path:
+            print(f"📝 Full trace: {self.trace_path}")
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """
+    Reads Ollama's token counts (prompt_eval_count / eval_count) from an LLM result.
+    """
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                info = generation.generation_info or {}
+                self.prompt_tokens += info.get("prompt_eval_count") or 0
+                self.completion_tokens += info.get("eval_count") or 0
+
+
+_tracer = Tracer(trace_path=os.environ.get(TRACE_FILE_ENV) or None)
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def configure_tracing(trace_path: Optional[str] = None, run_id: Optional[str] = None) -> Tracer:
+    """
+    Replaces the process-wide tracer (e.g. to start writing a trace file).
+    """
+    global _tracer
+    _tracer.close()
+    _tracer = Tracer(trace_path=trace_path, run_id=run_id)
+    return _tracer
+
+
+def span(name: str, **attributes):
+    """
+    Shortcut for `get_tracer().span(...)`.
+    """
+    return _tracer.span(name, **attributes)
+
+
+# --- TICKET TEST BLOCK ---
+
+if __name__ == "__main__":
+    import sys
+    import subprocess
+    import tempfile
+    from langchain_core.outputs import Generation, LLMResult
+
+    print("🧪 STARTING TEST: Pipeline tracing\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 1. Nested spans are aggregated per stage and written with their parent
+        trace_path = os.path.join(tmp, "traces", "run.jsonl")
+        tracer = Tracer(trace_path=trace_path, run_id="test-run")
+        with tracer.span("ingest", chunks=5):
+            for _ in range(2):
+                with tracer.span("embed", chunks=2, cached=True) as attrs:
+                    time.sleep(0.02)
+                    attrs["chars"] = 100
+        try:
+            with tracer.span("llm_call"):
+                raise TimeoutError("model did not answer")
+        except TimeoutError:
+            pass
+
+        rows = {row["stage"]: row for row in tracer.summary()}
+        assert rows["embed"]["count"] == 2 and rows["embed"]["chunks"] == 4 and rows["embed"]["chars"] == 200
+        assert rows["embed"]["total_s"] >= 0.04 and rows["embed"]["max_ms"] >= 20
+        assert rows["ingest"]["count"] == 1 and rows["ingest"]["chunks"] == 5
+        assert rows["ingest"]["total_s"] >= rows["embed"]["total_s"]
+        assert "cached" not in rows["embed"]  # booleans are not summed
+        assert "embed" in tracer.format_summary()
+        tracer.close()
+
+        with open(trace_path, encoding="utf-8") as f:
+            events = [json.loads(line) for line in f]
+        assert [e["span"] for e in events] == ["embed", "embed", "ingest", "llm_call"]
+        assert [e["parent"] for e in events] == ["ingest", "ingest", None, None]
+        assert all(e["run_id"] == "test-run" for e in events)
+        assert events[0]["chars"] == 100 and events[0]["cached"] is True
+        assert events[-1]["error"] == "TimeoutError"
+        assert events[0]["start"] >= events[2]["start"]
+        print("   ✅ Nested spans are summed per stage and written to the trace file")
+
+        # 2. Each thread has its own span stack; recorded spans count like timed ones
+        thread_trace = os.path.join(tmp, "threads.jsonl")
+        tracer = Tracer(trace_path=thread_trace)
+
+        def worker_span():
+            with tracer.span("similarity_search"):
+                pass
+
+        with tracer.span("analyze"):
+            worker = threading.Thread(target=worker_span, name="retriever")
+            worker.start()
+            worker.join()
+        tracer.record("embed", 12.5, parent="ingest", chunks=3)
+        tracer.close()
+
+        with open(thread_trace, encoding="utf-8") as f:
+            events = {e["span"]: e for e in map(json.loads, f)}
+        assert events["similarity_search"]["parent"] is None
+        assert events["similarity_search"]["thread"] == "retriever"
+        assert events["embed"]["parent"] == "ingest"
+        rows = {row["stage"]: row for row in tracer.summary()}
+        assert rows["embed"]["chunks"] == 3 and rows["embed"]["mean_ms"] == 12.5
+        tracer.reset()
+        assert tracer.summary() == []
+        print("   ✅ Threads keep separate span stacks and recorded spans are aggregated")
+
+        # 3. The trace file environment variable reaches a subprocess' default tracer
+        env_trace = os.path.join(tmp, "worker.jsonl")
+        script = "from src.tracing import span\nwith span('split', chunks=7): pass\n"
+        subprocess.run([sys.executable, "-c", script], check=True,
+                       env={**os.environ, TRACE_FILE_ENV: env_trace})
+        with open(env_trace, encoding="utf-8") as f:
+            event = json.loads(f.readline())
+        assert event["span"] == "split" and event["chunks"] == 7
+        print(f"   ✅ {TRACE_FILE_ENV} turns on the trace file")
+
+    # 4. Token counts are read from Ollama's generation info
+    handler = TokenUsageHandler()
+    handler.on_llm_end(LLMResult(generations=[[
+        Generation(text="a", generation_info={"prompt_eval_count": 40, "eval_count": 5}),
+        Generation(text="b", generation_info=None),
+    ]]))
+    assert (handler.prompt_tokens, handler.completion_tokens) == (40, 5)
+    print("   ✅ Token usage is counted")
+
+    print("\n✅ TICKET COMPLETE: Every pipeline stage is timed and traced.")